@@ -0,0 +1,10 @@
+from core.controller import PostgreSQLAsyncAPIController as PostgreSQLAsyncAPIController
+
+
+a = PostgreSQLAsyncAPIController(
+    user="postgres",
+    password="mysecretpassword",
+    host="db",
+    port="5432",
+    bootstrap=False,
+).run()
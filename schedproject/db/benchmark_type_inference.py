@@ -0,0 +1,71 @@
+import argparse
+import copy
+import random
+import time
+
+from core.type_inference import analyze_records
+from core.utils import analyze_json
+
+
+def make_records(nb_rows: int, seed: int = 0) -> list[dict]:
+    # Wide raw extract shaped like what `populate_database` pushes: mostly
+    # strings, numeric strings, booleans and a few holes.
+    rng = random.Random(seed)
+    words = ["amphi", "TD", "TP", "cours", "Lundi", "salle", "groupe", "L3 INFO"]
+    records = []
+    for i in range(nb_rows):
+        records.append(
+            {
+                "id": str(i),
+                "code": f"C{i:06d}",
+                "name": " ".join(rng.choices(words, k=3)),
+                "capacity": str(rng.randint(10, 400)),
+                "duration": f"{rng.random() * 4:.2f}",
+                "weight": rng.random(),
+                "year": rng.randint(2000, 2030),
+                "is_remote": rng.choice(["true", "false", "TRUE", "False"]),
+                "room": rng.choice([None, f"R{rng.randint(1, 99)}"]),
+                "comment": rng.choice(["", "n/a", "1e3", "inf", "-", "ok"]),
+                "lecturer": rng.choice(words) + str(rng.randint(0, 9)),
+                "start": f"2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            }
+        )
+    return records
+
+
+def measure(function, records: list[dict], text_only: bool) -> tuple[float, tuple]:
+    records = copy.deepcopy(records)
+    start = time.perf_counter()
+    result = function(records, text_only=text_only)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare analyze_json with the column-oriented inference engine"
+    )
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+
+    for text_only in (False, True):
+        before, (before_types, before_records) = measure(
+            analyze_json, records, text_only
+        )
+        after, (after_types, after_records) = measure(
+            analyze_records, records, text_only
+        )
+
+        if before_types != after_types or before_records != after_records:
+            raise AssertionError(f"Results differ (text_only={text_only})")
+
+        print(
+            f"text_only={text_only}: analyze_json {args.rows / before:,.0f} rows/s, "
+            f"analyze_records {args.rows / after:,.0f} rows/s "
+            f"(x{before / after:.1f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
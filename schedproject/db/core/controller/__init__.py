@@ -1,5 +1,7 @@
 from .api_extension import APIExtension as APIExtension
+from .async_api_extension import AsyncAPIExtension as AsyncAPIExtension
 from .postgresql import (
     PostgreSQLAPIController as PostgreSQLAPIController,
+    PostgreSQLAsyncAPIController as PostgreSQLAsyncAPIController,
     PostgreSQLController as PostgreSQLController,
 )
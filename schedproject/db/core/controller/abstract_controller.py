@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, AsyncIterator, Iterator, Optional
 
 
 from ..databridging import StageConfiguration
@@ -32,7 +32,21 @@ class AbstractController(ABC):
         pass
 
     @abstractmethod
-    def process_data_transformation(self, configs: list[StageConfiguration]) -> None:
+    def plan_data_transformation(
+        self, configs: list[StageConfiguration], force: bool = False
+    ) -> dict[str, dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def verify_data_transformation(
+        self, configs: list[StageConfiguration]
+    ) -> dict[str, dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def process_data_transformation(
+        self, configs: list[StageConfiguration], force: bool = False
+    ) -> dict[str, Any]:
         pass
 
     @abstractmethod
@@ -45,6 +59,66 @@ class AbstractController(ABC):
     ) -> list[dict]:
         pass
 
+    @abstractmethod
+    def query_batch(
+        self,
+        database: str,
+        statements: list[dict[str, Any]],
+        pipeline: bool = False,
+    ) -> list[list[dict]]:
+        pass
+
+    @abstractmethod
+    def stream_query(
+        self,
+        database: str,
+        query: str,
+        placeholders: list[Any] | None = None,
+        fetch_size: int | None = None,
+    ) -> Iterator[list[dict]]:
+        pass
+
+    @abstractmethod
+    def prepared_statements_stats(self) -> dict[str, dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def slow_queries(self) -> dict[str, dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def clear_slow_queries(self) -> None:
+        pass
+
+    @abstractmethod
+    def result_cache_stats(self) -> dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def get_indexes(self, database: str) -> dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def create_indexes(
+        self,
+        database: str,
+        indexes: Optional[list[dict[str, Any]]] = None,
+        queries: Optional[list[str]] = None,
+    ) -> dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def compact_transactions(
+        self, retention_days: Optional[float] = None
+    ) -> dict[str, dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def refresh_materializations(
+        self, force: bool = False
+    ) -> dict[str, dict[str, Any]]:
+        pass
+
     @abstractmethod
     def view_table_association(self) -> dict[str, str]:
         pass
@@ -62,3 +136,42 @@ class AbstractController(ABC):
         self, database: str = "raw"
     ) -> dict[str, list[dict[str, Any]]]:
         pass
+
+
+class AbstractAsyncController(AbstractController):
+    @abstractmethod
+    async def open_async_connections(self) -> None:
+        pass
+
+    @abstractmethod
+    async def close_async_connections(self) -> None:
+        pass
+
+    @abstractmethod
+    async def async_query(
+        self,
+        database: str,
+        query: str,
+        placeholders: list[Any] | None = None,
+        awaits_result: bool = True,
+    ) -> list[dict]:
+        pass
+
+    @abstractmethod
+    async def async_query_batch(
+        self,
+        database: str,
+        statements: list[dict[str, Any]],
+        pipeline: bool = False,
+    ) -> list[list[dict]]:
+        pass
+
+    @abstractmethod
+    def async_stream_query(
+        self,
+        database: str,
+        query: str,
+        placeholders: list[Any] | None = None,
+        fetch_size: int | None = None,
+    ) -> AsyncIterator[list[dict]]:
+        pass
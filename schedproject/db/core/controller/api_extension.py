@@ -1,12 +1,24 @@
 import json
 import logging
+from itertools import chain
+from typing import Any, Iterator
 
 from flask import Flask, Response, jsonify, request
 from psycopg.errors import DuplicateTable, UndefinedTable
 
 from .abstract_controller import AbstractController
 from ..databridging import StageConfiguration, StageConfigurationCycle
-from ..utils import InchoherentStructure, InconsistentStructure, InvalidDatabaseName
+from ..utils import (
+    InchoherentStructure,
+    InconsistentStructure,
+    InvalidDatabaseName,
+    MSGPACK_MIMETYPE,
+    pack_columnar,
+    iter_csv_records,
+    iter_json_records,
+    iter_ndjson_records,
+    WrongQueryType,
+)
 
 
 class InvalidTableName(Exception): ...
@@ -21,8 +33,62 @@ class TableNotFoundError(Exception): ...
 class QueryRequired(Exception): ...
 
 
+class UnsupportedUploadFormat(Exception): ...
+
+
 logger = logging.getLogger(__name__)
 
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+# Request checks and response encoding shared with `AsyncAPIExtension`, so
+# that both servers accept and answer the same bodies.
+
+
+def query_request_error(data: Any) -> str | None:
+    if not isinstance(data, dict):
+        return "No json data provided"
+    if not data.get("query"):
+        return "No query provided"
+    return None
+
+
+def batch_request_error(data: Any) -> str | None:
+    if not isinstance(data, dict):
+        return "No json data provided"
+    statements = data.get("statements")
+    if not isinstance(statements, list) or not all(
+        isinstance(statement, dict) for statement in statements
+    ):
+        return "No statements provided"
+    return None
+
+
+def encode_query_results(
+    results: list[dict] | None, accept_mimetypes: Any
+) -> tuple[bytes | str, str]:
+    # Clients accepting msgpack get the rows as one array per column, which
+    # is much cheaper to encode and decode than a list of JSON objects.
+    best = accept_mimetypes.best_match(
+        ["application/json", MSGPACK_MIMETYPE], default="application/json"
+    )
+    if best == MSGPACK_MIMETYPE and results is not None:
+        return pack_columnar(results), MSGPACK_MIMETYPE
+    return json.dumps(results, default=str), "application/json"
+
+
+def stream_mimetype(accept_mimetypes: Any) -> str:
+    return accept_mimetypes.best_match(
+        ["application/json", NDJSON_MIMETYPE], "application/json"
+    )
+
+
+def encode_stream_rows(rows: list[dict], mimetype: str) -> str:
+    # NDJSON lines, or the rows of a JSON array without its brackets.
+    if mimetype == NDJSON_MIMETYPE:
+        return "".join(json.dumps(row, default=str) + "\n" for row in rows)
+    return ",".join(json.dumps(row, default=str) for row in rows)
+
 
 class APIExtension(AbstractController):
 
@@ -42,7 +108,7 @@ class APIExtension(AbstractController):
             try:
                 nb_row_inserted = self.create_table(
                     table_name,
-                    request.json,
+                    self._request_records(),
                     request.args.get("primary_key", default="", type=str),
                 )
 
@@ -63,6 +129,9 @@ class APIExtension(AbstractController):
             except NoJsonDataProvided:
                 logger.error("No JSON data provided")
                 return jsonify({"error": "No JSON data provided"}), 400
+            except json.JSONDecodeError:
+                logger.error("Invalid JSON data")
+                return jsonify({"error": "Invalid JSON data"}), 400
             except InchoherentStructure:
                 logger.error("Incoherent data structure")
                 return jsonify({"error": "incoherent data structure"}), 400
@@ -79,7 +148,7 @@ class APIExtension(AbstractController):
             try:
                 nb_row_inserted = self.insert(
                     table_name,
-                    request.json,
+                    self._request_records(),
                 )
 
                 logger.info(f"Inserted {nb_row_inserted} rows into table {table_name}")
@@ -97,6 +166,12 @@ class APIExtension(AbstractController):
             except NoJsonDataProvided:
                 logger.error("No JSON data provided")
                 return jsonify({"error": "No JSON data provided"}), 400
+            except json.JSONDecodeError:
+                logger.error("Invalid JSON data")
+                return jsonify({"error": "Invalid JSON data"}), 400
+            except InchoherentStructure:
+                logger.error("Incoherent data structure")
+                return jsonify({"error": "incoherent data structure"}), 400
             except InconsistentStructure as e:
                 logger.error(f"Inconsistent data structure: {e.comparison}")
                 return (
@@ -112,12 +187,71 @@ class APIExtension(AbstractController):
                     400,
                 )
 
+        @self.app.route("/upload/<table_name>", methods=["POST"])
+        def route_upload(table_name):
+            logger.info(f"Received upload for table: {table_name}")
+            upload_format = request.args.get("format", default="", type=str).lower()
+            if not upload_format:
+                upload_format = {
+                    "text/csv": "csv",
+                    "application/x-ndjson": "ndjson",
+                }.get(request.mimetype, "")
+
+            try:
+                if upload_format == "csv":
+                    records = iter_csv_records(
+                        request.stream,
+                        request.args.get("separator", default=",", type=str),
+                    )
+                elif upload_format == "ndjson":
+                    records = iter_ndjson_records(request.stream)
+                else:
+                    raise UnsupportedUploadFormat()
+
+                if table_name in self.tables("raw"):
+                    nb_row_inserted = self.insert(table_name, records)
+                else:
+                    nb_row_inserted = self.create_table(
+                        table_name,
+                        records,
+                        request.args.get("primary_key", default="", type=str),
+                    )
+
+                logger.info(f"Uploaded {nb_row_inserted} rows into table {table_name}")
+                return (
+                    jsonify(
+                        {
+                            "message": f"Uploaded {nb_row_inserted} rows in table {table_name}"
+                        }
+                    ),
+                    201,
+                )
+            except UnsupportedUploadFormat:
+                logger.error(f"Unsupported upload format: {upload_format}")
+                return (
+                    jsonify({"error": "Upload format must be either csv or ndjson"}),
+                    400,
+                )
+            except json.JSONDecodeError:
+                logger.error("Invalid NDJSON line in upload")
+                return jsonify({"error": "Invalid NDJSON data"}), 400
+            except InvalidTableName:
+                logger.error(f"Invalid table name: {table_name}")
+                return jsonify({"error": "Invalid table name"}), 400
+            except NoJsonDataProvided:
+                logger.error("No data provided")
+                return jsonify({"error": "No data provided"}), 400
+            except (InchoherentStructure, InconsistentStructure):
+                logger.error("Inconsistent data structure")
+                return jsonify({"error": "Inconsistent data structure"}), 400
+
         @self.app.route("/data_transformation")
         def route_data_transformation_all():
             logger.info("Received request for data transformation (all)")
             configs = StageConfiguration.get_all_configs_in_folder()
+            force = request.args.get("force", default="false", type=str) == "true"
             try:
-                self.process_data_transformation(configs)
+                result = self.process_data_transformation(configs, force)
             except StageConfigurationCycle:
                 logger.error("Found cycle in data transformation configuration files")
                 return (
@@ -133,21 +267,55 @@ class APIExtension(AbstractController):
             return (
                 jsonify(
                     {
-                        "message": f"{len(configs)} data transformations finished successfully"
+                        "message": f"{len(configs)} data transformations finished successfully",
+                        **result,
                     }
                 ),
                 200,
             )
 
+        @self.app.route("/data_transformation/plan")
+        def route_data_transformation_plan():
+            logger.info("Received request for data transformation plan")
+            configs = StageConfiguration.get_all_configs_in_folder()
+            force = request.args.get("force", default="false", type=str) == "true"
+            try:
+                plan = self.plan_data_transformation(configs, force)
+            except StageConfigurationCycle:
+                logger.error("Found cycle in data transformation configuration files")
+                return (
+                    jsonify(
+                        {
+                            "error": "Found cycle in data transformation configuration files"
+                        }
+                    ),
+                    400,
+                )
+
+            return jsonify({"stages": plan}), 200
+
+        @self.app.route("/data_transformation/verify")
+        def route_data_transformation_verify():
+            logger.info("Received request for data transformation verification")
+            configs = StageConfiguration.get_all_configs_in_folder()
+            report = self.verify_data_transformation(configs)
+            return jsonify({"datamarts": report}), 200
+
         @self.app.route("/data_transformation/<configuration>")
         def route_data_transformation(configuration):
             logger.info(f"Received request for data transformation: {configuration}")
+            force = request.args.get("force", default="false", type=str) == "true"
             config = StageConfiguration.load_from_toml(f"/staging/{configuration}.toml")
-            self.process_data_transformation([config])
+            result = self.process_data_transformation([config], force)
             logger.info(
                 f"Data transformation for {configuration} finished successfully"
             )
-            return jsonify({"message": "Data transformation finished successfully"})
+            return jsonify(
+                {
+                    "message": "Data transformation finished successfully",
+                    **result,
+                }
+            )
 
         @self.app.route("/")
         def route_index():
@@ -157,33 +325,35 @@ class APIExtension(AbstractController):
         @self.app.route("/query/<database>", methods=["POST"])
         def execute_query(database: str):
             # logger.info(f"Received query request for database: {database}")
-            if request.json is None:
-                logger.error("No JSON data provided")
-                return jsonify({"error": "No json data provided"}), 400
-            query = request.json.get("query")
-
-            if not query:
-                logger.error("No query provided")
-                return jsonify({"error": "No query provided"}), 400
+            error = query_request_error(request.get_json(silent=True))
+            if error:
+                logger.error(error)
+                return jsonify({"error": error}), 400
 
+            query = request.json.get("query")
             placeholders = request.json.get("placeholders")
             awaits_result = request.json.get("awaits_result", True)
+            stream = request.json.get("stream", False)
 
             try:
                 # logger.info(f"Executing query... : \n {query}\n")
                 # logger.info(f"With placeholders ... : \n {placeholders}\n")
 
+                if stream and awaits_result:
+                    batches = self.stream_query(
+                        database,
+                        query,
+                        placeholders,
+                        request.json.get("fetch_size"),
+                    )
+                    return self._streamed_response(batches), 200
+
                 results = self.query(database, query, placeholders, awaits_result)
 
                 # logger.info(
                 #     f"Query executed successfully on database: {database} -> returning {len(results)}"
                 # )
-                return (
-                    Response(
-                        json.dumps(results, default=str), mimetype="application/json"
-                    ),
-                    200,
-                )
+                return self._query_response(results), 200
             except InvalidTableName:
                 logger.error(f"Invalid table name provided for database: {database}")
                 return jsonify({"error": "Invalid table name provided"}), 400
@@ -203,6 +373,37 @@ class APIExtension(AbstractController):
                 logger.error(f"Unexpected error during query execution: {str(e)}")
                 raise e
 
+        @self.app.route("/query/<database>/batch", methods=["POST"])
+        def execute_query_batch(database: str):
+            error = batch_request_error(request.get_json(silent=True))
+            if error:
+                logger.error(error)
+                return jsonify({"error": error}), 400
+
+            statements = request.json.get("statements")
+            pipeline = request.json.get("pipeline", False)
+
+            try:
+                results = self.query_batch(database, statements, pipeline)
+                return (
+                    Response(
+                        json.dumps(results, default=str), mimetype="application/json"
+                    ),
+                    200,
+                )
+            except QueryRequired:
+                logger.error("Batch statement without query")
+                return jsonify({"error": "Every statement requires a query"}), 400
+            except InvalidDatabaseName:
+                logger.error(f"Invalid database name: {database}")
+                return jsonify({"error": "Invalid database name provided"}), 404
+            except UndefinedTable:
+                logger.error(f"Table is not defined in the database: {database}")
+                return jsonify({"error": "Table is not defined in the database"}), 404
+            except Exception as e:
+                logger.error(f"Unexpected error during batch execution: {str(e)}")
+                raise e
+
         @self.app.route("/view-table-association", methods=["GET"])
         def route_tables_views_association():
             logger.info("Received request for view-table association")
@@ -250,7 +451,102 @@ class APIExtension(AbstractController):
             except InvalidDatabaseName:
                 return jsonify({"error": "Invalid database name"}), 400
 
+        @self.app.route("/diagnostics/prepared-statements", methods=["GET"])
+        def get_prepared_statements_stats():
+            return jsonify(self.prepared_statements_stats()), 200
+
+        @self.app.route("/diagnostics/slow-queries", methods=["GET"])
+        def get_slow_queries():
+            return jsonify(self.slow_queries()), 200
+
+        @self.app.route("/diagnostics/slow-queries", methods=["DELETE"])
+        def clear_slow_queries():
+            self.clear_slow_queries()
+            return jsonify({"message": "Slow query log cleared"}), 200
+
+        @self.app.route("/diagnostics/result-cache", methods=["GET"])
+        def get_result_cache_stats():
+            return jsonify(self.result_cache_stats()), 200
+
+        @self.app.route("/indexes/<database>", methods=["GET"])
+        def route_get_indexes(database: str):
+            try:
+                return jsonify(self.get_indexes(database)), 200
+            except InvalidDatabaseName:
+                return jsonify({"error": "Invalid database name"}), 400
+
+        @self.app.route("/indexes/<database>", methods=["POST"])
+        def route_create_indexes(database: str):
+            # Without a list of indexes, the declared and foreign key ones are
+            # provisioned. Read queries given are timed before and after.
+            body = request.get_json(silent=True) or {}
+            try:
+                report = self.create_indexes(
+                    database, body.get("indexes"), body.get("queries")
+                )
+                return jsonify(report), 200
+            except InvalidDatabaseName:
+                return jsonify({"error": "Invalid database name"}), 400
+            except InvalidTableName:
+                return jsonify({"error": "Invalid index definition"}), 400
+            except WrongQueryType:
+                return jsonify({"error": "Only read queries can be measured"}), 400
+            except UndefinedTable:
+                return jsonify({"error": "Table is not defined in the database"}), 404
+
+        @self.app.route("/maintenance/compact", methods=["POST"])
+        def route_compact_transactions():
+            logger.info("Received request for transactions compaction")
+            retention_days = request.args.get("retention_days", type=float)
+            if retention_days is not None and retention_days < 0:
+                return jsonify({"error": "retention_days must be positive"}), 400
+            report = self.compact_transactions(retention_days)
+            return jsonify({"transactions_tables": report}), 200
+
+        @self.app.route("/maintenance/refresh", methods=["POST"])
+        def route_refresh_materializations():
+            logger.info("Received request for materialized views refresh")
+            force = request.args.get("force", default="false", type=str) == "true"
+            report = self.refresh_materializations(force)
+            return jsonify({"materialized_views": report}), 200
+
+    def _request_records(self) -> Iterator[Any]:
+        # The body is parsed while it is read, instead of going through
+        # `request.json`, so large uploads are never fully loaded.
+        if request.mimetype == "application/x-ndjson":
+            return iter_ndjson_records(request.stream)
+        return iter_json_records(request.stream)
+
+    def _query_response(self, results: list[dict] | None) -> Response:
+        body, mimetype = encode_query_results(results, request.accept_mimetypes)
+        return Response(body, mimetype=mimetype)
+
+    def _streamed_response(self, batches: Iterator[list[dict]]) -> Response:
+        # Pulling the first batch here runs the query, so that SQL errors are
+        # still turned into regular error responses by the route.
+        first_batch = next(batches, [])
+        batches = chain([first_batch], batches)
+
+        mimetype = stream_mimetype(request.accept_mimetypes)
+
+        def generate_ndjson():
+            for batch in batches:
+                yield encode_stream_rows(batch, mimetype)
+
+        def generate_json():
+            yield "["
+            separator = ""
+            for batch in batches:
+                if batch:
+                    yield separator + encode_stream_rows(batch, mimetype)
+                    separator = ","
+            yield "]"
+
+        if mimetype == NDJSON_MIMETYPE:
+            return Response(generate_ndjson(), mimetype=mimetype)
+        return Response(generate_json(), mimetype=mimetype)
+
     def run(self):
         logger.info("Starting API server")
-        self.app.run(host=self.host, debug=self.debug)
+        self.app.run(host=self.host, debug=self.debug, threaded=True)
         return self
@@ -0,0 +1,512 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from psycopg.errors import DuplicateTable, UndefinedTable
+from quart import Quart, Response, jsonify, request
+
+from .abstract_controller import AbstractAsyncController
+from .api_extension import (
+    NDJSON_MIMETYPE,
+    InvalidTableName,
+    NoJsonDataProvided,
+    QueryRequired,
+    TableNotFoundError,
+    UnsupportedUploadFormat,
+    batch_request_error,
+    encode_query_results,
+    encode_stream_rows,
+    query_request_error,
+    stream_mimetype,
+)
+from ..databridging import StageConfiguration, StageConfigurationCycle
+from ..utils import (
+    InchoherentStructure,
+    InconsistentStructure,
+    InvalidDatabaseName,
+    read_csv_records,
+    read_ndjson_records,
+    WrongQueryType,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIExtension(AbstractAsyncController):
+    # Same routes as `APIExtension`, served by an ASGI application. Queries go
+    # through the async connection pools; the other operations keep using the
+    # blocking controller and run in worker threads.
+
+    def __init__(self, host="0.0.0.0", port=5000) -> None:
+        logger.info("Initializing AsyncAPIExtension")
+        self.app = Quart("AsyncAPIControllers")
+        self.host = host
+        self.port = port
+        self._setup_routes()
+
+    def _setup_routes(self):
+        logger.info("Setting up async routes")
+
+        @self.app.before_serving
+        async def open_connections():
+            await self.open_async_connections()
+
+        @self.app.after_serving
+        async def close_connections():
+            await self.close_async_connections()
+
+        @self.app.route("/create_table/fromjson/<table_name>", methods=["POST"])
+        async def route_create_table(table_name):
+            logger.info(f"Received request to create table: {table_name}")
+            try:
+                nb_row_inserted = await asyncio.to_thread(
+                    self.create_table,
+                    table_name,
+                    await request.get_json(),
+                    request.args.get("primary_key", default="", type=str),
+                )
+
+                logger.info(
+                    f"Table {table_name} created successfully with {nb_row_inserted} rows inserted"
+                )
+                return (
+                    jsonify(
+                        {
+                            "message": f"Table {table_name} created successfully and inserted {nb_row_inserted} rows"
+                        }
+                    ),
+                    201,
+                )
+            except InvalidTableName:
+                logger.error(f"Invalid table name: {table_name}")
+                return jsonify({"error": "Invalid table name"}), 400
+            except NoJsonDataProvided:
+                logger.error("No JSON data provided")
+                return jsonify({"error": "No JSON data provided"}), 400
+            except InchoherentStructure:
+                logger.error("Incoherent data structure")
+                return jsonify({"error": "incoherent data structure"}), 400
+            except DuplicateTable:
+                logger.error(f"Table {table_name} already exists")
+                return (
+                    jsonify({"error": "Table already exist"}),
+                    400,
+                )
+
+        @self.app.route("/insert/fromjson/<table_name>", methods=["POST"])
+        async def route_insert(table_name):
+            logger.info(f"Received request to insert into table: {table_name}")
+            try:
+                nb_row_inserted = await asyncio.to_thread(
+                    self.insert,
+                    table_name,
+                    await request.get_json(),
+                )
+
+                logger.info(f"Inserted {nb_row_inserted} rows into table {table_name}")
+                return (
+                    jsonify(
+                        {
+                            "message": f"Inserted {nb_row_inserted} rows in table {table_name}"
+                        }
+                    ),
+                    201,
+                )
+            except InvalidTableName:
+                logger.error(f"Invalid table name: {table_name}")
+                return jsonify({"error": "Invalid table name"}), 400
+            except NoJsonDataProvided:
+                logger.error("No JSON data provided")
+                return jsonify({"error": "No JSON data provided"}), 400
+            except InchoherentStructure:
+                logger.error("Incoherent data structure")
+                return jsonify({"error": "incoherent data structure"}), 400
+            except InconsistentStructure as e:
+                logger.error(f"Inconsistent data structure: {e.comparison}")
+                return (
+                    jsonify(
+                        {"error": "Inconsitent data structure", "info": e.comparison}
+                    ),
+                    400,
+                )
+            except DuplicateTable:
+                logger.error(f"Table {table_name} already exists")
+                return (
+                    jsonify({"error": "Table already exist"}),
+                    400,
+                )
+
+        @self.app.route("/upload/<table_name>", methods=["POST"])
+        async def route_upload(table_name):
+            logger.info(f"Received upload for table: {table_name}")
+            upload_format = request.args.get("format", default="", type=str).lower()
+            if not upload_format:
+                upload_format = {
+                    "text/csv": "csv",
+                    "application/x-ndjson": "ndjson",
+                }.get(request.mimetype, "")
+
+            try:
+                if upload_format == "csv":
+                    records = read_csv_records(
+                        await request.get_data(as_text=True),
+                        request.args.get("separator", default=",", type=str),
+                    )
+                elif upload_format == "ndjson":
+                    records = read_ndjson_records(await request.get_data(as_text=True))
+                else:
+                    raise UnsupportedUploadFormat()
+
+                if table_name in await asyncio.to_thread(self.tables, "raw"):
+                    nb_row_inserted = await asyncio.to_thread(
+                        self.insert, table_name, records
+                    )
+                else:
+                    nb_row_inserted = await asyncio.to_thread(
+                        self.create_table,
+                        table_name,
+                        records,
+                        request.args.get("primary_key", default="", type=str),
+                    )
+
+                logger.info(f"Uploaded {nb_row_inserted} rows into table {table_name}")
+                return (
+                    jsonify(
+                        {
+                            "message": f"Uploaded {nb_row_inserted} rows in table {table_name}"
+                        }
+                    ),
+                    201,
+                )
+            except UnsupportedUploadFormat:
+                logger.error(f"Unsupported upload format: {upload_format}")
+                return (
+                    jsonify({"error": "Upload format must be either csv or ndjson"}),
+                    400,
+                )
+            except json.JSONDecodeError:
+                logger.error("Invalid NDJSON line in upload")
+                return jsonify({"error": "Invalid NDJSON data"}), 400
+            except InvalidTableName:
+                logger.error(f"Invalid table name: {table_name}")
+                return jsonify({"error": "Invalid table name"}), 400
+            except NoJsonDataProvided:
+                logger.error("No data provided")
+                return jsonify({"error": "No data provided"}), 400
+            except (InchoherentStructure, InconsistentStructure):
+                logger.error("Inconsistent data structure")
+                return jsonify({"error": "Inconsistent data structure"}), 400
+
+        @self.app.route("/data_transformation")
+        async def route_data_transformation_all():
+            logger.info("Received request for data transformation (all)")
+            configs = StageConfiguration.get_all_configs_in_folder()
+            force = request.args.get("force", default="false", type=str) == "true"
+            try:
+                result = await asyncio.to_thread(
+                    self.process_data_transformation, configs, force
+                )
+            except StageConfigurationCycle:
+                logger.error("Found cycle in data transformation configuration files")
+                return (
+                    jsonify(
+                        {
+                            "error": "Found cycle in data transformation configuration files"
+                        }
+                    ),
+                    400,
+                )
+
+            logger.info(f"{len(configs)} data transformations finished successfully")
+            return (
+                jsonify(
+                    {
+                        "message": f"{len(configs)} data transformations finished successfully",
+                        **result,
+                    }
+                ),
+                200,
+            )
+
+        @self.app.route("/data_transformation/plan")
+        async def route_data_transformation_plan():
+            logger.info("Received request for data transformation plan")
+            configs = StageConfiguration.get_all_configs_in_folder()
+            force = request.args.get("force", default="false", type=str) == "true"
+            try:
+                plan = await asyncio.to_thread(
+                    self.plan_data_transformation, configs, force
+                )
+            except StageConfigurationCycle:
+                logger.error("Found cycle in data transformation configuration files")
+                return (
+                    jsonify(
+                        {
+                            "error": "Found cycle in data transformation configuration files"
+                        }
+                    ),
+                    400,
+                )
+
+            return jsonify({"stages": plan}), 200
+
+        @self.app.route("/data_transformation/verify")
+        async def route_data_transformation_verify():
+            logger.info("Received request for data transformation verification")
+            configs = StageConfiguration.get_all_configs_in_folder()
+            report = await asyncio.to_thread(self.verify_data_transformation, configs)
+            return jsonify({"datamarts": report}), 200
+
+        @self.app.route("/data_transformation/<configuration>")
+        async def route_data_transformation(configuration):
+            logger.info(f"Received request for data transformation: {configuration}")
+            force = request.args.get("force", default="false", type=str) == "true"
+            config = StageConfiguration.load_from_toml(f"/staging/{configuration}.toml")
+            result = await asyncio.to_thread(
+                self.process_data_transformation, [config], force
+            )
+            logger.info(
+                f"Data transformation for {configuration} finished successfully"
+            )
+            return jsonify(
+                {
+                    "message": "Data transformation finished successfully",
+                    **result,
+                }
+            )
+
+        @self.app.route("/")
+        async def route_index():
+            logger.info("Received request for index")
+            return "<h1>API is alive</h1?", 200
+
+        @self.app.route("/query/<database>", methods=["POST"])
+        async def execute_query(database: str):
+            data = await request.get_json(silent=True)
+            error = query_request_error(data)
+            if error:
+                logger.error(error)
+                return jsonify({"error": error}), 400
+
+            query = data.get("query")
+            placeholders = data.get("placeholders")
+            awaits_result = data.get("awaits_result", True)
+            stream = data.get("stream", False)
+
+            try:
+                if stream and awaits_result:
+                    batches = self.async_stream_query(
+                        database,
+                        query,
+                        placeholders,
+                        data.get("fetch_size"),
+                    )
+                    return await self._streamed_response(batches), 200
+
+                results = await self.async_query(
+                    database, query, placeholders, awaits_result
+                )
+                return self._query_response(results), 200
+            except InvalidTableName:
+                logger.error(f"Invalid table name provided for database: {database}")
+                return jsonify({"error": "Invalid table name provided"}), 400
+            except TableNotFoundError:
+                logger.error(f"Requested table not found in the database: {database}")
+                return (
+                    jsonify({"error": "Requested table not found in the database"}),
+                    404,
+                )
+            except InvalidDatabaseName:
+                logger.error(f"Invalid database name: {database}")
+                return jsonify({"error": "Invalid database name provided"}), 404
+            except UndefinedTable:
+                logger.error(f"Table is not defined in the database: {database}")
+                return jsonify({"error": "Table is not defined in the database"}), 404
+            except Exception as e:
+                logger.error(f"Unexpected error during query execution: {str(e)}")
+                raise e
+
+        @self.app.route("/query/<database>/batch", methods=["POST"])
+        async def execute_query_batch(database: str):
+            data = await request.get_json(silent=True)
+            error = batch_request_error(data)
+            if error:
+                logger.error(error)
+                return jsonify({"error": error}), 400
+
+            statements = data.get("statements")
+            pipeline = data.get("pipeline", False)
+
+            try:
+                results = await self.async_query_batch(database, statements, pipeline)
+                return (
+                    Response(
+                        json.dumps(results, default=str), mimetype="application/json"
+                    ),
+                    200,
+                )
+            except QueryRequired:
+                logger.error("Batch statement without query")
+                return jsonify({"error": "Every statement requires a query"}), 400
+            except InvalidDatabaseName:
+                logger.error(f"Invalid database name: {database}")
+                return jsonify({"error": "Invalid database name provided"}), 404
+            except UndefinedTable:
+                logger.error(f"Table is not defined in the database: {database}")
+                return jsonify({"error": "Table is not defined in the database"}), 404
+            except Exception as e:
+                logger.error(f"Unexpected error during batch execution: {str(e)}")
+                raise e
+
+        @self.app.route("/view-table-association", methods=["GET"])
+        async def route_tables_views_association():
+            logger.info("Received request for view-table association")
+            return self.view_table_association()
+
+        @self.app.route("/tables/<database>", methods=["GET"])
+        async def get_tables(database: str):
+            return await asyncio.to_thread(self.tables, database), 200
+
+        @self.app.route("/transformation_occured", methods=["GET"])
+        async def get_transformation_occured():
+            return (
+                jsonify({"transformation_occured": self.get_transformation_occured()}),
+                200,
+            )
+
+        @self.app.route("/transactions_tables", methods=["GET"])
+        async def get_transaction_tables():
+            return (
+                jsonify(await asyncio.to_thread(self.transactions_tables)),
+                200,
+            )
+
+        @self.app.route("/schema/<database>/<table_name>", methods=["GET"])
+        async def get_detailed_table_schema(database: str, table_name: str):
+            logger.info(f"Fetching detailed schema for {table_name} in {database}")
+            try:
+                column_info = await asyncio.to_thread(
+                    self.get_column_info, table_name, database
+                )
+                return jsonify(column_info), 200
+            except InvalidTableName:
+                return (
+                    jsonify({"error": f"Table {table_name} not found in {database}"}),
+                    404,
+                )
+            except InvalidDatabaseName:
+                return jsonify({"error": "Invalid database name"}), 400
+
+        @self.app.route("/schema/<database>", methods=["GET"])
+        async def get_detailed_schema(database: str):
+            logger.info(f"Fetching detailed schema in {database}")
+            try:
+                column_info = await asyncio.to_thread(
+                    self.get_tables_columns_info, database
+                )
+                return jsonify(column_info), 200
+
+            except InvalidDatabaseName:
+                return jsonify({"error": "Invalid database name"}), 400
+
+        @self.app.route("/diagnostics/prepared-statements", methods=["GET"])
+        async def get_prepared_statements_stats():
+            return jsonify(self.prepared_statements_stats()), 200
+
+        @self.app.route("/diagnostics/slow-queries", methods=["GET"])
+        async def get_slow_queries():
+            return jsonify(self.slow_queries()), 200
+
+        @self.app.route("/diagnostics/slow-queries", methods=["DELETE"])
+        async def clear_slow_queries():
+            self.clear_slow_queries()
+            return jsonify({"message": "Slow query log cleared"}), 200
+
+        @self.app.route("/diagnostics/result-cache", methods=["GET"])
+        async def get_result_cache_stats():
+            return jsonify(self.result_cache_stats()), 200
+
+        @self.app.route("/indexes/<database>", methods=["GET"])
+        async def route_get_indexes(database: str):
+            try:
+                return jsonify(await asyncio.to_thread(self.get_indexes, database)), 200
+            except InvalidDatabaseName:
+                return jsonify({"error": "Invalid database name"}), 400
+
+        @self.app.route("/indexes/<database>", methods=["POST"])
+        async def route_create_indexes(database: str):
+            # Without a list of indexes, the declared and foreign key ones are
+            # provisioned. Read queries given are timed before and after.
+            body = await request.get_json(silent=True) or {}
+            try:
+                report = await asyncio.to_thread(
+                    self.create_indexes,
+                    database,
+                    body.get("indexes"),
+                    body.get("queries"),
+                )
+                return jsonify(report), 200
+            except InvalidDatabaseName:
+                return jsonify({"error": "Invalid database name"}), 400
+            except InvalidTableName:
+                return jsonify({"error": "Invalid index definition"}), 400
+            except WrongQueryType:
+                return jsonify({"error": "Only read queries can be measured"}), 400
+            except UndefinedTable:
+                return jsonify({"error": "Table is not defined in the database"}), 404
+
+        @self.app.route("/maintenance/compact", methods=["POST"])
+        async def route_compact_transactions():
+            logger.info("Received request for transactions compaction")
+            retention_days = request.args.get("retention_days", type=float)
+            if retention_days is not None and retention_days < 0:
+                return jsonify({"error": "retention_days must be positive"}), 400
+            report = await asyncio.to_thread(self.compact_transactions, retention_days)
+            return jsonify({"transactions_tables": report}), 200
+
+        @self.app.route("/maintenance/refresh", methods=["POST"])
+        async def route_refresh_materializations():
+            logger.info("Received request for materialized views refresh")
+            force = request.args.get("force", default="false", type=str) == "true"
+            report = await asyncio.to_thread(self.refresh_materializations, force)
+            return jsonify({"materialized_views": report}), 200
+
+    def _query_response(self, results: list[dict] | None) -> Response:
+        body, mimetype = encode_query_results(results, request.accept_mimetypes)
+        return Response(body, mimetype=mimetype)
+
+    async def _streamed_response(self, batches: AsyncIterator[list[dict]]) -> Response:
+        first_batch = await anext(batches, [])
+
+        mimetype = stream_mimetype(request.accept_mimetypes)
+
+        async def generate_ndjson():
+            yield encode_stream_rows(first_batch, mimetype)
+            async for batch in batches:
+                yield encode_stream_rows(batch, mimetype)
+
+        async def generate_json():
+            yield "["
+            separator = ""
+            if first_batch:
+                yield encode_stream_rows(first_batch, mimetype)
+                separator = ","
+            async for batch in batches:
+                if batch:
+                    yield separator + encode_stream_rows(batch, mimetype)
+                    separator = ","
+            yield "]"
+
+        if mimetype == NDJSON_MIMETYPE:
+            return Response(generate_ndjson(), mimetype=mimetype)
+        return Response(generate_json(), mimetype=mimetype)
+
+    def run(self):
+        logger.info("Starting async API server")
+        config = Config()
+        config.bind = [f"{self.host}:{self.port}"]
+        asyncio.run(serve(self.app, config))
+        return self
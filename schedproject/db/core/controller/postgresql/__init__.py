@@ -1,10 +1,13 @@
 from .controller import PostgreSQLController
 from .api_controller import PostgreSQLAPIController
-from .utils import OverwriteStrategy, CSVActionType
+from .async_api_controller import PostgreSQLAsyncAPIController
+from .utils import OverlayStrategy, OverwriteStrategy, CSVActionType
 
 __all__ = [
     "PostgreSQLController",
     "PostgreSQLAPIController",
+    "PostgreSQLAsyncAPIController",
     "OverwriteStrategy",
+    "OverlayStrategy",
     "CSVActionType",
 ]
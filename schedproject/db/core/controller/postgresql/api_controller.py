@@ -1,8 +1,9 @@
 import logging
 
 from ..api_extension import APIExtension
+from ...dbconnector import PostgresqlDBConnector
 from ...utils import TransactionStrategy
-from .utils import OverwriteStrategy
+from .utils import OverlayStrategy, OverwriteStrategy
 from .controller import PostgreSQLController
 
 logger = logging.getLogger(__name__)
@@ -17,6 +18,12 @@ class PostgreSQLAPIController(PostgreSQLController, APIExtension):
         port: str,
         transaction_strategy: TransactionStrategy = TransactionStrategy.PER_TABLE,
         overwrite_strategy: OverwriteStrategy = OverwriteStrategy.PRESERVE,
+        overlay_strategy: OverlayStrategy = OverlayStrategy.VIEW,
+        pool_min_size: int = PostgresqlDBConnector.DEFAULT_POOL_MIN_SIZE,
+        pool_max_size: int = PostgresqlDBConnector.DEFAULT_POOL_MAX_SIZE,
+        pool_timeout: float = PostgresqlDBConnector.DEFAULT_POOL_TIMEOUT,
+        prepared_statements_cache_size: int = PostgresqlDBConnector.DEFAULT_PREPARED_STATEMENTS_CACHE_SIZE,
+        bootstrap: bool = True,
     ) -> None:
         logger.info("Initializing PostgreSQLAPIController")
         PostgreSQLController.__init__(
@@ -27,6 +34,12 @@ class PostgreSQLAPIController(PostgreSQLController, APIExtension):
             port=port,
             transaction_strategy=transaction_strategy,
             overwrite_strategy=overwrite_strategy,
+            overlay_strategy=overlay_strategy,
+            pool_min_size=pool_min_size,
+            pool_max_size=pool_max_size,
+            pool_timeout=pool_timeout,
+            prepared_statements_cache_size=prepared_statements_cache_size,
+            bootstrap=bootstrap,
         )
         APIExtension.__init__(self)
         logger.info("PostgreSQLAPIController initialized successfully")
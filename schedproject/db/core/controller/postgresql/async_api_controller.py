@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, override
+
+from ..api_extension import QueryRequired
+from ..async_api_extension import AsyncAPIExtension
+from ...dbconnector import AsyncPostgresqlDBConnector, PostgresqlDBConnector
+from ...result_cache import QueryResultCache
+from ...utils import (
+    InvalidDatabaseName,
+    TransactionStrategy,
+    WrongQueryType,
+    is_cacheable_query,
+    referenced_identifiers,
+)
+from .schema_management import SchemaManager
+from .utils import OverlayStrategy, OverwriteStrategy
+from .controller import PostgreSQLController
+
+logger = logging.getLogger(__name__)
+
+
+class PostgreSQLAsyncAPIController(PostgreSQLController, AsyncAPIExtension):
+    def __init__(
+        self,
+        user: str,
+        password: str,
+        host: str,
+        port: str,
+        transaction_strategy: TransactionStrategy = TransactionStrategy.PER_TABLE,
+        overwrite_strategy: OverwriteStrategy = OverwriteStrategy.PRESERVE,
+        overlay_strategy: OverlayStrategy = OverlayStrategy.VIEW,
+        pool_min_size: int = PostgresqlDBConnector.DEFAULT_POOL_MIN_SIZE,
+        pool_max_size: int = PostgresqlDBConnector.DEFAULT_POOL_MAX_SIZE,
+        pool_timeout: float = PostgresqlDBConnector.DEFAULT_POOL_TIMEOUT,
+        prepared_statements_cache_size: int = PostgresqlDBConnector.DEFAULT_PREPARED_STATEMENTS_CACHE_SIZE,
+        bootstrap: bool = True,
+    ) -> None:
+        logger.info("Initializing PostgreSQLAsyncAPIController")
+        PostgreSQLController.__init__(
+            self,
+            user=user,
+            password=password,
+            host=host,
+            port=port,
+            transaction_strategy=transaction_strategy,
+            overwrite_strategy=overwrite_strategy,
+            overlay_strategy=overlay_strategy,
+            pool_min_size=pool_min_size,
+            pool_max_size=pool_max_size,
+            pool_timeout=pool_timeout,
+            prepared_statements_cache_size=prepared_statements_cache_size,
+            bootstrap=bootstrap,
+        )
+        self.adbc_raw = AsyncPostgresqlDBConnector(self.dbc_raw)
+        self.adbc_warehouse = AsyncPostgresqlDBConnector(self.dbc_warehouse)
+        AsyncAPIExtension.__init__(self)
+        logger.info("PostgreSQLAsyncAPIController initialized successfully")
+
+    def _async_connector(self, database: str) -> AsyncPostgresqlDBConnector:
+        if database.lower() not in ["raw", "warehouse"]:
+            logger.error(f"Invalid database name: {database}")
+            raise InvalidDatabaseName("Database must be either 'raw' or 'warehouse'")
+        return self.adbc_raw if database.lower() == "raw" else self.adbc_warehouse
+
+    @override
+    async def open_async_connections(self) -> None:
+        await self.adbc_raw.open()
+        await self.adbc_warehouse.open()
+
+    @override
+    async def close_async_connections(self) -> None:
+        await self.adbc_raw.close_connection()
+        await self.adbc_warehouse.close_connection()
+
+    @override
+    async def async_query(
+        self,
+        database: str,
+        query: str,
+        placeholders: list[Any] | None = None,
+        awaits_result: bool = True,
+    ) -> list[dict[str, Any]]:
+        adbc = self._async_connector(database)
+
+        if self.result_cache and awaits_result and is_cacheable_query(query):
+            return await self._async_cached_query(
+                database.lower(), adbc, query, placeholders
+            )
+
+        result = await adbc.execute_query(
+            query, placeholders=placeholders, awaits_result=awaits_result
+        )
+
+        if awaits_result:
+            if isinstance(result, list):
+                return result
+            raise WrongQueryType(
+                f"Query should return list when awaits_result=True, got {type(result)}"
+            )
+        if result is None:
+            return []
+        logger.error(f"Non-result query returned unexpected data: {result}")
+        raise WrongQueryType(
+            f"Query should return None when awaits_result=False, got {type(result)}"
+        )
+
+    async def _async_cached_query(
+        self,
+        database: str,
+        adbc: AsyncPostgresqlDBConnector,
+        query: str,
+        placeholders: list[Any] | None,
+    ) -> list[dict[str, Any]]:
+        # Same cache as `query`, writes made through either connector of a
+        # database invalidate it.
+        key = QueryResultCache.make_key(database, query, placeholders)
+        result = self.result_cache.get(key)
+        if result is not None:
+            return result
+
+        generation = self.result_cache.generation
+        result = await adbc.execute_query(
+            query, placeholders=placeholders, awaits_result=True
+        )
+        if not isinstance(result, list):
+            raise WrongQueryType(
+                f"Query should return list when awaits_result=True, got {type(result)}"
+            )
+
+        # Reading the catalog when the schema changed would block the loop.
+        tables = await asyncio.to_thread(
+            SchemaManager.get_relations_closure,
+            adbc.dbc,
+            referenced_identifiers(query),
+        )
+        self.result_cache.put(key, result, tables, generation)
+        return result
+
+    @override
+    async def async_query_batch(
+        self,
+        database: str,
+        statements: list[dict[str, Any]],
+        pipeline: bool = False,
+    ) -> list[list[dict[str, Any]]]:
+        adbc = self._async_connector(database)
+
+        batch = []
+        for statement in statements:
+            if not statement.get("query"):
+                logger.error("Batch statement without query")
+                raise QueryRequired()
+            batch.append(
+                (
+                    statement["query"],
+                    statement.get("placeholders"),
+                    statement.get("awaits_result", True),
+                )
+            )
+
+        results = await adbc.execute_batch(batch, pipeline=pipeline)
+        return [result if result is not None else [] for result in results]
+
+    @override
+    def async_stream_query(
+        self,
+        database: str,
+        query: str,
+        placeholders: list[Any] | None = None,
+        fetch_size: int | None = None,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        adbc = self._async_connector(database)
+
+        return adbc.stream_query(
+            query,
+            placeholders=placeholders,
+            fetch_size=fetch_size or PostgresqlDBConnector.DEFAULT_FETCH_SIZE,
+        )
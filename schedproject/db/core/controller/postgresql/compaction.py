@@ -0,0 +1,231 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any
+
+from .manifest import ManifestManager
+
+logger = logging.getLogger(__name__)
+
+
+class CompactionManager:
+    HISTORY_TABLE = f"{ManifestManager.MANIFEST_SCHEMA}.transactions_history"
+    # Set for the transaction moving transactions out of a transaction table,
+    # the sync triggers of materialized overlays do nothing while it is on.
+    COMPACTING_SETTING = "etl.compacting"
+    TRANSACTION_COLUMNS = (
+        "id, target_table, target_column, target_id, new_value, action, created_at"
+    )
+
+    @staticmethod
+    def snapshot_table_name(transaction_table: str) -> str:
+        return f"{ManifestManager.MANIFEST_SCHEMA}.{transaction_table}_snapshot"
+
+    @staticmethod
+    def create_history_table(controller: Any) -> None:
+        # Archived transactions of every transaction table, partitioned by
+        # month of creation so old partitions can be detached or dropped.
+        controller.dbc_warehouse.execute_query(
+            f"""
+            CREATE SCHEMA IF NOT EXISTS {ManifestManager.MANIFEST_SCHEMA};
+            CREATE TABLE IF NOT EXISTS {CompactionManager.HISTORY_TABLE} (
+                transaction_table TEXT NOT NULL,
+                id INTEGER,
+                target_table VARCHAR(50),
+                target_column VARCHAR(50),
+                target_id INTEGER,
+                new_value VARCHAR(255),
+                action VARCHAR(10),
+                created_at TIMESTAMP,
+                compacted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) PARTITION BY RANGE (created_at);
+            CREATE TABLE IF NOT EXISTS {CompactionManager.HISTORY_TABLE}_default
+            PARTITION OF {CompactionManager.HISTORY_TABLE} DEFAULT;
+            """
+        )
+
+    @staticmethod
+    def create_snapshot_table(controller: Any, transaction_table: str) -> None:
+        # Latest compacted transaction of every (row, column), read by the
+        # overlays together with the live transactions.
+        snapshot_table = CompactionManager.snapshot_table_name(transaction_table)
+        controller.dbc_warehouse.execute_query(
+            f"""
+            CREATE TABLE IF NOT EXISTS {snapshot_table}
+            (LIKE {transaction_table});
+            CREATE UNIQUE INDEX IF NOT EXISTS {transaction_table}_snapshot_id_idx
+            ON {snapshot_table} (id);
+            CREATE INDEX IF NOT EXISTS {transaction_table}_snapshot_target_idx
+            ON {snapshot_table} (UPPER(target_table), (target_id::text));
+            """
+        )
+
+    @staticmethod
+    def transactions_query(transaction_table: str) -> str:
+        columns = CompactionManager.TRANSACTION_COLUMNS
+        return f"""
+            SELECT {columns} FROM {transaction_table}
+            UNION ALL
+            SELECT {columns}
+            FROM {CompactionManager.snapshot_table_name(transaction_table)}
+        """
+
+    @staticmethod
+    def compact(controller: Any, retention_days: float) -> dict[str, dict[str, Any]]:
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        # Every overlay creates the snapshot of its transaction table, which
+        # finds them even before the view/table association is known.
+        snapshots = controller.dbc_warehouse.execute_query(
+            """
+            SELECT table_name FROM information_schema.tables
+            WHERE table_schema = %s AND table_name LIKE '%%\\_snapshot';
+            """,
+            placeholders=[ManifestManager.MANIFEST_SCHEMA],
+            awaits_result=True,
+        )
+        tables = controller.tables("warehouse")
+        transaction_tables = sorted(
+            row["table_name"].removesuffix("_snapshot")
+            for row in snapshots or []
+            if row["table_name"].removesuffix("_snapshot") in tables
+        )
+
+        report = {}
+        for transaction_table in transaction_tables:
+            report[transaction_table] = CompactionManager.compact_table(
+                controller, transaction_table, cutoff
+            )
+        return report
+
+    @staticmethod
+    def compact_table(
+        controller: Any, transaction_table: str, cutoff: datetime
+    ) -> dict[str, Any]:
+        # Moves the transactions older than `cutoff` to the history and to the
+        # snapshot, where only the latest one of every (row, column) is kept.
+        # Overlays rank transactions the same way, so what they show does not
+        # change.
+        logger.info(f"Compacting {transaction_table} before {cutoff}")
+        dbc = controller.dbc_warehouse
+        snapshot_table = CompactionManager.snapshot_table_name(transaction_table)
+        columns = CompactionManager.TRANSACTION_COLUMNS
+        CompactionManager.create_snapshot_table(controller, transaction_table)
+
+        months = dbc.execute_query(
+            f"""
+            SELECT DISTINCT date_trunc('month', created_at) AS month
+            FROM {transaction_table} WHERE created_at < %s;
+            """,
+            placeholders=[cutoff],
+            awaits_result=True,
+        )
+        for row in months or []:
+            CompactionManager._create_history_partition(controller, row["month"])
+
+        results = dbc.execute_batch(
+            [
+                # Skips the triggers of materialized overlays for this
+                # transaction only, they would refresh rows that cannot change.
+                (
+                    f"SET LOCAL {CompactionManager.COMPACTING_SETTING} = 'on';",
+                    None,
+                    False,
+                ),
+                (
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM {transaction_table} WHERE created_at < %s
+                        RETURNING {columns}
+                    ),
+                    archived AS (
+                        INSERT INTO {CompactionManager.HISTORY_TABLE}
+                            (transaction_table, {columns})
+                        SELECT %s, {columns} FROM moved
+                    )
+                    INSERT INTO {snapshot_table} ({columns})
+                    SELECT {columns} FROM moved;
+                    """,
+                    [cutoff, transaction_table],
+                    False,
+                ),
+                # Statistics of the freshly filled snapshot keep the planner
+                # away from nested loops on the next statement.
+                (f"ANALYZE {snapshot_table};", None, False),
+                (
+                    f"""
+                    DELETE FROM {snapshot_table} s
+                    USING (
+                        SELECT
+                            id,
+                            ROW_NUMBER() OVER (PARTITION BY target_table,
+                                target_id,
+                                target_column ORDER BY created_at DESC,
+                                id DESC) AS rn
+                        FROM {snapshot_table}
+                    ) AS ranked
+                    WHERE s.id = ranked.id AND ranked.rn > 1;
+                    """,
+                    None,
+                    False,
+                ),
+                (
+                    f"""
+                    SELECT
+                        (SELECT count(*) FROM {transaction_table}) AS live,
+                        (SELECT count(*) FROM {snapshot_table}) AS snapshot;
+                    """,
+                    None,
+                    True,
+                ),
+            ]
+        )
+        counts = results[-1][0]
+
+        logger.info(
+            f"Compacted {transaction_table}: {counts['live']} live transactions, "
+            f"{counts['snapshot']} in snapshot"
+        )
+        return {
+            "cutoff": cutoff.isoformat(),
+            "live": counts["live"],
+            "snapshot": counts["snapshot"],
+        }
+
+    @staticmethod
+    def _create_history_partition(controller: Any, month: datetime) -> None:
+        start = month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end = (start + timedelta(days=32)).replace(day=1)
+        partition = f"{CompactionManager.HISTORY_TABLE}_{start:%Y_%m}"
+
+        exists = controller.dbc_warehouse.execute_query(
+            "SELECT to_regclass(%s) IS NOT NULL AS exists;",
+            placeholders=[partition],
+            awaits_result=True,
+        )
+        if exists[0]["exists"]:
+            return
+
+        logger.info(f"Creating history partition {partition}")
+        controller.dbc_warehouse.execute_query(
+            f"""
+            CREATE TABLE {partition}
+            PARTITION OF {CompactionManager.HISTORY_TABLE}
+            FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}');
+            """
+        )
+
+    @staticmethod
+    def schedule(controller: Any, interval_hours: float) -> threading.Timer:
+        def run() -> None:
+            try:
+                controller.compact_transactions()
+            except Exception as e:
+                logger.error(f"Scheduled compaction failed: {str(e)}")
+            controller._compaction_timer = CompactionManager.schedule(
+                controller, interval_hours
+            )
+
+        timer = threading.Timer(interval_hours * 3600, run)
+        timer.daemon = True
+        timer.start()
+        return timer
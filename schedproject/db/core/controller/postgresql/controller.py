@@ -1,13 +1,16 @@
 import logging
 import os
-import re
-from typing import Any, Optional, override
+import time
+from functools import partial
+from itertools import chain, islice
+from typing import Any, Iterable, Iterator, Optional, override
 
 from psycopg.errors import DuplicateTable
 
 from core.controller.api_extension import (
     InvalidTableName,
     NoJsonDataProvided,
+    QueryRequired,
     TableNotFoundError,
 )
 from core.controller.postgresql.csv_processing import CSVProcessor
@@ -16,7 +19,10 @@ from core.databridging.staging import StageConfigurationCycle
 
 from ..abstract_controller import AbstractController
 from ...dbconnector import DBConnector, PostgresqlDBConnector
-from ...databridging import StageConfiguration
+from ...result_cache import QueryResultCache
+from ...slow_query_log import SlowQueryLog
+from ...statement_sampling import StatementSampler
+from ...databridging import StageConfiguration, StagingPlanner
 from ...utils import (
     InconsistentStructure,
     InvalidDatabaseName,
@@ -25,21 +31,48 @@ from ...utils import (
     TransactionStrategy,
     WrongQueryType,
     compare_dictionaries,
+    is_cacheable_query,
+    is_ddl_statement,
     is_valid_table_name,
-    read_csv,
+    referenced_identifiers,
 )
 
-from .utils import CSVActionType, OverwriteStrategy, UtilsPotsgreSQLController
+from .utils import (
+    CSVActionType,
+    OverlayStrategy,
+    OverwriteStrategy,
+    UtilsPotsgreSQLController,
+)
 from .schema_management import SchemaManager
 from .transaction_management import TransactionManager
 from .transformation import TransformationManager
+from .manifest import ManifestManager
+from .compaction import CompactionManager
+from .index_management import IndexManager
+from .materialization import MaterializationManager
 
 logger = logging.getLogger(__name__)
 
 
 class PostgreSQLController(AbstractController):
     drop_table_if_exists = False
+    copy_chunk_size: int = PostgresqlDBConnector.DEFAULT_COPY_CHUNK_SIZE
+    result_cache_size: int = 0
+    result_cache_max_rows: int = 10000
+    inference_sample_size: int = 1000
+    transformation_workers: int = 4
+    transfer_workers: int = 1
+    transfer_format: str = "binary"
+    transfer_buffer_size: int = PostgresqlDBConnector.DEFAULT_TRANSFER_BUFFER_SIZE
+    merge_delete_missing = False
     transaction_table_name: str = "transactions"
+    compaction_retention_days: float = 30
+    compaction_interval_hours: float = 0
+    auto_index = True
+    statement_sample_rate: float = 0.05
+    slow_query_threshold_ms: float = 500
+    slow_query_log_size: int = 200
+    slow_query_explain = False
     staging_folder = StageConfiguration.DEFAULT_STAGING_PATH
     transformation_occured = False
 
@@ -51,11 +84,18 @@ class PostgreSQLController(AbstractController):
         port: str,
         transaction_strategy: TransactionStrategy = TransactionStrategy.SINGLE_TABLE,
         overwrite_strategy: OverwriteStrategy = OverwriteStrategy.PRESERVE,
+        overlay_strategy: OverlayStrategy = OverlayStrategy.VIEW,
         staging_folder: Optional[str] = None,
+        pool_min_size: int = PostgresqlDBConnector.DEFAULT_POOL_MIN_SIZE,
+        pool_max_size: int = PostgresqlDBConnector.DEFAULT_POOL_MAX_SIZE,
+        pool_timeout: float = PostgresqlDBConnector.DEFAULT_POOL_TIMEOUT,
+        prepared_statements_cache_size: int = PostgresqlDBConnector.DEFAULT_PREPARED_STATEMENTS_CACHE_SIZE,
+        bootstrap: bool = True,
     ) -> None:
         logger.info("Initializing PostgreSQLController")
         self.transaction_strategy = transaction_strategy
         self.overwrite_strategy = overwrite_strategy
+        self.overlay_strategy = overlay_strategy
 
         if staging_folder:
             PostgreSQLController.staging_folder = staging_folder
@@ -66,6 +106,10 @@ class PostgreSQLController(AbstractController):
             host=host,
             port=port,
             database="raw",
+            pool_min_size=pool_min_size,
+            pool_max_size=pool_max_size,
+            pool_timeout=pool_timeout,
+            prepared_statements_cache_size=prepared_statements_cache_size,
         )
 
         self.dbc_warehouse = PostgresqlDBConnector(
@@ -74,44 +118,81 @@ class PostgreSQLController(AbstractController):
             host=host,
             port=port,
             database="warehouse",
+            pool_min_size=pool_min_size,
+            pool_max_size=pool_max_size,
+            pool_timeout=pool_timeout,
+            prepared_statements_cache_size=prepared_statements_cache_size,
         )
 
-        logger.info("Checking and initializing warehouse core tables...")
-        TransformationManager.initialize_warehouse_core(self)
+        if self.statement_sample_rate > 0:
+            self.dbc_raw.statement_sampler = StatementSampler(
+                self.statement_sample_rate
+            )
+            self.dbc_warehouse.statement_sampler = StatementSampler(
+                self.statement_sample_rate
+            )
+
+        if self.slow_query_threshold_ms > 0:
+            for dbc in (self.dbc_raw, self.dbc_warehouse):
+                dbc.slow_query_log = SlowQueryLog(
+                    self.slow_query_threshold_ms,
+                    self.slow_query_log_size,
+                    dbc.explain if self.slow_query_explain else None,
+                )
+
+        self.result_cache = None
+        if self.result_cache_size > 0:
+            self.result_cache = QueryResultCache(
+                self.result_cache_size, self.result_cache_max_rows
+            )
+            self.dbc_raw.write_listeners.append(
+                partial(self._invalidate_cached_results, "raw", self.dbc_raw)
+            )
+            self.dbc_warehouse.write_listeners.append(
+                partial(
+                    self._invalidate_cached_results, "warehouse", self.dbc_warehouse
+                )
+            )
+
+        # Without `bootstrap`, another instance running on the same databases
+        # creates the schema and runs the maintenance, which would race if
+        # both did.
+        if bootstrap:
+            logger.info("Checking and initializing warehouse core tables...")
+            TransformationManager.initialize_warehouse_core(self)
+            ManifestManager.create_manifest_table(self)
+            CompactionManager.create_history_table(self)
+            MaterializationManager.create_materializations_table(self)
 
         self.tables_information = {}
         self.vt_association: dict[str, str] = {}
         self._tt: list[str] = []
 
         configs = StageConfiguration.get_all_configs_in_folder()
-        missing_entry = TransformationManager.verify_staging_results(configs, self)
+        verification = TransformationManager.verify_datamarts(configs, self)
+        missing_entry = TransformationManager.verify_staging_results(
+            configs, self, verification
+        )
 
         if missing_entry:
             self.transformation_occured = False
         else:
             logging.info("Reproduce metadata informations...")
             self.transformation_occured = True
-            for config in configs:
-                for expression in config.datamarts:
-                    from_view, to_view = StageConfiguration.get_from_view_and_to_view(
-                        expression
+            for to_view, entry in verification.items():
+                if entry["view"] is not None:
+                    self.vt_association[entry["view"]] = to_view
+                if entry["kind"] is not None:
+                    self.tables_information[to_view] = SchemaManager.get_table_schema(
+                        self.dbc_raw, to_view
                     )
-                    associated_view_name = (
-                        TransactionManager.create_associated_view_name(to_view)
-                    )
-                    if self.table_or_view_exists(associated_view_name, "warehouse"):
-                        self.vt_association[associated_view_name] = to_view
-                    if self.table_or_view_exists(to_view, "warehouse"):
-                        self.tables_information[to_view] = (
-                            SchemaManager.get_table_schema(self.dbc_raw, to_view)
-                        )
             tables = self.tables("warehouse")
             for table in tables:
                 if self.get_transaction_table_name(table) in tables:
                     if self.get_transaction_table_name(table) not in self._tt:
                         self._tt.append(self.get_transaction_table_name(table))
 
-        if self.transaction_strategy == TransactionStrategy.SINGLE_TABLE:
+        if bootstrap and self.transaction_strategy == TransactionStrategy.SINGLE_TABLE:
             if self.transaction_table_name not in self.tables("warehouse"):
                 self.dbc_warehouse.execute_query(
                     UtilsPotsgreSQLController.transaction_table_query(
@@ -119,6 +200,15 @@ class PostgreSQLController(AbstractController):
                     )
                 )
 
+        if bootstrap and self.auto_index:
+            IndexManager.provision(self)
+
+        self._compaction_timer = None
+        if bootstrap and self.compaction_interval_hours > 0:
+            self._compaction_timer = CompactionManager.schedule(
+                self, self.compaction_interval_hours
+            )
+
         logger.info("PostgreSQLController initialized successfully")
 
     def get_transaction_table_name(self, table_name: str) -> str:
@@ -134,10 +224,10 @@ class PostgreSQLController(AbstractController):
         query = """
             SELECT EXISTS (
                 SELECT 1
-                FROM information_schema.tables
-                WHERE table_schema = 'public'
-                AND (table_type = 'BASE TABLE' OR table_type = 'VIEW')
-                AND table_name = %s
+                FROM pg_catalog.pg_class
+                WHERE relnamespace = 'public'::regnamespace
+                AND relkind IN ('r', 'p', 'v', 'm')
+                AND relname = %s
             );
         """
         dbc = self.dbc_raw if database.lower() == "raw" else self.dbc_warehouse
@@ -191,6 +281,47 @@ class PostgreSQLController(AbstractController):
             PostgreSQLController.drop_table_if_exists = conf[k]
         if (k := "transaction-table-name") in conf:
             PostgreSQLController.transaction_table_name = conf[k]
+        if (k := "copy-chunk-size") in conf:
+            PostgreSQLController.copy_chunk_size = int(conf[k])
+        if (k := "result-cache-size") in conf:
+            PostgreSQLController.result_cache_size = int(conf[k])
+        if (k := "result-cache-max-rows") in conf:
+            PostgreSQLController.result_cache_max_rows = int(conf[k])
+        if (k := "inference-sample-size") in conf:
+            PostgreSQLController.inference_sample_size = int(conf[k])
+        if (k := "transformation-workers") in conf:
+            PostgreSQLController.transformation_workers = int(conf[k])
+        if (k := "compaction-retention-days") in conf:
+            PostgreSQLController.compaction_retention_days = float(conf[k])
+        if (k := "compaction-interval-hours") in conf:
+            PostgreSQLController.compaction_interval_hours = float(conf[k])
+        if (k := "auto-index") in conf:
+            PostgreSQLController.auto_index = conf[k]
+        if (k := "statement-sample-rate") in conf:
+            PostgreSQLController.statement_sample_rate = float(conf[k])
+        if (k := "slow-query-threshold-ms") in conf:
+            PostgreSQLController.slow_query_threshold_ms = float(conf[k])
+        if (k := "slow-query-log-size") in conf:
+            PostgreSQLController.slow_query_log_size = int(conf[k])
+        if (k := "slow-query-explain") in conf:
+            PostgreSQLController.slow_query_explain = conf[k]
+        if (k := "transfer-workers") in conf:
+            PostgreSQLController.transfer_workers = int(conf[k])
+        if (k := "transfer-format") in conf:
+            if conf[k] in ("binary", "text"):
+                PostgreSQLController.transfer_format = conf[k]
+            else:
+                logger.warning(
+                    f"Invalid transfer format {conf[k]}, using default binary"
+                )
+        if (k := "transfer-buffer-size") in conf:
+            PostgreSQLController.transfer_buffer_size = int(conf[k])
+        if (k := "merge-delete-missing") in conf:
+            PostgreSQLController.merge_delete_missing = conf[k]
+        if (k := "plan-cache-folder") in conf:
+            StagingPlanner.plan_cache_folder = conf[k]
+        if (k := "validate-plans-with-clingo") in conf:
+            StagingPlanner.validate_with_clingo = bool(conf[k])
 
         staging_folder = None
         if (k := "staging-folder") in conf:
@@ -214,6 +345,33 @@ class PostgreSQLController(AbstractController):
                     f"Invalid overwrite strategy {conf[k]}, using default preserve"
                 )
 
+        overlay_strategy = OverlayStrategy.VIEW
+        if (k := "overlay-strategy") in conf:
+            try:
+                overlay_strategy = OverlayStrategy(conf[k])
+            except ValueError:
+                logger.warning(
+                    f"Invalid overlay strategy {conf[k]}, using default view"
+                )
+
+        pool_min_size = PostgresqlDBConnector.DEFAULT_POOL_MIN_SIZE
+        if (k := "pool-min-size") in conf:
+            pool_min_size = int(conf[k])
+
+        pool_max_size = PostgresqlDBConnector.DEFAULT_POOL_MAX_SIZE
+        if (k := "pool-max-size") in conf:
+            pool_max_size = int(conf[k])
+
+        pool_timeout = PostgresqlDBConnector.DEFAULT_POOL_TIMEOUT
+        if (k := "pool-timeout") in conf:
+            pool_timeout = float(conf[k])
+
+        prepared_statements_cache_size = (
+            PostgresqlDBConnector.DEFAULT_PREPARED_STATEMENTS_CACHE_SIZE
+        )
+        if (k := "prepared-statements-cache-size") in conf:
+            prepared_statements_cache_size = int(conf[k])
+
         return PostgreSQLController(
             user=conf["user"],
             password=conf["password"],
@@ -221,14 +379,19 @@ class PostgreSQLController(AbstractController):
             port=conf["port"],
             transaction_strategy=transaction_strategy,
             overwrite_strategy=overwrite_strategy,
+            overlay_strategy=overlay_strategy,
             staging_folder=staging_folder,
+            pool_min_size=pool_min_size,
+            pool_max_size=pool_max_size,
+            pool_timeout=pool_timeout,
+            prepared_statements_cache_size=prepared_statements_cache_size,
         )
 
     @override
     def create_table(
         self,
         table_name: str,
-        json_list: list[dict[str, Any]],
+        json_list: Iterable[dict[str, Any]],
         primary_key: str | None = None,
     ) -> int:
         logger.info(f"Creating table: {table_name}")
@@ -236,12 +399,8 @@ class PostgreSQLController(AbstractController):
             logger.error(f"Invalid table name: {table_name}")
             raise InvalidTableName()
 
-        if not json_list:
-            logger.error("No JSON data provided")
-            raise NoJsonDataProvided()
-
         try:
-            data_types, json_list = PostgresqlDBConnector._analyse_json(json_list)
+            data_types, json_records = self._analyse_records(json_list)
         except InconsistentStructure:
             logger.error("Inconsistent structure in JSON data")
             raise InconsistentStructure()
@@ -262,8 +421,8 @@ class PostgreSQLController(AbstractController):
         create_table_statement = f"CREATE TABLE {table_name} ({columns});"
 
         try:
-            self.tables_information[table_name] = data_types
             self.dbc_raw.execute_query(create_table_statement)
+            self.tables_information[table_name] = data_types
             logger.info(f"Table {table_name} created successfully")
         except DuplicateTable as e:
             if self.drop_table_if_exists:
@@ -276,25 +435,21 @@ class PostgreSQLController(AbstractController):
                 logger.error(f"Table {table_name} already exists")
                 raise e
 
-        insert_statement = ""
-        concat_values = []
-
-        columns = f"({', '.join(data_types.keys())})"
-        insert_statement += f"INSERT INTO {table_name} {columns} VALUES"
-        for obj in json_list:
-            values = [value for value in tuple(obj.values())]
-            placeholders = ", ".join(["%s"] * len(values))
-            insert_statement += f"({placeholders}),\n"
-            concat_values.extend(values)
-
-        insert_statement = insert_statement[: insert_statement.rindex(",")]
-        insert_statement += ";"
-        self.dbc_raw.execute_query(insert_statement, placeholders=concat_values)
-        logger.info(f"Inserted {len(json_list)} rows into {table_name}")
-        return len(json_list)
+        # The rest of the upload is only read now: whatever goes wrong with it
+        # (incoherent records, invalid JSON, values the inferred types refuse,
+        # a client gone) must not leave an empty table behind.
+        try:
+            return self._bulk_insert(table_name, list(data_types.keys()), json_records)
+        except Exception as e:
+            logger.error(f"Loading {table_name} failed, dropping it: {str(e)}")
+            self.dbc_raw.execute_query(f"DROP TABLE IF EXISTS {table_name};")
+            self.tables_information.pop(table_name, None)
+            raise
 
     @override
-    def insert(self, table_name: str, json_data: dict | list[dict]) -> int:
+    def insert(
+        self, table_name: str, json_data: dict | Iterable[dict[str, Any]]
+    ) -> int:
         logger.info(f"Trying inserting data into table: {table_name}")
         if not is_valid_table_name(table_name):
             logger.error(f"Invalid table name: {table_name}")
@@ -307,19 +462,13 @@ class PostgreSQLController(AbstractController):
             logger.error(f"Table not found: {table_name}")
             raise TableNotFoundError()
 
-        if not json_data:
-            logger.error("No JSON data provided")
-            raise NoJsonDataProvided()
-
-        if isinstance(json_data, list):
-            json_list = json_data
-        elif isinstance(json_data, dict):
-            json_list = [json_data]
-        else:
+        if isinstance(json_data, dict):
+            json_data = [json_data]
+        elif json_data is not None and not isinstance(json_data, (list, Iterator)):
             logger.error("Inconsistent structure in JSON data")
             raise InconsistentStructure()
 
-        data_types, json_list = self.dbc_raw._analyse_json(json_list)
+        data_types, json_records = self._analyse_records(json_data)
 
         if data_types != self.tables_information[table_name]:
             comparison = compare_dictionaries(
@@ -328,22 +477,36 @@ class PostgreSQLController(AbstractController):
             logger.error(f"Inconsistent structure: {comparison}")
             raise InconsistentStructure(comparison)
 
-        insert_statement = ""
-        concat_values = []
+        return self._bulk_insert(table_name, list(data_types.keys()), json_records)
+
+    def _analyse_records(
+        self, json_records: Iterable[dict[str, Any]]
+    ) -> tuple[dict[str, str], Iterator[dict[str, Any]]]:
+        # Column types are inferred on the first `inference_sample_size`
+        # records only. The remaining ones are checked and cast lazily while
+        # they are written, so the whole upload is never held in memory.
+        json_records = iter(json_records or [])
+        sample = list(islice(json_records, self.inference_sample_size))
+        if not sample:
+            logger.error("No JSON data provided")
+            raise NoJsonDataProvided()
 
-        columns = f"({', '.join(data_types.keys())})"
-        insert_statement += f"INSERT INTO {table_name} {columns} VALUES"
-        for obj in json_list:
-            values = [value for value in tuple(obj.values())]
-            placeholders = ", ".join(["%s"] * len(values))
-            insert_statement += f"({placeholders}),\n"
-            concat_values.extend(values)
+        data_types, sample = PostgresqlDBConnector._analyse_json(sample)
+        return data_types, chain(
+            sample, PostgresqlDBConnector._cast_json(json_records, data_types)
+        )
 
-        insert_statement = insert_statement[: insert_statement.rindex(",")]
-        insert_statement += ";"
-        self.dbc_raw.execute_query(insert_statement, placeholders=concat_values)
-        logger.info(f"Inserted {len(json_list)} rows into {table_name}")
-        return len(json_list)
+    def _bulk_insert(
+        self, table_name: str, columns: list[str], json_list: Iterable[dict[str, Any]]
+    ) -> int:
+        nb_rows = self.dbc_raw.copy_records(
+            table_name,
+            columns,
+            ([obj[column] for column in columns] for obj in json_list),
+            chunk_size=self.copy_chunk_size,
+        )
+        logger.info(f"Inserted {nb_rows} rows into {table_name}")
+        return nb_rows
 
     @override
     def tables(self, database: str) -> list[str]:
@@ -411,140 +574,47 @@ class PostgreSQLController(AbstractController):
     ) -> list[tuple[tuple[str, str], tuple[CSVActionType, str]]]:
         return CSVProcessor.parse_header(paired_headers)
 
-    def _query_from_csv(self, file: str, filename: str, separator: str = ",") -> str:
-        logger.info(f"Generating query from CSV file: {filename}")
-
-        def _init_rec_regex_replace(
-            regex_replace: list[tuple[str, str]],
-            initial_table_name: str,
-            initial_column_name: str,
-            new_column_name: str,
-        ) -> str:
-            def _rec_regex_replace(
-                idx: int,
-                regex_replace: list[tuple[str, str]],
-                initial_table_name: str,
-                initial_column_name: str,
-            ) -> str:
-                if idx <= 0:
-                    if len(regex_replace) == 0:
-                        return f"{initial_table_name}.{initial_column_name}"
-
-                regex = regex_replace[idx][0].replace("'", "''")
-                replace = regex_replace[idx][1].replace("'", "''")
-
-                regex = re.sub(r"\$(\d+)", r"\\\1", regex)
-                replace = re.sub(r"\$(\d+)", r"\\\1", replace)
-
-                if idx <= 0:
-                    if len(regex_replace) == 0:
-                        return f"{initial_table_name}.{initial_column_name}"
-
-                    return f"REGEXP_REPLACE({initial_table_name}.{initial_column_name}, '{regex}','{replace}', 'g')"
-                else:
-                    return f"REGEXP_REPLACE({_rec_regex_replace(idx-1, regex_replace, initial_table_name,initial_column_name)}, '{regex}','{replace}', 'g')"
-
-            return (
-                _rec_regex_replace(
-                    len(regex_replace) - 1,
-                    regex_replace,
-                    initial_table_name,
-                    initial_column_name,
-                )
-                + f"::text AS {new_column_name}"
-            )
-
-        merged_by_initial_table: dict[
-            str, dict[str, list[tuple[CSVActionType, str, list[tuple[str, str]]]]]
-        ] = {}
-
-        paired_headers, paired_columns = read_csv(file, separator)
-        decomposed_paired_headers = self._parse_header(paired_headers)
-
-        for p_head, p_col in zip(decomposed_paired_headers, paired_columns):
-            if p_head[0][0] not in merged_by_initial_table:
-                merged_by_initial_table[p_head[0][0]] = {}
-
-            if p_head[0][1] not in merged_by_initial_table[p_head[0][0]]:
-                merged_by_initial_table[p_head[0][0]][p_head[0][1]] = [
-                    (
-                        p_head[1][0],
-                        p_head[1][1],
-                        p_col,
-                    )
-                ]
-            else:
-                merged_by_initial_table[p_head[0][0]][p_head[0][1]].append(
-                    (
-                        p_head[1][0],
-                        p_head[1][1],
-                        p_col,
-                    )
-                )
-
-        last_slash = (filename.rindex("/") if "/" in filename else 0) + 1
-        last_dot = (
-            filename.rindex(".") if "." in filename[last_slash:] else len(filename)
+    def _query_from_csv(
+        self,
+        file: str,
+        filename: str,
+        separator: str = ",",
+        materialize: bool = False,
+        keys: Optional[dict[str, list[list[str]]]] = None,
+    ) -> str:
+        return CSVProcessor.query_from_csv(
+            file, filename, self.dbc_raw, separator, materialize, keys
         )
-        pretty_filename = filename[last_slash:last_dot]
-
-        queries = []
-
-        for initial_table in merged_by_initial_table.keys():
-            if len(merged_by_initial_table.keys()) < 2:
-                view_name = pretty_filename
-            else:
-                view_name = f"{initial_table}_{pretty_filename}"
-
-            schema = self._get_tables_schema(dbc=self.dbc_raw, table_name=initial_table)
-            column_to_keep = [col for col in schema.keys()]
-            replacements = []
-            for initial_column in merged_by_initial_table[initial_table].keys():
-                for merged in merged_by_initial_table[initial_table][initial_column]:
-                    action, new_col_name, regex_replaces = merged
-                    if action != CSVActionType.DELETE:
-                        replacements.append(
-                            _init_rec_regex_replace(
-                                regex_replaces,
-                                initial_table,
-                                initial_column,
-                                new_col_name,
-                            )
-                        )
-                    match action:
-                        case CSVActionType.DELETE:
-                            if initial_column in column_to_keep:
-                                column_to_keep.remove(initial_column)
-
-                        case CSVActionType.NEW:
-                            pass
-
-                        case CSVActionType.RENAME:
-                            if initial_column in column_to_keep:
-                                column_to_keep.remove(initial_column)
-                        case _:
-                            logger.error(f"Unhandled action type: {action}")
-                            raise NotImplementedError()
-
-            query = f"""
-            DROP VIEW IF EXISTS {view_name} CASCADE;
-            CREATE VIEW {view_name} AS
-                SELECT
-                {", \n".join(column_to_keep) + "," if column_to_keep else ""}
-            """
 
-            query += ",\n".join(replacements)
-            query += f"\nFROM {initial_table}"
-            queries.append(query)
+    def _from_other_format(
+        self,
+        file: str,
+        filename: str,
+        dbc: DBConnector,
+        materialize: bool = False,
+        keys: Optional[dict[str, list[list[str]]]] = None,
+    ) -> str:
+        return CSVProcessor.from_other_format(file, filename, dbc, materialize, keys)
 
-        logger.info(f"Generated {len(queries)} queries from CSV file")
-        return ";\n".join(queries) + ";"
+    @override
+    def plan_data_transformation(
+        self, configs: list[StageConfiguration], force: bool = False
+    ) -> dict[str, dict[str, Any]]:
+        try:
+            ordered_configs = StageConfiguration.compute_staging_order(
+                configs, self.tables("raw")
+            )
+        except StageConfigurationCycle as e:
+            logger.error("Detected cycle in stage configuration")
+            raise e
 
-    def _from_other_format(self, file: str, filename: str, dbc: DBConnector) -> str:
-        return CSVProcessor.from_other_format(file, filename, dbc)
+        dependencies = StageConfiguration.compute_staging_dependencies(configs)
+        return ManifestManager.plan_stages(self, ordered_configs, dependencies, force)
 
     @override
-    def process_data_transformation(self, configs: list[StageConfiguration]) -> None:
+    def process_data_transformation(
+        self, configs: list[StageConfiguration], force: bool = False
+    ) -> dict[str, Any]:
         logger.info("Starting data transformation process")
 
         try:
@@ -556,31 +626,97 @@ class PostgreSQLController(AbstractController):
             logger.error("Detected cycle in stage configuration")
             raise e
 
-        for config in ordered_configs:
-            for file in config.staging_files:
-                logger.info(f"Processing file: {file}")
-                real_path = os.path.join(
-                    os.getcwd(), self.staging_folder, config.workdir, file
-                ).strip()
-                with open(real_path, mode="r", newline="", encoding="utf-8") as f:
-                    stage = f.read()
-
-                if real_path.endswith(".sql"):
-                    logger.info("Executing SQL file")
-                    query = stage
-                else:
-                    logger.info("Converting file to SQL query")
-                    query = self._from_other_format(stage, real_path, self.dbc_raw)
-                self.dbc_raw.execute_query(query=query)
-                logger.info(f"Executed query for file: {file}")
-
-        for config in ordered_configs:
-            TransformationManager.copy_staging_result_to_warehouse(self, config)
-
-        TransformationManager.verify_staging_results(configs, self)
+        dependencies = StageConfiguration.compute_staging_dependencies(configs)
+
+        plan = ManifestManager.plan_stages(self, ordered_configs, dependencies, force)
+        configs_to_run = [
+            config for config in ordered_configs if plan[config.name]["run"]
+        ]
+        skipped = [
+            config.name for config in ordered_configs if not plan[config.name]["run"]
+        ]
+        for config in configs_to_run:
+            logger.info(f"Stage {config.name} will run: {plan[config.name]['reason']}")
+        if skipped:
+            logger.info(f"Skipping unchanged stages: {skipped}")
+
+        timings = {}
+        if configs_to_run:
+            # Each stage copies its datamarts with up to `transfer_workers`
+            # connections of each pool at once, one connection is left for
+            # the requests served meanwhile.
+            transfer_workers = max(1, self.transfer_workers)
+            max_workers = max(
+                1,
+                min(
+                    self.transformation_workers,
+                    (self.dbc_raw.pool_max_size - 1) // transfer_workers,
+                    (self.dbc_warehouse.pool_max_size - 1) // transfer_workers,
+                ),
+            )
+            logger.info(
+                f"Running {len(configs_to_run)} stages with {max_workers} workers"
+            )
+            timings = TransformationManager.run_stages(
+                configs_to_run, dependencies, self._run_stage, max_workers
+            )
+
+        # Stages that ran recreated their own materialized views, the ones
+        # left are only refreshed if what they read changed.
+        materializations = MaterializationManager.refresh(self)
+
+        verification = TransformationManager.verify_datamarts(configs, self)
+        TransformationManager.verify_staging_results(configs, self, verification)
+        # Once every stage is done, as concurrent stages would race on the
+        # creation of the same indexes.
+        if self.auto_index and configs_to_run:
+            IndexManager.provision(self)
 
         self.transformation_occured = True
         logger.info("Data transformation process completed")
+        return {
+            "stages": timings,
+            "skipped": skipped,
+            "materializations": materializations,
+            "verification": verification,
+        }
+
+    def _run_stage(self, config: StageConfiguration) -> dict[str, Any]:
+        start = time.perf_counter()
+        # Hashed once the upstream stages are done, so the manifest holds
+        # the datasources this run actually read.
+        files_hash = ManifestManager.hash_files(self, config)
+        sources_hash = ManifestManager.hash_sources(self, config)
+        # A stage failing halfway must not look up to date on the next run.
+        ManifestManager.forget_stage(self, config)
+
+        for file in config.staging_files:
+            logger.info(f"Processing file: {file}")
+            real_path = os.path.join(
+                os.getcwd(), self.staging_folder, config.workdir, file
+            ).strip()
+            with open(real_path, mode="r", newline="", encoding="utf-8") as f:
+                stage = f.read()
+
+            if real_path.endswith(".sql"):
+                logger.info("Executing SQL file")
+                query = stage
+            else:
+                logger.info("Converting file to SQL query")
+                query = self._from_other_format(
+                    stage, real_path, self.dbc_raw, config.materialize, config.keys
+                )
+            self.dbc_raw.execute_query(query=query)
+            logger.info(f"Executed query for file: {file}")
+        MaterializationManager.record_created(self)
+
+        staged = time.perf_counter()
+        merged = TransformationManager.copy_staging_result_to_warehouse(self, config)
+        copied = time.perf_counter()
+
+        ManifestManager.record_stage(self, config, files_hash, sources_hash)
+
+        return {"staging": staged - start, "copy": copied - staged, "merged": merged}
 
     def get_column_info(
         self, table_name: str, database: str = "raw"
@@ -593,13 +729,7 @@ class PostgreSQLController(AbstractController):
             logger.error(f"Invalid database name: {database}")
             raise InvalidDatabaseName("Database must be either 'raw' or 'warehouse'")
 
-        column_info = SchemaManager.get_column_info(dbc, table_name)
-
-        for column in column_info:
-            column_name = column["column_name"]
-            column["is_core"] = SchemaManager.is_core_column(table_name, column_name)
-
-        return column_info
+        return SchemaManager.get_column_info(dbc, table_name)
 
     def get_tables_columns_info(
         self, database: str = "raw"
@@ -617,25 +747,18 @@ class PostgreSQLController(AbstractController):
             logger.error(f"Invalid database name: {database}")
             raise InvalidDatabaseName("Database must be either 'raw' or 'warehouse'")
 
-        table_list = self.tables(database) + self.views(database)
-        result = {}
-
-        for table_name in table_list:
-            column_info = SchemaManager.get_column_info(dbc, table_name)
-
-            for column in column_info:
-                column_name = column["column_name"]
-                column["is_core"] = SchemaManager.is_core_column(
-                    table_name, column_name
-                )
-
-            result[table_name] = column_info
+        result = {
+            table_name: SchemaManager.get_column_info(dbc, table_name)
+            for table_name in SchemaManager.get_all_columns_info(dbc)
+        }
 
         logger.info(f"Retrieved column information for {len(result)} tables")
         return result
 
-    def copy_staging_result_to_warehouse(self, config: StageConfiguration) -> None:
-        TransformationManager.copy_staging_result_to_warehouse(self, config)
+    def copy_staging_result_to_warehouse(
+        self, config: StageConfiguration
+    ) -> dict[str, dict[str, int]]:
+        return TransformationManager.copy_staging_result_to_warehouse(self, config)
 
     @override
     def query(
@@ -652,6 +775,9 @@ class PostgreSQLController(AbstractController):
 
         dbc = self.dbc_raw if database.lower() == "raw" else self.dbc_warehouse
 
+        if self.result_cache and awaits_result and is_cacheable_query(query):
+            return self._cached_query(database.lower(), dbc, query, placeholders)
+
         result = dbc.execute_query(
             query, placeholders=placeholders, awaits_result=awaits_result
         )
@@ -671,6 +797,169 @@ class PostgreSQLController(AbstractController):
                 f"Query should return None when awaits_result=False, got {type(result)}"
             )
 
+    def _cached_query(
+        self,
+        database: str,
+        dbc: PostgresqlDBConnector,
+        query: str,
+        placeholders: list[Any] | None,
+    ) -> list[dict[str, Any]]:
+        key = QueryResultCache.make_key(database, query, placeholders)
+        result = self.result_cache.get(key)
+        if result is not None:
+            return result
+
+        generation = self.result_cache.generation
+        result = dbc.execute_query(query, placeholders=placeholders, awaits_result=True)
+        if not isinstance(result, list):
+            raise WrongQueryType(
+                f"Query should return list when awaits_result=True, got {type(result)}"
+            )
+
+        tables = SchemaManager.get_relations_closure(dbc, referenced_identifiers(query))
+        self.result_cache.put(key, result, tables, generation)
+        return result
+
+    def _invalidate_cached_results(
+        self, database: str, dbc: PostgresqlDBConnector, query: str
+    ) -> None:
+        if is_ddl_statement(query):
+            self.result_cache.clear(database)
+            return
+        self.result_cache.invalidate_tables(
+            database,
+            SchemaManager.get_relations_closure(
+                dbc, referenced_identifiers(query), written=True
+            ),
+        )
+
+    @override
+    def result_cache_stats(self) -> dict[str, Any]:
+        if not self.result_cache:
+            return {"enabled": False}
+        return {"enabled": True, **self.result_cache.stats()}
+
+    @override
+    def query_batch(
+        self,
+        database: str,
+        statements: list[dict[str, Any]],
+        pipeline: bool = False,
+    ) -> list[list[dict[str, Any]]]:
+        if database.lower() not in ["raw", "warehouse"]:
+            logger.error(f"Invalid database name: {database}")
+            raise InvalidDatabaseName("Database must be either 'raw' or 'warehouse'")
+
+        dbc = self.dbc_raw if database.lower() == "raw" else self.dbc_warehouse
+
+        batch = []
+        for statement in statements:
+            if not statement.get("query"):
+                logger.error("Batch statement without query")
+                raise QueryRequired()
+            batch.append(
+                (
+                    statement["query"],
+                    statement.get("placeholders"),
+                    statement.get("awaits_result", True),
+                )
+            )
+
+        results = dbc.execute_batch(batch, pipeline=pipeline)
+        return [result if result is not None else [] for result in results]
+
+    @override
+    def stream_query(
+        self,
+        database: str,
+        query: str,
+        placeholders: list[Any] | None = None,
+        fetch_size: int | None = None,
+    ) -> Iterator[list[dict[str, Any]]]:
+        if database.lower() not in ["raw", "warehouse"]:
+            logger.error(f"Invalid database name: {database}")
+            raise InvalidDatabaseName("Database must be either 'raw' or 'warehouse'")
+
+        dbc = self.dbc_raw if database.lower() == "raw" else self.dbc_warehouse
+
+        return dbc.stream_query(
+            query,
+            placeholders=placeholders,
+            fetch_size=fetch_size or PostgresqlDBConnector.DEFAULT_FETCH_SIZE,
+        )
+
+    @override
+    def prepared_statements_stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            "raw": self.dbc_raw.prepared_statements_stats(),
+            "warehouse": self.dbc_warehouse.prepared_statements_stats(),
+        }
+
+    @override
+    def slow_queries(self) -> dict[str, dict[str, Any]]:
+        report = {}
+        for database, dbc in (("raw", self.dbc_raw), ("warehouse", self.dbc_warehouse)):
+            if dbc.slow_query_log is None:
+                report[database] = {"enabled": False}
+            else:
+                report[database] = {
+                    "enabled": True,
+                    **dbc.slow_query_log.stats(),
+                    "queries": dbc.slow_query_log.entries(),
+                }
+        return report
+
+    @override
+    def clear_slow_queries(self) -> None:
+        for dbc in (self.dbc_raw, self.dbc_warehouse):
+            if dbc.slow_query_log is not None:
+                dbc.slow_query_log.clear()
+
+    @override
+    def get_indexes(self, database: str) -> dict[str, Any]:
+        dbc = self._index_connector(database)
+        return {
+            "indexes": IndexManager.get_indexes(dbc),
+            "suggestions": IndexManager.suggest(dbc),
+        }
+
+    @override
+    def create_indexes(
+        self,
+        database: str,
+        indexes: Optional[list[dict[str, Any]]] = None,
+        queries: Optional[list[str]] = None,
+    ) -> dict[str, Any]:
+        dbc = self._index_connector(database)
+        if indexes is None and dbc is not self.dbc_warehouse:
+            indexes = []
+        for index in indexes or []:
+            names = [index.get("table", ""), *index.get("columns", [])]
+            if len(names) < 2 or not all(map(is_valid_table_name, names)):
+                logger.error(f"Invalid index definition: {index}")
+                raise InvalidTableName()
+        return IndexManager.apply(self, dbc, indexes, queries or [])
+
+    def _index_connector(self, database: str) -> PostgresqlDBConnector:
+        if database.lower() not in ["raw", "warehouse"]:
+            logger.error(f"Invalid database name: {database}")
+            raise InvalidDatabaseName("Database must be either 'raw' or 'warehouse'")
+        return self.dbc_raw if database.lower() == "raw" else self.dbc_warehouse
+
+    @override
+    def compact_transactions(
+        self, retention_days: Optional[float] = None
+    ) -> dict[str, dict[str, Any]]:
+        if retention_days is None:
+            retention_days = self.compaction_retention_days
+        return CompactionManager.compact(self, retention_days)
+
+    @override
+    def refresh_materializations(
+        self, force: bool = False
+    ) -> dict[str, dict[str, Any]]:
+        return MaterializationManager.refresh(self, force)
+
     @override
     def view_table_association(self) -> dict[str, str]:
         return self.vt_association
@@ -678,5 +967,11 @@ class PostgreSQLController(AbstractController):
     def verify_staging_results(self, configs: list[StageConfiguration]) -> list[str]:
         return TransformationManager.verify_staging_results(configs, self)
 
+    @override
+    def verify_data_transformation(
+        self, configs: list[StageConfiguration]
+    ) -> dict[str, dict[str, Any]]:
+        return TransformationManager.verify_datamarts(configs, self)
+
     def initialize_warehouse_core(self):
         TransformationManager.initialize_warehouse_core(self)
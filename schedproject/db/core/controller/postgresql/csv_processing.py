@@ -1,8 +1,10 @@
 import logging
 import re
+from typing import Optional
 
 from core.controller.postgresql.schema_management import SchemaManager
 from core.dbconnector import DBConnector
+from .materialization import MaterializationManager
 from .utils import CSVActionType
 from ...utils import (
     is_valid_table_name,
@@ -66,7 +68,12 @@ class CSVProcessor:
 
     @staticmethod
     def query_from_csv(
-        file: str, filename: str, dbc: DBConnector, separator: str = ","
+        file: str,
+        filename: str,
+        dbc: DBConnector,
+        separator: str = ",",
+        materialize: bool = False,
+        keys: Optional[dict[str, list[list[str]]]] = None,
     ) -> str:
         logger.info(f"Generating query from CSV file: {filename}")
 
@@ -182,29 +189,44 @@ class CSVProcessor:
                             logger.error(f"Unhandled action type: {action}")
                             raise NotImplementedError()
 
-            query = f"""
-            DROP VIEW IF EXISTS {view_name} CASCADE;
-            CREATE VIEW {view_name} AS
+            select_query = f"""
                 SELECT
                 {", \n".join(column_to_keep) + "," if len(column_to_keep) else ""}
             """
 
-            query += ",\n".join(replacements)
-            query += f"\nFROM {initial_table}"
-            queries.append(query)
+            select_query += ",\n".join(replacements)
+            select_query += f"\nFROM {initial_table}"
+            queries.append(
+                MaterializationManager.create_view_query(
+                    view_name,
+                    select_query,
+                    materialize,
+                    (keys or {}).get(view_name, []),
+                )
+            )
 
         logger.info(f"Generated {len(queries)} queries from CSV file")
-        return ";\n".join(queries) + ";"
+        return "\n".join(queries)
 
     @staticmethod
-    def from_other_format(file: str, filename: str, dbc: DBConnector) -> str:
+    def from_other_format(
+        file: str,
+        filename: str,
+        dbc: DBConnector,
+        materialize: bool = False,
+        keys: Optional[dict[str, list[list[str]]]] = None,
+    ) -> str:
         logger.info(f"Processing file: {filename}")
         if filename.endswith(".tsv"):
             logger.info("Converting TSV to CSV format")
             file = file.replace("\t", ",").replace("    ", ",")
-            return CSVProcessor.query_from_csv(file, filename, dbc, separator=",")
+            return CSVProcessor.query_from_csv(
+                file, filename, dbc, ",", materialize, keys
+            )
         elif filename.endswith(".csv"):
             logger.info("Processing CSV file")
-            return CSVProcessor.query_from_csv(file, filename, dbc, separator=",")
+            return CSVProcessor.query_from_csv(
+                file, filename, dbc, ",", materialize, keys
+            )
         logger.warning(f"Unsupported file format: {filename}")
         return ""
@@ -0,0 +1,381 @@
+import hashlib
+import logging
+import re
+from typing import Any, Optional
+
+from ...databridging import WarehouseCore
+from ...dbconnector import DBConnector
+from ...utils import WrongQueryType, is_read_statement, referenced_identifiers
+from .schema_management import SchemaManager
+
+logger = logging.getLogger(__name__)
+
+MAX_IDENTIFIER_LENGTH = 63
+# Keys as `pg_get_indexdef` renders them on the VARCHAR/INTEGER columns of
+# transaction tables, so that existing indexes are recognized. They serve the
+# `UPPER(target_table)` filter and `target_id::text` lookups of the overlays.
+TRANSACTION_INDEX_COLUMNS = [
+    "upper(target_table::text)",
+    "(target_id::text)",
+    "target_column",
+]
+# Provisioned on transaction tables before, no overlay lookup can use it.
+LEGACY_TRANSACTION_INDEX_COLUMNS = ["target_table", "target_id", "target_column"]
+
+TABLE_ALIAS_PATTERN = re.compile(
+    r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?",
+    re.IGNORECASE,
+)
+PREDICATE_PATTERN = re.compile(
+    r"(?:\b([A-Za-z_]\w*)\.)?\b([A-Za-z_]\w*)\s*"
+    r"(?:=|<>|!=|<=|>=|<|>|\bIN\b|\bBETWEEN\b|\bLIKE\b|\bIS\b)",
+    re.IGNORECASE,
+)
+
+
+class IndexManager:
+    SUGGESTED_STATEMENTS = 50
+    MIN_SUGGESTION_ROWS = 1000
+
+    @staticmethod
+    def index_name(table_name: str, columns: list[str]) -> str:
+        # Postgres' own naming scheme, shortened with a hash when it would be
+        # truncated so that distinct indexes never end up with the same name.
+        words = [re.sub(r"\W+", "_", column).strip("_") for column in columns]
+        name = f"{table_name}_{'_'.join(words)}_idx"
+        if len(name) > MAX_IDENTIFIER_LENGTH:
+            digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:10]
+            name = f"{name[:MAX_IDENTIFIER_LENGTH - 15]}_{digest}_idx"
+        return name
+
+    @staticmethod
+    def get_indexes(dbc: DBConnector) -> dict[str, list[dict[str, Any]]]:
+        rows = dbc.execute_query(
+            """
+            SELECT
+                tbl.relname AS table_name,
+                idx.relname AS index_name,
+                ARRAY(
+                    SELECT pg_get_indexdef(ind.indexrelid, k.n, true)
+                    FROM generate_series(1, ind.indnkeyatts) AS k(n)
+                    ORDER BY k.n
+                ) AS columns,
+                ind.indisunique AS is_unique,
+                ind.indisprimary AS is_primary,
+                pg_get_indexdef(ind.indexrelid) AS definition,
+                stat.idx_scan AS scans,
+                pg_relation_size(ind.indexrelid) AS size
+            FROM pg_catalog.pg_index ind
+            JOIN pg_catalog.pg_class tbl ON tbl.oid = ind.indrelid
+            JOIN pg_catalog.pg_class idx ON idx.oid = ind.indexrelid
+            LEFT JOIN pg_catalog.pg_stat_user_indexes stat
+                ON stat.indexrelid = ind.indexrelid
+            WHERE tbl.relnamespace = 'public'::regnamespace
+            ORDER BY tbl.relname, idx.relname;
+            """,
+            awaits_result=True,
+        )
+
+        indexes: dict[str, list[dict[str, Any]]] = {}
+        for row in rows or []:
+            indexes.setdefault(row.pop("table_name"), []).append(row)
+        return indexes
+
+    @staticmethod
+    def is_covered(
+        indexes: dict[str, list[dict[str, Any]]], table_name: str, columns: list[str]
+    ) -> bool:
+        # A btree index also serves lookups on any prefix of its columns.
+        # Expression keys are compared as `pg_get_indexdef` renders them.
+        return any(
+            index["columns"][: len(columns)] == columns
+            for index in indexes.get(table_name, [])
+        )
+
+    @staticmethod
+    def required_indexes(
+        controller: Any, tables: set[str]
+    ) -> list[tuple[str, list[str], str]]:
+        required = []
+        for table_name, config in WarehouseCore.get_core_tables_metadata().items():
+            for columns in config.indexes:
+                required.append((table_name, columns, "declared"))
+
+        columns_info = SchemaManager.get_all_columns_info(controller.dbc_warehouse)
+        for table_name, columns in columns_info.items():
+            for column in columns:
+                if column["is_foreign_key"]:
+                    required.append(
+                        (table_name, [column["column_name"]], "foreign key")
+                    )
+
+        transaction_tables = {
+            controller.get_transaction_table_name(table_name) for table_name in tables
+        }
+        for transaction_table in sorted(transaction_tables & tables):
+            required.append(
+                (transaction_table, TRANSACTION_INDEX_COLUMNS, "transactions")
+            )
+        return required
+
+    @staticmethod
+    def provision(controller: Any) -> list[dict[str, Any]]:
+        # Creates the declared, foreign key and transactions indexes of the
+        # warehouse that no existing index covers yet.
+        dbc = controller.dbc_warehouse
+        indexes = IndexManager.get_indexes(dbc)
+        tables = set(controller.tables("warehouse"))
+
+        report = []
+        seen = set()
+        for table_name, columns, reason in IndexManager.required_indexes(
+            controller, tables
+        ):
+            if (table_name, tuple(columns)) in seen or table_name not in tables:
+                continue
+            seen.add((table_name, tuple(columns)))
+
+            status = "covered"
+            if not IndexManager.is_covered(indexes, table_name, columns):
+                IndexManager.create_index(dbc, table_name, columns)
+                status = "created"
+            if reason == "transactions":
+                IndexManager._drop_legacy_transaction_index(dbc, indexes, table_name)
+            report.append(
+                {
+                    "table": table_name,
+                    "columns": columns,
+                    "reason": reason,
+                    "status": status,
+                }
+            )
+
+        created = sum(entry["status"] == "created" for entry in report)
+        logger.info(f"Provisioned indexes: {created} created, {len(report)} required")
+        return report
+
+    @staticmethod
+    def _drop_legacy_transaction_index(
+        dbc: DBConnector, indexes: dict[str, list[dict[str, Any]]], table_name: str
+    ) -> None:
+        name = IndexManager.index_name(table_name, LEGACY_TRANSACTION_INDEX_COLUMNS)
+        if any(index["index_name"] == name for index in indexes.get(table_name, [])):
+            logger.info(f"Dropping index {name}, superseded by the overlays' one")
+            dbc.execute_query(f"DROP INDEX IF EXISTS {name};")
+
+    @staticmethod
+    def create_index_query(table_name: str, columns: list[str]) -> str:
+        name = IndexManager.index_name(table_name, columns)
+        return (
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table_name} ({', '.join(columns)});"
+        )
+
+    @staticmethod
+    def create_index(dbc: DBConnector, table_name: str, columns: list[str]) -> str:
+        name = IndexManager.index_name(table_name, columns)
+        logger.info(f"Creating index {name} on {table_name} ({', '.join(columns)})")
+        dbc.execute_query(
+            f"""
+            {IndexManager.create_index_query(table_name, columns)}
+            ANALYZE {table_name};
+            """
+        )
+        return name
+
+    @staticmethod
+    def sample_statements(dbc: Any) -> tuple[str, list[dict]]:
+        # `pg_stat_statements` when the extension is installed in this
+        # database, the connector's own sample otherwise.
+        installed = dbc.execute_query(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'
+            ) AS installed;
+            """,
+            awaits_result=True,
+        )
+        if installed and installed[0]["installed"]:
+            rows = dbc.execute_query(
+                """
+                SELECT query, calls, total_exec_time
+                FROM pg_stat_statements
+                WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+                ORDER BY total_exec_time DESC
+                LIMIT %s;
+                """,
+                placeholders=[IndexManager.SUGGESTED_STATEMENTS],
+                awaits_result=True,
+            )
+            return "pg_stat_statements", rows or []
+
+        if dbc.statement_sampler is None:
+            return "none", []
+        return (
+            "sampler",
+            dbc.statement_sampler.statements()[: IndexManager.SUGGESTED_STATEMENTS],
+        )
+
+    @staticmethod
+    def suggest(dbc: Any) -> dict[str, Any]:
+        source, statements = IndexManager.sample_statements(dbc)
+        indexes = IndexManager.get_indexes(dbc)
+        columns_info = SchemaManager.get_all_columns_info(dbc)
+
+        table_stats = {
+            row["table_name"]: row
+            for row in dbc.execute_query(
+                """
+                SELECT
+                    relname AS table_name,
+                    n_live_tup AS rows,
+                    seq_scan,
+                    seq_tup_read,
+                    COALESCE(idx_scan, 0) AS idx_scan
+                FROM pg_stat_user_tables
+                WHERE schemaname = 'public';
+                """,
+                awaits_result=True,
+            )
+            or []
+        }
+        tables = {
+            name
+            for name, stats in table_stats.items()
+            if stats["rows"] >= IndexManager.MIN_SUGGESTION_ROWS
+        }
+
+        candidates: dict[tuple[str, str], dict[str, Any]] = {}
+        for statement in statements:
+            for table_name, column in IndexManager._filtered_columns(
+                statement["query"], tables, columns_info
+            ):
+                if IndexManager.is_covered(indexes, table_name, [column]):
+                    continue
+                candidate = candidates.setdefault(
+                    (table_name, column),
+                    {
+                        "table": table_name,
+                        "columns": [column],
+                        "calls": 0,
+                        "total_exec_time": 0.0,
+                        "seq_scan": table_stats[table_name]["seq_scan"],
+                        "example": statement["query"],
+                    },
+                )
+                candidate["calls"] += statement["calls"]
+                candidate["total_exec_time"] += statement["total_exec_time"]
+
+        seq_scan_tables = sorted(
+            (
+                stats
+                for name, stats in table_stats.items()
+                if name in tables and stats["seq_scan"] > stats["idx_scan"]
+            ),
+            key=lambda stats: stats["seq_tup_read"],
+            reverse=True,
+        )
+        return {
+            "source": source,
+            "indexes": sorted(
+                candidates.values(),
+                key=lambda candidate: candidate["total_exec_time"],
+                reverse=True,
+            ),
+            "seq_scan_tables": seq_scan_tables,
+        }
+
+    @staticmethod
+    def _filtered_columns(
+        query: str, tables: set[str], columns_info: dict[str, list[dict[str, Any]]]
+    ) -> set[tuple[str, str]]:
+        # Columns compared in the query, resolved to one of the tables it
+        # reads either through their qualifier or because no other one of
+        # those tables has a column with that name.
+        aliases = {}
+        for table_name, alias in TABLE_ALIAS_PATTERN.findall(query):
+            aliases[table_name.lower()] = table_name.lower()
+            if alias:
+                aliases[alias.lower()] = table_name.lower()
+
+        read_tables = referenced_identifiers(query) & tables
+        columns_by_table = {
+            table_name: {column["column_name"] for column in columns_info[table_name]}
+            for table_name in read_tables
+            if table_name in columns_info
+        }
+
+        filtered = set()
+        for qualifier, column in PREDICATE_PATTERN.findall(query):
+            column = column.lower()
+            if qualifier:
+                owners = [aliases.get(qualifier.lower(), qualifier.lower())]
+            else:
+                owners = [
+                    table_name
+                    for table_name, columns in columns_by_table.items()
+                    if column in columns
+                ]
+            if len(owners) == 1 and column in columns_by_table.get(owners[0], set()):
+                filtered.add((owners[0], column))
+        return filtered
+
+    @staticmethod
+    def measure(dbc: DBConnector, queries: list[str]) -> list[dict[str, Any]]:
+        results = []
+        for query in queries:
+            plan = dbc.execute_query(
+                f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", awaits_result=True
+            )[0]["QUERY PLAN"][0]
+            results.append(
+                {
+                    "execution_time_ms": plan["Execution Time"],
+                    "indexes_used": sorted(IndexManager._used_indexes(plan["Plan"])),
+                }
+            )
+        return results
+
+    @staticmethod
+    def _used_indexes(node: dict[str, Any]) -> set[str]:
+        used = {node["Index Name"]} if "Index Name" in node else set()
+        for child in node.get("Plans", []):
+            used |= IndexManager._used_indexes(child)
+        return used
+
+    @staticmethod
+    def apply(
+        controller: Any,
+        dbc: Any,
+        indexes: Optional[list[dict[str, Any]]],
+        queries: list[str],
+    ) -> dict[str, Any]:
+        # Creates the given indexes, or provisions the required ones when
+        # none are given, timing `queries` before and after.
+        for query in queries:
+            if not is_read_statement(query):
+                raise WrongQueryType("Only read queries can be measured")
+
+        before = IndexManager.measure(dbc, queries)
+
+        if indexes is None:
+            created = IndexManager.provision(controller)
+        else:
+            existing = IndexManager.get_indexes(dbc)
+            created = []
+            for index in indexes:
+                columns = list(index["columns"])
+                status = "covered"
+                if not IndexManager.is_covered(existing, index["table"], columns):
+                    IndexManager.create_index(dbc, index["table"], columns)
+                    status = "created"
+                created.append(
+                    {"table": index["table"], "columns": columns, "status": status}
+                )
+
+        after = IndexManager.measure(dbc, queries)
+        return {
+            "indexes": created,
+            "queries": [
+                {"query": query, "before": query_before, "after": query_after}
+                for query, query_before, query_after in zip(queries, before, after)
+            ],
+        }
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Optional
+
+from ...databridging import StageConfiguration
+from .schema_management import SchemaManager
+
+logger = logging.getLogger(__name__)
+
+
+class ManifestManager:
+    # Kept out of the public schema so it never shows up as a warehouse table.
+    MANIFEST_SCHEMA = "etl_metadata"
+    MANIFEST_TABLE = f"{MANIFEST_SCHEMA}.staging_manifest"
+    RELATION_HASHES_TABLE = f"{MANIFEST_SCHEMA}.relation_hashes"
+
+    @staticmethod
+    def create_manifest_table(controller: Any) -> None:
+        controller.dbc_warehouse.execute_query(
+            f"""
+            CREATE SCHEMA IF NOT EXISTS {ManifestManager.MANIFEST_SCHEMA};
+            CREATE TABLE IF NOT EXISTS {ManifestManager.MANIFEST_TABLE} (
+                stage TEXT PRIMARY KEY,
+                files_hash TEXT NOT NULL,
+                sources_hash TEXT NOT NULL,
+                output_hash TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        # Relations of both databases get hashed, each one keeps its own.
+        for dbc in (controller.dbc_raw, controller.dbc_warehouse):
+            dbc.execute_query(
+                f"""
+                CREATE SCHEMA IF NOT EXISTS {ManifestManager.MANIFEST_SCHEMA};
+                CREATE TABLE IF NOT EXISTS {ManifestManager.RELATION_HASHES_TABLE} (
+                    name TEXT PRIMARY KEY,
+                    signature TEXT NOT NULL,
+                    hash TEXT NOT NULL
+                );
+                """
+            )
+
+    @staticmethod
+    def get_manifest(controller: Any) -> dict[str, dict[str, Any]]:
+        rows = controller.dbc_warehouse.execute_query(
+            f"SELECT * FROM {ManifestManager.MANIFEST_TABLE};", awaits_result=True
+        )
+        return {row["stage"]: row for row in rows or []}
+
+    @staticmethod
+    def forget_stage(controller: Any, config: StageConfiguration) -> None:
+        controller.dbc_warehouse.execute_query(
+            f"DELETE FROM {ManifestManager.MANIFEST_TABLE} WHERE stage = %s;",
+            placeholders=[config.name],
+        )
+
+    @staticmethod
+    def record_stage(
+        controller: Any,
+        config: StageConfiguration,
+        files_hash: str,
+        sources_hash: str,
+    ) -> None:
+        output_hash = ManifestManager.hash_outputs(controller, config)
+        controller.dbc_warehouse.execute_query(
+            f"""
+            INSERT INTO {ManifestManager.MANIFEST_TABLE}
+                (stage, files_hash, sources_hash, output_hash)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (stage) DO UPDATE SET
+                files_hash = EXCLUDED.files_hash,
+                sources_hash = EXCLUDED.sources_hash,
+                output_hash = EXCLUDED.output_hash,
+                updated_at = CURRENT_TIMESTAMP;
+            """,
+            placeholders=[config.name, files_hash, sources_hash, output_hash],
+        )
+
+    @staticmethod
+    def hash_files(controller: Any, config: StageConfiguration) -> str:
+        # The configuration itself is part of the hash, so renaming an output
+        # or a datasource reruns the stage like editing a file does.
+        digest = hashlib.sha256(config.dumps().encode("utf-8"))
+        for file in config.staging_files:
+            real_path = os.path.join(
+                os.getcwd(), controller.staging_folder, config.workdir, file
+            ).strip()
+            with open(real_path, mode="rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_sources(controller: Any, config: StageConfiguration) -> str:
+        return ManifestManager._hash_relations(
+            controller.dbc_raw, sorted(config.datasources)
+        )
+
+    @staticmethod
+    def hash_outputs(controller: Any, config: StageConfiguration) -> str:
+        to_views = sorted(
+            StageConfiguration.get_from_view_and_to_view(expression)[1]
+            for expression in config.datamarts
+        )
+        return ManifestManager._hash_relations(controller.dbc_warehouse, to_views)
+
+    @staticmethod
+    def get_signatures(dbc: Any, names: list[str]) -> dict[str, str]:
+        # Cheap stand-in for the content of relations. Every row version has
+        # its own (ctid, xmin), so their count and sum change with any write
+        # without hashing nor sorting the rows. Views are signed by their
+        # definition and the signatures of what they read. The statistics
+        # collector's write counters would be cheaper still, but they only
+        # reach `pg_stat_user_tables` some time after the writes.
+        rows = dbc.execute_query(
+            """
+            SELECT
+                relname,
+                relkind,
+                CASE WHEN relkind = 'v' THEN md5(pg_get_viewdef(oid)) END AS definition
+            FROM pg_catalog.pg_class
+            WHERE relnamespace = 'public'::regnamespace
+            AND relkind IN ('r', 'p', 'v', 'm');
+            """,
+            awaits_result=True,
+        )
+        relations = {row["relname"]: row for row in rows or []}
+        dependencies = SchemaManager.get_view_dependencies(dbc)
+        signatures: dict[str, Optional[str]] = {}
+
+        def sign(name: str, visiting: set[str]) -> Optional[str]:
+            if name in signatures:
+                return signatures[name]
+            relation = relations.get(name)
+            if relation is None or name in visiting:
+                return None
+
+            if relation["relkind"] != "v":
+                result = dbc.execute_query(
+                    f"""
+                    SELECT
+                        count(*) AS count,
+                        sum(hashtext(tableoid::text || ctid::text || xmin::text))
+                            AS fingerprint
+                    FROM {name};
+                    """,
+                    awaits_result=True,
+                )
+                signature = f"{result[0]['count']}:{result[0]['fingerprint']}"
+            else:
+                parts = [relation["definition"]]
+                for dependency in sorted(dependencies.get(name, set())):
+                    dependency_signature = sign(dependency, visiting | {name})
+                    if dependency_signature is None:
+                        signatures[name] = None
+                        return None
+                    parts.append(f"{dependency}={dependency_signature}")
+                signature = hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+            signatures[name] = signature
+            return signature
+
+        for name in names:
+            sign(name, set())
+        return {name: signatures[name] for name in names if signatures.get(name)}
+
+    @staticmethod
+    def hash_relations(dbc: Any, names: list[str]) -> dict[str, Optional[str]]:
+        # Content hashes of `names`, leaving out the ones that do not exist.
+        # A relation is only hashed again when its signature differs from the
+        # one its stored hash was computed with.
+        known = SchemaManager.get_all_columns_info(dbc)
+        names = [name for name in dict.fromkeys(names) if name in known]
+        if not names:
+            return {}
+
+        signatures = ManifestManager.get_signatures(dbc, names)
+        stored = {
+            row["name"]: row
+            for row in dbc.execute_query(
+                f"""
+                SELECT name, signature, hash
+                FROM {ManifestManager.RELATION_HASHES_TABLE}
+                WHERE name = ANY(%s);
+                """,
+                placeholders=[names],
+                awaits_result=True,
+            )
+            or []
+        }
+
+        hashes = {}
+        for name in names:
+            signature = signatures.get(name)
+            entry = stored.get(name)
+            if signature is not None and entry and entry["signature"] == signature:
+                hashes[name] = entry["hash"]
+                continue
+
+            hashes[name] = ManifestManager._hash_content(dbc, name)
+            if signature is not None:
+                dbc.execute_query(
+                    f"""
+                    INSERT INTO {ManifestManager.RELATION_HASHES_TABLE}
+                        (name, signature, hash)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (name) DO UPDATE SET
+                        signature = EXCLUDED.signature,
+                        hash = EXCLUDED.hash;
+                    """,
+                    placeholders=[name, signature, hashes[name]],
+                )
+        return hashes
+
+    @staticmethod
+    def hash_relation(dbc: Any, name: str) -> Optional[str]:
+        return ManifestManager.hash_relations(dbc, [name]).get(name)
+
+    @staticmethod
+    def _hash_content(dbc: Any, name: str) -> str:
+        # Rows are hashed one by one and sorted, so the result does not
+        # depend on their physical order.
+        result = dbc.execute_query(
+            f"""
+            SELECT count(*) AS count, md5(string_agg(row_hash, '' ORDER BY row_hash)) AS hash
+            FROM (SELECT md5(t::text) AS row_hash FROM {name} t) AS rows;
+            """,
+            awaits_result=True,
+        )
+        return f"{result[0]['count']}:{result[0]['hash']}"
+
+    @staticmethod
+    def _hash_relations(dbc: Any, names: list[str]) -> str:
+        found = ManifestManager.hash_relations(dbc, names)
+        hashes = {name: found.get(name) for name in names}
+        return hashlib.sha256(json.dumps(hashes).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def plan_stages(
+        controller: Any,
+        ordered_configs: list[StageConfiguration],
+        dependencies: dict[str, set[str]],
+        force: bool = False,
+    ) -> dict[str, dict[str, Any]]:
+        # Decides which stages have to run: the ones whose files, datasources
+        # or outputs changed since they last ran, and every stage downstream
+        # of them. `ordered_configs` must be in dependency order.
+        manifest = {} if force else ManifestManager.get_manifest(controller)
+        plan: dict[str, dict[str, Any]] = {}
+
+        for config in ordered_configs:
+            entry = manifest.get(config.name)
+            upstream = sorted(
+                dependency
+                for dependency in dependencies.get(config.name, set())
+                if plan.get(dependency, {}).get("run")
+            )
+
+            if force:
+                reason = "forced"
+            elif entry is None:
+                reason = "never ran"
+            elif entry["files_hash"] != ManifestManager.hash_files(controller, config):
+                reason = "staging files changed"
+            elif upstream:
+                reason = f"upstream stages rerun: {', '.join(upstream)}"
+            elif entry["sources_hash"] != ManifestManager.hash_sources(
+                controller, config
+            ):
+                reason = "datasources changed"
+            elif entry["output_hash"] != ManifestManager.hash_outputs(
+                controller, config
+            ):
+                reason = "outputs changed"
+            else:
+                reason = None
+
+            plan[config.name] = {"run": reason is not None, "reason": reason}
+
+        return plan
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+from typing import Any
+
+from ...dbconnector import DBConnector
+from .index_management import IndexManager
+from .manifest import ManifestManager
+from .schema_management import SchemaManager
+
+logger = logging.getLogger(__name__)
+
+
+class MaterializationManager:
+    MATERIALIZATIONS_TABLE = f"{ManifestManager.MANIFEST_SCHEMA}.materializations"
+
+    @staticmethod
+    def drop_view_query(view_name: str) -> str:
+        # `DROP VIEW` refuses materialized views and the other way around, so
+        # a stage can switch between both without failing on its next run.
+        return f"""
+            DO $$
+            BEGIN
+                IF EXISTS (
+                    SELECT 1 FROM pg_catalog.pg_class
+                    WHERE relnamespace = 'public'::regnamespace
+                    AND relname = '{view_name}' AND relkind = 'm'
+                ) THEN
+                    DROP MATERIALIZED VIEW {view_name} CASCADE;
+                ELSE
+                    DROP VIEW IF EXISTS {view_name} CASCADE;
+                END IF;
+            END $$;
+        """
+
+    @staticmethod
+    def create_view_query(
+        view_name: str, select_query: str, materialize: bool, keys: list[list[str]]
+    ) -> str:
+        query = MaterializationManager.drop_view_query(view_name)
+        if not materialize:
+            return query + f"CREATE VIEW {view_name} AS {select_query};"
+
+        query += f"CREATE MATERIALIZED VIEW {view_name} AS {select_query};"
+        for columns in keys:
+            query += f"""
+                CREATE INDEX {IndexManager.index_name(view_name, columns)}
+                ON {view_name} ({', '.join(columns)});
+            """
+        return query + f"ANALYZE {view_name};"
+
+    @staticmethod
+    def create_materializations_table(controller: Any) -> None:
+        controller.dbc_raw.execute_query(
+            f"""
+            CREATE SCHEMA IF NOT EXISTS {ManifestManager.MANIFEST_SCHEMA};
+            CREATE TABLE IF NOT EXISTS {MaterializationManager.MATERIALIZATIONS_TABLE} (
+                name TEXT PRIMARY KEY,
+                relation OID NOT NULL,
+                sources_hash TEXT NOT NULL,
+                refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+
+    @staticmethod
+    def get_materialized_views(dbc: DBConnector) -> dict[str, dict[str, Any]]:
+        # Every materialized view with the relations it reads, plain views
+        # replaced by what they read, recursively.
+        relations = dbc.execute_query(
+            """
+            SELECT oid AS relation, relname, relkind FROM pg_catalog.pg_class
+            WHERE relnamespace = 'public'::regnamespace
+            AND relkind IN ('r', 'p', 'v', 'm');
+            """,
+            awaits_result=True,
+        )
+        kinds = {row["relname"]: row["relkind"] for row in relations or []}
+        dependencies = SchemaManager.get_view_dependencies(dbc)
+
+        materialized_views = {}
+        for row in relations or []:
+            if row["relkind"] != "m":
+                continue
+
+            sources = set()
+            pending = set(dependencies.get(row["relname"], set()))
+            seen = set()
+            while pending:
+                relation = pending.pop()
+                if relation in seen or relation not in kinds:
+                    continue
+                seen.add(relation)
+                if kinds[relation] == "v":
+                    pending |= dependencies.get(relation, set())
+                else:
+                    sources.add(relation)
+
+            materialized_views[row["relname"]] = {
+                "relation": row["relation"],
+                "sources": sorted(sources),
+            }
+        return materialized_views
+
+    @staticmethod
+    def refresh_order(materialized_views: dict[str, dict[str, Any]]) -> list[str]:
+        # Materialized views reading other ones come after them.
+        order: list[str] = []
+        visiting: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in order or name in visiting:
+                return
+            visiting.add(name)
+            for source in materialized_views[name]["sources"]:
+                if source in materialized_views:
+                    visit(source)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in sorted(materialized_views):
+            visit(name)
+        return order
+
+    @staticmethod
+    def hash_sources(dbc: DBConnector, sources: list[str]) -> str:
+        found = ManifestManager.hash_relations(dbc, sources)
+        hashes = {name: found.get(name) for name in sources}
+        return hashlib.sha256(json.dumps(hashes).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_records(dbc: DBConnector) -> dict[str, dict[str, Any]]:
+        rows = dbc.execute_query(
+            f"SELECT * FROM {MaterializationManager.MATERIALIZATIONS_TABLE};",
+            awaits_result=True,
+        )
+        return {row["name"]: row for row in rows or []}
+
+    @staticmethod
+    def record(dbc: DBConnector, name: str, relation: int, sources_hash: str) -> None:
+        dbc.execute_query(
+            f"""
+            INSERT INTO {MaterializationManager.MATERIALIZATIONS_TABLE}
+                (name, relation, sources_hash)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (name) DO UPDATE SET
+                relation = EXCLUDED.relation,
+                sources_hash = EXCLUDED.sources_hash,
+                refreshed_at = CURRENT_TIMESTAMP;
+            """,
+            placeholders=[name, relation, sources_hash],
+        )
+
+    @staticmethod
+    def record_created(controller: Any) -> None:
+        # Materialized views created since they were last recorded are as
+        # fresh as their sources are now.
+        dbc = controller.dbc_raw
+        records = MaterializationManager.get_records(dbc)
+        for name, view in MaterializationManager.get_materialized_views(dbc).items():
+            record = records.get(name)
+            if record is None or record["relation"] != view["relation"]:
+                MaterializationManager.record(
+                    dbc,
+                    name,
+                    view["relation"],
+                    MaterializationManager.hash_sources(dbc, view["sources"]),
+                )
+
+    @staticmethod
+    def refresh(controller: Any, force: bool = False) -> dict[str, dict[str, Any]]:
+        # Refreshes the materialized views of raw whose sources changed since
+        # they were last computed, upstream ones first so that the ones
+        # reading them see their new content.
+        dbc = controller.dbc_raw
+        materialized_views = MaterializationManager.get_materialized_views(dbc)
+        records = {} if force else MaterializationManager.get_records(dbc)
+
+        report = {}
+        for name in MaterializationManager.refresh_order(materialized_views):
+            view = materialized_views[name]
+            sources_hash = MaterializationManager.hash_sources(dbc, view["sources"])
+            record = records.get(name)
+
+            if force:
+                reason = "forced"
+            elif record is None or record["relation"] != view["relation"]:
+                reason = "never recorded"
+            elif record["sources_hash"] != sources_hash:
+                reason = "sources changed"
+            else:
+                reason = None
+
+            if reason is not None:
+                logger.info(f"Refreshing materialized view {name}: {reason}")
+                dbc.execute_query(f"REFRESH MATERIALIZED VIEW {name}; ANALYZE {name};")
+                MaterializationManager.record(dbc, name, view["relation"], sources_hash)
+
+            report[name] = {
+                "sources": view["sources"],
+                "refreshed": reason is not None,
+                "reason": reason,
+            }
+
+        refreshed = sum(entry["refreshed"] for entry in report.values())
+        logger.info(f"Refreshed {refreshed} of {len(report)} materialized views")
+        return report
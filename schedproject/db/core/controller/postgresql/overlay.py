@@ -0,0 +1,248 @@
+import logging
+from typing import Any, Optional
+
+from .compaction import CompactionManager
+from .index_management import TRANSACTION_INDEX_COLUMNS, IndexManager
+from .manifest import ManifestManager
+from .utils import OverlayStrategy
+
+logger = logging.getLogger(__name__)
+
+
+class OverlayManager:
+    @staticmethod
+    def overlay_query(
+        table_name: str,
+        primary_key_name: str,
+        schema: dict[str, str],
+        transaction_table: str,
+        ids: Optional[str] = None,
+    ) -> str:
+        # Latest transaction of every (row, column), compacted ones included,
+        # applied over the base table. `ids` is an SQL expression holding an
+        # array of primary keys as text, restricting the query to those rows.
+        transactions_filter = ""
+        rows_filter = ""
+        if ids is not None:
+            transactions_filter = f"AND target_id::text = ANY({ids})"
+            primary_key_type = schema.get(primary_key_name, "INTEGER")
+            rows_filter = f"AND r.{primary_key_name} = ANY({ids}::{primary_key_type}[])"
+
+        left_joins = ""
+        coalesces = []
+        for col_name in schema.keys():
+            if col_name != primary_key_name:
+                left_joins += f"""
+                    LEFT JOIN filtered_transactions ft_{col_name} ON r.{primary_key_name}::text = ft_{col_name}.target_id::text
+                        AND ft_{col_name}.target_column = '{col_name}'
+                        AND ft_{col_name}.action != 'delete'
+                    """
+
+                col_type = ""
+                if schema[col_name].upper() != "TEXT":
+                    col_type = f"::{schema[col_name].upper()}"
+
+                coalesces.append(
+                    f"COALESCE(ft_{col_name}.new_value{col_type}, r.{col_name}) AS {col_name}"
+                )
+
+        coalesces_str = ",\n".join(coalesces)
+
+        return f"""
+            WITH latest_transactions AS (
+                SELECT
+                    target_table,
+                    target_column,
+                    target_id,
+                    new_value,
+                    action,
+                    ROW_NUMBER() OVER (PARTITION BY target_table,
+                        target_id,
+                        target_column ORDER BY created_at DESC,
+                        id DESC) AS rn
+                FROM ({CompactionManager.transactions_query(transaction_table)}) AS transactions
+                WHERE UPPER(target_table) = UPPER('{table_name}')
+                {transactions_filter}
+            ),
+            filtered_transactions AS (
+                SELECT
+                    target_table,
+                    target_column,
+                    target_id,
+                    new_value,
+                    action
+                FROM latest_transactions
+                WHERE rn = 1
+            ),
+            modified_table AS (
+                SELECT
+                    r.{primary_key_name},
+                    {coalesces_str}
+                FROM
+                    {table_name} r
+                    {left_joins}
+                    WHERE
+                        NOT EXISTS (
+                            SELECT 1 FROM filtered_transactions ft_delete
+                            WHERE r.{primary_key_name}::text = ft_delete.target_id::text
+                                    AND ft_delete.action = 'delete'
+                        )
+                        {rows_filter}
+            )
+
+            SELECT * FROM modified_table
+        """
+
+    @staticmethod
+    def current_table_name(table_name: str) -> str:
+        return f"{ManifestManager.MANIFEST_SCHEMA}.{table_name}_current"
+
+    @staticmethod
+    def create_overlay(
+        controller: Any,
+        table_name: str,
+        primary_key_name: str,
+        schema: dict[str, str],
+        transaction_table: str,
+    ) -> None:
+        view_name = controller.create_associated_view_name(table_name)
+        CompactionManager.create_snapshot_table(controller, transaction_table)
+        overlay_query = OverlayManager.overlay_query(
+            table_name, primary_key_name, schema, transaction_table
+        )
+
+        if controller.overlay_strategy == OverlayStrategy.VIEW:
+            query = f"""
+                {OverlayManager.drop_materialized_overlay_query(table_name, transaction_table)}
+                DROP VIEW IF EXISTS {view_name} CASCADE;
+                CREATE VIEW {view_name} AS
+                {overlay_query};
+            """
+            logger.info(f"Executing query to create view: {view_name}")
+            controller.dbc_warehouse.execute_query(query=query)
+            return
+
+        # Materialized overlay: the view reads a table holding the current
+        # state of every row, rebuilt here and then kept up to date by
+        # statement level triggers refreshing only the rows they touched.
+        current_table = OverlayManager.current_table_name(table_name)
+        refresh_function = f"{current_table}_refresh"
+        refresh_query = OverlayManager.overlay_query(
+            table_name, primary_key_name, schema, transaction_table, ids="ids"
+        )
+        primary_key_type = schema.get(primary_key_name, "INTEGER")
+
+        transaction_ids = f"""
+            ARRAY(
+                SELECT DISTINCT target_id::text FROM {{rows}}
+                WHERE UPPER(target_table) = UPPER('{table_name}')
+            )
+        """
+        base_ids = f"ARRAY(SELECT DISTINCT {primary_key_name}::text FROM {{rows}})"
+        transaction_triggers = OverlayManager._sync_triggers_query(
+            table_name,
+            transaction_table,
+            f"{current_table}_transaction_sync",
+            refresh_function,
+            transaction_ids,
+        )
+        base_triggers = OverlayManager._sync_triggers_query(
+            table_name,
+            table_name,
+            f"{current_table}_base_sync",
+            refresh_function,
+            base_ids,
+        )
+
+        query = f"""
+            DROP VIEW IF EXISTS {view_name} CASCADE;
+            DROP TABLE IF EXISTS {current_table} CASCADE;
+            CREATE TABLE {current_table} AS
+            {overlay_query};
+            ALTER TABLE {current_table} ADD PRIMARY KEY ({primary_key_name});
+
+            CREATE VIEW {view_name} AS
+            SELECT * FROM {current_table};
+
+            DROP INDEX IF EXISTS {transaction_table}_target_idx;
+            {IndexManager.create_index_query(transaction_table, TRANSACTION_INDEX_COLUMNS)}
+
+            CREATE OR REPLACE FUNCTION {refresh_function}(ids TEXT[])
+            RETURNS void AS $$
+            BEGIN
+                DELETE FROM {current_table}
+                WHERE {primary_key_name} = ANY(ids::{primary_key_type}[]);
+                INSERT INTO {current_table}
+                {refresh_query};
+            END;
+            $$ LANGUAGE plpgsql;
+
+            {transaction_triggers}
+            {base_triggers}
+        """
+        logger.info(f"Materializing overlay of {table_name} into {current_table}")
+        controller.dbc_warehouse.execute_query(query=query)
+
+    @staticmethod
+    def _sync_triggers_query(
+        table_name: str, source: str, function: str, refresh_function: str, ids: str
+    ) -> str:
+        # One trigger per event, as transition tables of a trigger firing on
+        # several events cannot be told apart. `ids` selects the primary keys
+        # to refresh from the `{rows}` transition table. The result cache finds
+        # the tables kept up to date this way from the trigger names.
+        old_ids = ids.format(rows="old_rows")
+        new_ids = ids.format(rows="new_rows")
+        return f"""
+            CREATE OR REPLACE FUNCTION {function}()
+            RETURNS trigger AS $$
+            BEGIN
+                IF current_setting('{CompactionManager.COMPACTING_SETTING}', true) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP <> 'INSERT' THEN
+                    PERFORM {refresh_function}({old_ids});
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    PERFORM {refresh_function}({new_ids});
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            {OverlayManager._drop_sync_triggers_query(table_name, source)}
+            CREATE TRIGGER {table_name}_current_sync_insert
+            AFTER INSERT ON {source} REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+            CREATE TRIGGER {table_name}_current_sync_update
+            AFTER UPDATE ON {source}
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+            CREATE TRIGGER {table_name}_current_sync_delete
+            AFTER DELETE ON {source} REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {function}();
+        """
+
+    @staticmethod
+    def _drop_sync_triggers_query(table_name: str, source: str) -> str:
+        return "".join(
+            f"DROP TRIGGER IF EXISTS {table_name}_current_sync_{event} ON {source};\n"
+            for event in ("insert", "update", "delete")
+        )
+
+    @staticmethod
+    def drop_materialized_overlay_query(table_name: str, transaction_table: str) -> str:
+        current_table = OverlayManager.current_table_name(table_name)
+        return f"""
+            {OverlayManager._drop_sync_triggers_query(table_name, transaction_table)}
+            {OverlayManager._drop_sync_triggers_query(table_name, table_name)}
+            DROP TABLE IF EXISTS {current_table} CASCADE;
+        """
+
+    @staticmethod
+    def detach_base_table(controller: Any, table_name: str) -> None:
+        # Bulk merges would refresh the current state of every row they touch,
+        # it is rebuilt in one go by `create_overlay` once they are done.
+        controller.dbc_warehouse.execute_query(
+            OverlayManager._drop_sync_triggers_query(table_name, table_name)
+        )
@@ -1,97 +1,203 @@
 import logging
 from typing import Any, Dict, Set
+from weakref import WeakKeyDictionary
 
 from ...dbconnector import DBConnector
-from ..api_extension import InvalidTableName
 
 logger = logging.getLogger(__name__)
 
 
 class SchemaManager:
     _core_columns_cache: Dict[str, Set[str]] = {}
+    _catalog_cache: WeakKeyDictionary[
+        DBConnector, tuple[int, dict[str, list[dict[str, Any]]]]
+    ] = WeakKeyDictionary()
+    _view_dependencies_cache: WeakKeyDictionary[
+        DBConnector, tuple[int, dict[str, set[str]]]
+    ] = WeakKeyDictionary()
+    _referencing_tables_cache: WeakKeyDictionary[
+        DBConnector, tuple[int, dict[str, set[str]]]
+    ] = WeakKeyDictionary()
 
     @staticmethod
-    def get_column_info(
-        dbc: DBConnector,
-        table_name: str,
-    ) -> list[dict[str, Any]]:
-
+    def get_all_columns_info(dbc: DBConnector) -> dict[str, list[dict[str, Any]]]:
+        # Columns of every public relation, read from `pg_catalog` in a single
+        # query and cached until the next DDL statement run through `dbc`.
+        cached = SchemaManager._catalog_cache.get(dbc)
+        if cached is not None and cached[0] == dbc.schema_version:
+            return cached[1]
+
+        schema_version = dbc.schema_version
         query = """
         SELECT
-            c.column_name,
-            c.data_type,
-            c.is_nullable,
-            c.column_default,
+            cls.relname AS table_name,
+            att.attname AS column_name,
             CASE
-                WHEN pk.constraint_type = 'PRIMARY KEY' THEN true
-                ELSE false
-            END AS is_primary_key,
+                WHEN typ.typelem <> 0 AND typ.typlen = -1 THEN 'ARRAY'
+                WHEN typ.typtype = 'd' THEN format_type(typ.typbasetype, NULL)
+                WHEN typ.typnamespace = 'pg_catalog'::regnamespace
+                    THEN format_type(att.atttypid, NULL)
+                ELSE 'USER-DEFINED'
+            END AS data_type,
+            CASE WHEN att.attnotnull THEN 'NO' ELSE 'YES' END AS is_nullable,
             CASE
-                WHEN fk.constraint_name IS NOT NULL THEN true
-                ELSE false
-            END AS is_foreign_key,
-            fk.foreign_table_name,
-            fk.foreign_column_name
+                WHEN att.attgenerated = '' THEN pg_get_expr(def.adbin, def.adrelid)
+            END AS column_default,
+            pk.oid IS NOT NULL AS is_primary_key,
+            fk.oid IS NOT NULL AS is_foreign_key,
+            fcls.relname AS foreign_table_name,
+            fatt.attname AS foreign_column_name
         FROM
-            information_schema.columns c
-        LEFT JOIN (
-            SELECT ku.table_name, ku.column_name, tc.constraint_type
-            FROM information_schema.table_constraints tc
-            JOIN information_schema.key_column_usage ku
-                ON tc.constraint_name = ku.constraint_name
-            WHERE tc.constraint_type = 'PRIMARY KEY'
-        ) pk ON c.table_name = pk.table_name AND c.column_name = pk.column_name
-        LEFT JOIN (
-            SELECT
-                kcu.table_name,
-                kcu.column_name,
-                kcu.constraint_name,
-                ccu.table_name AS foreign_table_name,
-                ccu.column_name AS foreign_column_name
-            FROM
-                information_schema.key_column_usage kcu
-            JOIN information_schema.referential_constraints rc
-                ON kcu.constraint_name = rc.constraint_name
-            JOIN information_schema.constraint_column_usage ccu
-                ON rc.unique_constraint_name = ccu.constraint_name
-        ) fk ON c.table_name = fk.table_name AND c.column_name = fk.column_name
+            pg_catalog.pg_class cls
+        JOIN pg_catalog.pg_attribute att
+            ON att.attrelid = cls.oid AND att.attnum > 0 AND NOT att.attisdropped
+        JOIN pg_catalog.pg_type typ ON typ.oid = att.atttypid
+        LEFT JOIN pg_catalog.pg_attrdef def
+            ON def.adrelid = cls.oid AND def.adnum = att.attnum
+        LEFT JOIN pg_catalog.pg_constraint pk
+            ON pk.conrelid = cls.oid
+            AND pk.contype = 'p'
+            AND att.attnum = ANY (pk.conkey)
+        LEFT JOIN pg_catalog.pg_constraint fk
+            ON fk.conrelid = cls.oid
+            AND fk.contype = 'f'
+            AND att.attnum = ANY (fk.conkey)
+        LEFT JOIN pg_catalog.pg_class fcls ON fcls.oid = fk.confrelid
+        LEFT JOIN pg_catalog.pg_attribute fatt
+            ON fatt.attrelid = fk.confrelid
+            AND fatt.attnum = fk.confkey[array_position(fk.conkey, att.attnum)]
         WHERE
-            c.table_name = %s
+            cls.relnamespace = 'public'::regnamespace
+            AND cls.relkind IN ('r', 'p', 'v', 'm')
         ORDER BY
-            c.ordinal_position;
+            cls.relname, att.attnum;
         """
 
-        result = dbc.execute_query(query, placeholders=[table_name], awaits_result=True)
+        rows = dbc.execute_query(query, awaits_result=True) or []
 
-        if result is None:
-            logger.error(f"Table '{table_name}' not found in the database.")
-            raise InvalidTableName(f"Table '{table_name}' not found in the database.")
+        columns_info: dict[str, list[dict[str, Any]]] = {}
+        for row in rows:
+            columns_info.setdefault(row.pop("table_name"), []).append(row)
 
-        core_columns = SchemaManager.get_core_columns(table_name)
+        SchemaManager._catalog_cache[dbc] = (schema_version, columns_info)
+        logger.info(f"Fetched catalog information for {len(columns_info)} relations")
+        return columns_info
+
+    @staticmethod
+    def get_view_dependencies(dbc: DBConnector) -> dict[str, set[str]]:
+        cached = SchemaManager._view_dependencies_cache.get(dbc)
+        if cached is not None and cached[0] == dbc.schema_version:
+            return cached[1]
+
+        schema_version = dbc.schema_version
+        query = """
+        SELECT DISTINCT
+            view.relname AS view_name,
+            dependency.relname AS relation_name
+        FROM
+            pg_catalog.pg_rewrite rw
+        JOIN pg_catalog.pg_class view ON view.oid = rw.ev_class
+        JOIN pg_catalog.pg_depend dep
+            ON dep.objid = rw.oid
+            AND dep.classid = 'pg_catalog.pg_rewrite'::regclass
+            AND dep.refclassid = 'pg_catalog.pg_class'::regclass
+        JOIN pg_catalog.pg_class dependency ON dependency.oid = dep.refobjid
+        WHERE
+            view.relnamespace = 'public'::regnamespace
+            AND dependency.oid <> view.oid;
+        """
+
+        dependencies: dict[str, set[str]] = {}
+        for row in dbc.execute_query(query, awaits_result=True) or []:
+            dependencies.setdefault(row["view_name"], set()).add(row["relation_name"])
+
+        SchemaManager._view_dependencies_cache[dbc] = (schema_version, dependencies)
+        return dependencies
+
+    @staticmethod
+    def get_referencing_tables(dbc: DBConnector) -> dict[str, set[str]]:
+        # Tables whose rows a write to the referenced table can change: through
+        # the actions of their foreign keys, or for the current state of a
+        # materialized overlay, through the triggers syncing it.
+        cached = SchemaManager._referencing_tables_cache.get(dbc)
+        if cached is not None and cached[0] == dbc.schema_version:
+            return cached[1]
+
+        schema_version = dbc.schema_version
+        query = """
+        SELECT DISTINCT
+            referenced.relname AS referenced_name,
+            referencing.relname AS referencing_name
+        FROM
+            pg_catalog.pg_constraint con
+        JOIN pg_catalog.pg_class referenced ON referenced.oid = con.confrelid
+        JOIN pg_catalog.pg_class referencing ON referencing.oid = con.conrelid
+        WHERE
+            con.contype = 'f'
+            AND referenced.relnamespace = 'public'::regnamespace
+            AND (con.confdeltype NOT IN ('a', 'r') OR con.confupdtype NOT IN ('a', 'r'))
+        UNION
+        SELECT DISTINCT
+            source.relname AS referenced_name,
+            left(tg.tgname, strpos(tg.tgname, '_current_sync_') + 7)
+                AS referencing_name
+        FROM
+            pg_catalog.pg_trigger tg
+        JOIN pg_catalog.pg_class source ON source.oid = tg.tgrelid
+        WHERE
+            NOT tg.tgisinternal
+            AND tg.tgname LIKE '%\\_current\\_sync\\_%';
+        """
 
-        for column in result:
-            column["is_core"] = (
-                column["column_name"] in core_columns if core_columns else False
+        referencing: dict[str, set[str]] = {}
+        for row in dbc.execute_query(query, awaits_result=True) or []:
+            referencing.setdefault(row["referenced_name"], set()).add(
+                row["referencing_name"]
             )
 
-        return result
+        SchemaManager._referencing_tables_cache[dbc] = (schema_version, referencing)
+        return referencing
+
+    @staticmethod
+    def get_relations_closure(
+        dbc: DBConnector, names: set[str], written: bool = False
+    ) -> set[str]:
+        # Known relations among `names`, plus everything the views among them
+        # are built on, recursively. For `written` relations, also the tables
+        # their foreign key actions cascade to.
+        dependencies = SchemaManager.get_view_dependencies(dbc)
+        referencing = SchemaManager.get_referencing_tables(dbc) if written else {}
+        pending = names & SchemaManager.get_all_columns_info(dbc).keys()
+        relations: set[str] = set()
+        while pending:
+            relation = pending.pop()
+            if relation not in relations:
+                relations.add(relation)
+                pending |= dependencies.get(relation, set())
+                pending |= referencing.get(relation, set())
+        return relations
+
+    @staticmethod
+    def get_column_info(
+        dbc: DBConnector,
+        table_name: str,
+    ) -> list[dict[str, Any]]:
+        columns_info = SchemaManager.get_all_columns_info(dbc)
+        core_columns = SchemaManager.get_core_columns(table_name)
+
+        return [
+            {**column, "is_core": column["column_name"] in core_columns}
+            for column in columns_info.get(table_name, [])
+        ]
 
     @staticmethod
     def get_table_schema(dbc: DBConnector, table_name: str) -> dict[str, str]:
         logger.info(f"Fetching schema for table: {table_name}")
-        query = """
-            SELECT column_name, data_type
-            FROM information_schema.columns
-            WHERE table_name = %s
-        """
-        tuplerows = dbc.execute_query(
-            query=query, placeholders=[table_name], awaits_result=True
-        )
-
-        if tuplerows is None:
-            logger.error(f"Invalid table name: {table_name}")
-            raise InvalidTableName()
-        schema = {column["column_name"]: column["data_type"] for column in tuplerows}
+        columns_info = SchemaManager.get_all_columns_info(dbc)
+        schema = {
+            column["column_name"]: column["data_type"]
+            for column in columns_info.get(table_name, [])
+        }
         logger.info(f"Schema fetched successfully for {table_name}")
         return schema
 
@@ -110,13 +216,7 @@ class SchemaManager:
     def capture_core_columns_after_creation(dbc: DBConnector, table_name: str) -> None:
         logger.info(f"Capturing core columns for table: {table_name}")
 
-        query = """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_name = %s
-        """
-
-        result = dbc.execute_query(query, placeholders=[table_name], awaits_result=True)
+        result = SchemaManager.get_all_columns_info(dbc).get(table_name)
 
         if result:
             columns = {row["column_name"] for row in result}
@@ -1,58 +1,230 @@
 import logging
-from typing import Any
+import time
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
 
 from ...utils import TransactionStrategy
 from ...databridging import (
     StageConfiguration,
+    StageConfigurationCycle,
     WarehouseCore,
 )
+from .overlay import OverlayManager
 from .schema_management import SchemaManager
 
 logger = logging.getLogger(__name__)
 
+RELATION_KINDS = {"r": "table", "p": "table", "v": "view", "m": "materialized view"}
+
 
 class TransformationManager:
     @staticmethod
-    def verify_staging_results(
+    def verify_datamarts(
         configs: list[StageConfiguration],
         controller: Any,
-    ) -> list[str]:
-        logger.info("Verifying staging results")
-        ret = []
+    ) -> dict[str, dict[str, Any]]:
+        # Existence of every datamart and of its view from a single catalog
+        # query, and emptiness from one `EXISTS` probe per datamart sent as a
+        # single statement, so it does not depend on the size of the tables.
+        datamarts = {}
         for config in configs:
             for expression in config.datamarts:
                 from_view, to_view = StageConfiguration.get_from_view_and_to_view(
                     expression
                 )
-                if not controller.table_or_view_exists(
-                    to_view, "warehouse"
-                ) or not controller.check_table_content(to_view):
-                    logger.error(
-                        f"Inconsistency found for {to_view}: Missing or empty in warehouse."
-                    )
-                    ret.append(to_view)
+                datamarts[to_view] = {
+                    "stage": config.name,
+                    "from_view": from_view,
+                    "view": controller.create_associated_view_name(to_view),
+                }
+        if not datamarts:
+            return {}
+
+        relations = controller.dbc_warehouse.execute_query(
+            """
+            SELECT relname, relkind FROM pg_catalog.pg_class
+            WHERE relnamespace = 'public'::regnamespace
+            AND relkind IN ('r', 'p', 'v', 'm')
+            AND relname = ANY(%s);
+            """,
+            placeholders=[
+                [
+                    name
+                    for to_view, entry in datamarts.items()
+                    for name in (to_view, entry["view"])
+                ]
+            ],
+            awaits_result=True,
+        )
+        kinds = {
+            row["relname"]: RELATION_KINDS[row["relkind"]] for row in relations or []
+        }
+
+        existing = [to_view for to_view in datamarts if to_view in kinds]
+        has_rows = {}
+        if existing:
+            probes = controller.dbc_warehouse.execute_query(
+                " UNION ALL ".join(
+                    f"SELECT '{to_view}' AS name, EXISTS (SELECT 1 FROM {to_view}) AS has_rows"
+                    for to_view in existing
+                ),
+                awaits_result=True,
+            )
+            has_rows = {row["name"]: row["has_rows"] for row in probes or []}
+
+        report = {}
+        for to_view, entry in datamarts.items():
+            report[to_view] = {
+                "stage": entry["stage"],
+                "from_view": entry["from_view"],
+                "kind": kinds.get(to_view),
+                "has_rows": has_rows.get(to_view, False),
+                "view": entry["view"] if entry["view"] in kinds else None,
+            }
+        return report
+
+    @staticmethod
+    def verify_staging_results(
+        configs: list[StageConfiguration],
+        controller: Any,
+        report: Optional[dict[str, dict[str, Any]]] = None,
+    ) -> list[str]:
+        logger.info("Verifying staging results")
+        if report is None:
+            report = TransformationManager.verify_datamarts(configs, controller)
+
+        ret = []
+        for to_view, entry in report.items():
+            if entry["kind"] is None or not entry["has_rows"]:
+                logger.error(
+                    f"Inconsistency found for {to_view}: Missing or empty in warehouse."
+                )
+                ret.append(to_view)
 
         logger.info("Verification of staging results completed.")
         return ret
 
+    @staticmethod
+    def run_stages(
+        configs: list[StageConfiguration],
+        dependencies: dict[str, set[str]],
+        run_stage: Callable[[StageConfiguration], dict[str, Any]],
+        max_workers: int,
+    ) -> dict[str, dict[str, Any]]:
+        # Runs every stage as soon as all the stages it depends on are done,
+        # so independent stages share the workers and the whole run only
+        # lasts as long as its critical path.
+        configs_by_name = {config.name: config for config in configs}
+        waiting_for = {
+            config.name: dependencies.get(config.name, set()) & configs_by_name.keys()
+            for config in configs
+        }
+        timings: dict[str, dict[str, Any]] = {}
+        origin = time.perf_counter()
+
+        def timed_stage(config: StageConfiguration) -> dict[str, Any]:
+            start = time.perf_counter() - origin
+            timing = run_stage(config)
+            end = time.perf_counter() - origin
+            return {"start": start, "end": end, "duration": end - start, **timing}
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="staging"
+        ) as executor:
+            running: dict[Future, str] = {}
+
+            def submit_ready_stages() -> None:
+                for name in [name for name, deps in waiting_for.items() if not deps]:
+                    del waiting_for[name]
+                    logger.info(f"Starting stage {name}")
+                    future = executor.submit(timed_stage, configs_by_name[name])
+                    running[future] = name
+
+            submit_ready_stages()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        timings[name] = future.result()
+                    except Exception as e:
+                        logger.error(f"Stage {name} failed: {str(e)}")
+                        # Stages already running are waited for on exit,
+                        # the ones depending on them are never started.
+                        waiting_for.clear()
+                        raise
+                    logger.info(
+                        f"Stage {name} finished in {timings[name]['duration']:.3f}s"
+                    )
+                    for deps in waiting_for.values():
+                        deps.discard(name)
+                submit_ready_stages()
+
+        if waiting_for:
+            logger.error(f"Stages waiting on each other: {list(waiting_for)}")
+            raise StageConfigurationCycle()
+
+        return timings
+
     @staticmethod
     def copy_staging_result_to_warehouse(
         controller: Any, config: StageConfiguration
-    ) -> None:
+    ) -> dict[str, dict[str, int]]:
         logger.info(f"Copying staging result to warehouse for config: {config}")
 
-        association_from_view_to_view = {}
-
-        for expression in config.datamarts:
-            from_view, to_view = StageConfiguration.get_from_view_and_to_view(
-                expression
-            )
-            association_from_view_to_view[from_view] = to_view
+        association_from_view_to_view = dict(
+            StageConfiguration.get_from_view_and_to_view(expression)
+            for expression in config.datamarts
+        )
+
+        # Tables are filled first, possibly several at once, constraints
+        # between them and their views only once all of them are loaded.
+        transfer_workers = max(
+            1, min(controller.transfer_workers, len(association_from_view_to_view))
+        )
+        transfer = partial(TransformationManager.transfer_datamart, controller)
+        if transfer_workers > 1:
+            with ThreadPoolExecutor(
+                max_workers=transfer_workers, thread_name_prefix="transfer"
+            ) as executor:
+                transfers = list(
+                    executor.map(
+                        transfer,
+                        association_from_view_to_view.keys(),
+                        association_from_view_to_view.values(),
+                    )
+                )
+        else:
+            transfers = [
+                transfer(from_view, to_view)
+                for from_view, to_view in association_from_view_to_view.items()
+            ]
+
+        for (from_view, to_view), (created, column_info, _) in zip(
+            association_from_view_to_view.items(), transfers
+        ):
+            if not created:
+                continue
+
+            foreign_key_statements = []
+            for col in column_info:
+                if col["is_foreign_key"]:
+                    foreign_key_statements.append(
+                        f"""
+                        ALTER TABLE {to_view} ADD CONSTRAINT fk_{col['column_name']}
+                        FOREIGN KEY ({col['column_name']})
+                        REFERENCES {association_from_view_to_view[col['foreign_table_name']]}({col['foreign_column_name']});
+                        """
+                    )
+            if foreign_key_statements:
+                logger.info(f"Adding foreign keys to {to_view}")
+                controller.dbc_warehouse.execute_query(
+                    query="".join(foreign_key_statements).strip()
+                )
 
+        for from_view, to_view in association_from_view_to_view.items():
             new_schema = SchemaManager.get_table_schema(controller.dbc_raw, from_view)
-
-            target_exists = controller.table_or_view_exists(to_view, "warehouse")
-
             column_info = SchemaManager.get_column_info(controller.dbc_raw, from_view)
             primary_key_column = next(
                 (col for col in column_info if col["is_primary_key"]), None
@@ -63,201 +235,262 @@ class TransformationManager:
             else:
                 primary_key_name = "id"
 
-            t1_typed = ", ".join(
-                [f"{col_name} {new_schema[col_name]}" for col_name in new_schema.keys()]
-            )
-
-            t1 = ", ".join([f"{col_name}" for col_name in new_schema.keys()])
-
-            if not target_exists:
-                query = f"""
-                    CREATE EXTENSION IF NOT EXISTS dblink;
-
-                    CREATE TABLE {to_view} AS
-                    SELECT *
-                    FROM dblink('dbname={controller.dbc_raw.database}
-                                user={controller.dbc_raw.user}
-                                password={controller.dbc_raw.password}',
-                                    'SELECT {t1} FROM {from_view}')
-                                AS t1({t1_typed});
-                """
+            if controller.transaction_strategy == TransactionStrategy.PER_TABLE:
+                controller.create_transaction_table(to_view)
 
-                if primary_key_column:
-                    query += f"""
-                    ALTER TABLE {to_view} ALTER COLUMN {primary_key_name} SET NOT NULL;
-                    ALTER TABLE {to_view} ADD PRIMARY KEY ({primary_key_name});
-                    """
-                else:
-                    query += f"ALTER TABLE {to_view} ADD COLUMN id SERIAL PRIMARY KEY;"
-
-                foreign_key_statements = []
-                for col in column_info:
-                    if col["is_foreign_key"]:
-                        foreign_key_statements.append(
-                            f"""
-                            ALTER TABLE {to_view} ADD CONSTRAINT fk_{col['column_name']}
-                            FOREIGN KEY ({col['column_name']})
-                            REFERENCES {association_from_view_to_view[col['foreign_table_name']]}({col['foreign_column_name']});
-                            """
-                        )
-                query += "".join(foreign_key_statements)
-
-                logger.info(f"Creating new table: {to_view}")
-                controller.dbc_warehouse.execute_query(query=query.strip())
-            else:
-                existing_schema = SchemaManager.get_table_schema(
-                    controller.dbc_warehouse, to_view
-                )
+            transaction_table = controller.get_transaction_table_name(to_view)
 
-                protected_columns = WarehouseCore.get_protected_columns(to_view)
-                columns_to_add = {}
-                for col_name, col_type in new_schema.items():
-                    if (
-                        col_name not in existing_schema
-                        and col_name not in protected_columns
-                    ):
-                        columns_to_add[col_name] = col_type
-
-                for col_name, col_type in columns_to_add.items():
-                    alter_sql = (
-                        f"ALTER TABLE {to_view} ADD COLUMN {col_name} {col_type};"
-                    )
-                    logger.info(f"Adding column {col_name} to {to_view}")
-                    controller.dbc_warehouse.execute_query(alter_sql)
-                    existing_schema[col_name] = col_type
+            associated_view_name = controller.create_associated_view_name(to_view)
+            OverlayManager.create_overlay(
+                controller, to_view, primary_key_name, new_schema, transaction_table
+            )
+            controller.vt_association[f"{associated_view_name}"] = to_view
 
-                if columns_to_add:
-                    logger.info(
-                        f"Extended schema for {to_view} with {len(columns_to_add)} new columns"
-                    )
+        logger.info("Finished copying staging result to warehouse")
+        return {
+            to_view: merge
+            for to_view, (_, _, merge) in zip(
+                association_from_view_to_view.values(), transfers
+            )
+        }
 
-                temp_table = f"temp_{to_view}"
-                temp_query = f"""
-                    CREATE EXTENSION IF NOT EXISTS dblink;
+    @staticmethod
+    def transfer_datamart(
+        controller: Any, from_view: str, to_view: str
+    ) -> tuple[bool, list[dict[str, Any]], dict[str, int]]:
+        # Copies `from_view` from raw into `to_view` in the warehouse, creating
+        # it or merging into it. Returns whether the table was created, the
+        # columns of `from_view` and the number of rows written.
+        new_schema = SchemaManager.get_table_schema(controller.dbc_raw, from_view)
+
+        target_exists = controller.table_or_view_exists(to_view, "warehouse")
+
+        column_info = SchemaManager.get_column_info(controller.dbc_raw, from_view)
+        primary_key_column = next(
+            (col for col in column_info if col["is_primary_key"]), None
+        )
+
+        if primary_key_column:
+            primary_key_name = primary_key_column["column_name"]
+        else:
+            primary_key_name = "id"
+
+        t1_typed = ", ".join(
+            [f"{col_name} {new_schema[col_name]}" for col_name in new_schema.keys()]
+        )
+
+        columns = list(new_schema.keys())
+        select_query = f"SELECT {', '.join(columns)} FROM {from_view}"
+        binary = controller.transfer_format == "binary"
+
+        if not target_exists:
+            logger.info(f"Creating new table: {to_view}")
+            controller.dbc_warehouse.execute_query(
+                query=f"CREATE TABLE {to_view} ({t1_typed});"
+            )
 
-                    DROP TABLE IF EXISTS {temp_table} CASCADE;
+            nb_rows = controller.dbc_raw.transfer_to(
+                controller.dbc_warehouse,
+                select_query,
+                to_view,
+                columns,
+                binary=binary,
+                buffer_size=controller.transfer_buffer_size,
+            )
+            logger.info(f"Transferred {nb_rows} rows into {to_view}")
 
-                    CREATE TEMPORARY TABLE {temp_table} AS
-                    SELECT *
-                    FROM dblink('dbname={controller.dbc_raw.database}
-                                user={controller.dbc_raw.user}
-                                password={controller.dbc_raw.password}',
-                                    'SELECT {t1} FROM {from_view}')
-                                AS t1({t1_typed});
+            # The key is only built once the data is in.
+            if primary_key_column:
+                query = f"""
+                ALTER TABLE {to_view} ALTER COLUMN {primary_key_name} SET NOT NULL;
+                ALTER TABLE {to_view} ADD PRIMARY KEY ({primary_key_name});
                 """
-                logger.info(f"Creating temporary table for data: {temp_table}")
-                controller.dbc_warehouse.execute_query(query=temp_query.strip())
-
-                if primary_key_column:
-                    columns_to_update = [
-                        col for col in new_schema.keys() if col != primary_key_name
-                    ]
-
-                    if columns_to_update:
-                        update_statements = ", ".join(
-                            [f"{col} = EXCLUDED.{col}" for col in columns_to_update]
-                        )
-
-                        merge_query = f"""
-                            INSERT INTO {to_view} ({', '.join(new_schema.keys())})
-                            SELECT {', '.join(new_schema.keys())}
-                            FROM {temp_table}
-                            ON CONFLICT ({primary_key_name})
-                            DO UPDATE SET {update_statements};
-                        """
-                        logger.info(f"Merging data into {to_view} with upsert")
-                        controller.dbc_warehouse.execute_query(merge_query)
-                    else:
-                        logger.info(f"No columns to update for {to_view}")
-                else:
-                    insert_query = f"""
-                        INSERT INTO {to_view} ({', '.join(new_schema.keys())})
-                        SELECT {', '.join(new_schema.keys())}
-                        FROM {temp_table};
-                    """
-                    logger.info(f"Inserting data into {to_view}")
-                    controller.dbc_warehouse.execute_query(insert_query)
-
-                controller.dbc_warehouse.execute_query(
-                    f"DROP TABLE IF EXISTS {temp_table};"
-                )
-
-            if controller.transaction_strategy == TransactionStrategy.PER_TABLE:
-                controller.create_transaction_table(to_view)
+            else:
+                query = f"ALTER TABLE {to_view} ADD COLUMN id SERIAL PRIMARY KEY;"
+            controller.dbc_warehouse.execute_query(query=query.strip())
+            return (
+                True,
+                column_info,
+                {
+                    "rows": nb_rows,
+                    "inserted": nb_rows,
+                    "updated": 0,
+                    "unchanged": 0,
+                    "deleted": 0,
+                },
+            )
 
-            transaction_table = controller.get_transaction_table_name(to_view)
+        existing_schema = SchemaManager.get_table_schema(
+            controller.dbc_warehouse, to_view
+        )
+
+        protected_columns = WarehouseCore.get_protected_columns(to_view)
+        columns_to_add = {}
+        for col_name, col_type in new_schema.items():
+            if col_name not in existing_schema and col_name not in protected_columns:
+                columns_to_add[col_name] = col_type
+
+        for col_name, col_type in columns_to_add.items():
+            alter_sql = f"ALTER TABLE {to_view} ADD COLUMN {col_name} {col_type};"
+            logger.info(f"Adding column {col_name} to {to_view}")
+            controller.dbc_warehouse.execute_query(alter_sql)
+            existing_schema[col_name] = col_type
+
+        if columns_to_add:
+            logger.info(
+                f"Extended schema for {to_view} with {len(columns_to_add)} new columns"
+            )
 
-            left_joins = ""
-            coalesces = []
-            for col_name in new_schema.keys():
-                if col_name != primary_key_name:
-                    left_joins += f"""
-                        LEFT JOIN filtered_transactions ft_{col_name} ON r.{primary_key_name}::text = ft_{col_name}.target_id::text
-                            AND ft_{col_name}.target_column = '{col_name}'
-                            AND ft_{col_name}.action != 'delete'
-                        """
+        OverlayManager.detach_base_table(controller, to_view)
 
-                    col_type = ""
-                    if new_schema[col_name].upper() != "TEXT":
-                        col_type = f"::{new_schema[col_name].upper()}"
+        # The temporary table only lives in the session that created it.
+        with controller.dbc_warehouse.session():
+            temp_table = f"temp_{to_view}"
+            temp_query = f"""
+                DROP TABLE IF EXISTS {temp_table} CASCADE;
 
-                    coalesces.append(
-                        f"COALESCE(ft_{col_name}.new_value{col_type}, r.{col_name}) AS {col_name}"
-                    )
+                CREATE TEMPORARY TABLE {temp_table} ({t1_typed});
+            """
+            logger.info(f"Creating temporary table for data: {temp_table}")
+            controller.dbc_warehouse.execute_query(query=temp_query.strip())
+
+            nb_rows = controller.dbc_raw.transfer_to(
+                controller.dbc_warehouse,
+                select_query,
+                temp_table,
+                columns,
+                binary=binary,
+                buffer_size=controller.transfer_buffer_size,
+            )
+            logger.info(f"Transferred {nb_rows} rows into {temp_table}")
+
+            merge = TransformationManager.merge_temp_table(
+                controller,
+                temp_table,
+                to_view,
+                columns,
+                primary_key_name if primary_key_column else None,
+            )
+            merge["rows"] = nb_rows
+            merge["unchanged"] = nb_rows - merge["inserted"] - merge["updated"]
+            logger.info(
+                f"Merged {to_view}: {merge['inserted']} inserted, "
+                f"{merge['updated']} updated, {merge['unchanged']} unchanged, "
+                f"{merge['deleted']} deleted"
+            )
 
-            coalesces_str = ",\n".join(coalesces)
+            controller.dbc_warehouse.execute_query(
+                f"DROP TABLE IF EXISTS {temp_table};"
+            )
 
-            associated_view_name = controller.create_associated_view_name(to_view)
+        return False, column_info, merge
 
-            query = f"""
-                DROP VIEW IF EXISTS {associated_view_name} CASCADE;
-                CREATE VIEW {associated_view_name} AS
-                WITH latest_transactions AS (
-                    SELECT
-                        target_table,
-                        target_column,
-                        target_id,
-                        new_value,
-                        action,
-                        ROW_NUMBER() OVER (PARTITION BY target_table,
-                            target_id,
-                            target_column ORDER BY created_at DESC,
-                            id DESC) AS rn
-                    FROM {transaction_table}
-                    WHERE UPPER(target_table) = UPPER('{to_view}')
-                ),
-                filtered_transactions AS (
-                    SELECT
-                        target_table,
-                        target_column,
-                        target_id,
-                        new_value,
-                        action
-                    FROM latest_transactions
-                    WHERE rn = 1
-                ),
-                modified_table AS (
-                    SELECT
-                        r.{primary_key_name},
-                        {coalesces_str}
-                    FROM
-                        {to_view} r
-                        {left_joins}
-                        WHERE
-                            NOT EXISTS (
-                                SELECT 1 FROM filtered_transactions ft_delete
-                                WHERE r.{primary_key_name}::text = ft_delete.target_id::text
-                                        AND ft_delete.action = 'delete'
-                            )
+    @staticmethod
+    def merge_temp_table(
+        controller: Any,
+        temp_table: str,
+        to_view: str,
+        columns: list[str],
+        primary_key_name: Optional[str],
+    ) -> dict[str, int]:
+        # Only writes the rows of `temp_table` that are new or differ from
+        # `to_view`, so refreshing unchanged data creates no dead tuples.
+        # Rows missing from `temp_table` are deleted with
+        # `merge-delete-missing`.
+        columns_list = ", ".join(columns)
+        statements: list[tuple[str, Optional[list[Any]], bool]] = [
+            # Temporary tables are never analyzed by autovacuum.
+            (f"ANALYZE {temp_table};", None, False)
+        ]
+
+        if primary_key_name:
+            columns_to_update = [col for col in columns if col != primary_key_name]
+            if columns_to_update:
+                update_statements = ", ".join(
+                    f"{col} = EXCLUDED.{col}" for col in columns_to_update
+                )
+                current_row = ", ".join(f"{to_view}.{col}" for col in columns_to_update)
+                new_row = ", ".join(f"EXCLUDED.{col}" for col in columns_to_update)
+                conflict = f"""
+                    DO UPDATE SET {update_statements}
+                    WHERE ROW({current_row}) IS DISTINCT FROM ROW({new_row})
+                """
+            else:
+                conflict = "DO NOTHING"
+
+            # Rows inserted by the statement have no `xmax`, updated ones are
+            # locked by it.
+            merge_query = f"""
+                WITH merged AS (
+                    INSERT INTO {to_view} ({columns_list})
+                    SELECT {columns_list} FROM {temp_table}
+                    ON CONFLICT ({primary_key_name}) {conflict}
+                    RETURNING (xmax = 0) AS inserted
+                )
+                SELECT
+                    count(*) FILTER (WHERE inserted) AS inserted,
+                    count(*) FILTER (WHERE NOT inserted) AS updated
+                FROM merged;
+            """
+            delete_query = f"""
+                DELETE FROM {to_view} t
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {temp_table} s
+                    WHERE s.{primary_key_name} = t.{primary_key_name}
+                )
+            """
+        else:
+            # Without a key a row is only identified by its values, and
+            # identical rows are kept as many times as the datamart has them.
+            merge_query = f"""
+                WITH merged AS (
+                    INSERT INTO {to_view} ({columns_list})
+                    SELECT {columns_list} FROM {temp_table}
+                    EXCEPT ALL
+                    SELECT {columns_list} FROM {to_view}
+                    RETURNING 1
+                )
+                SELECT count(*) AS inserted, 0 AS updated FROM merged;
+            """
+            delete_query = f"""
+                DELETE FROM {to_view}
+                WHERE ctid IN (
+                    SELECT current.ctid
+                    FROM (
+                        SELECT
+                            ctid,
+                            ROW({columns_list})::text AS row_key,
+                            ROW_NUMBER() OVER (PARTITION BY ROW({columns_list})::text) AS n
+                        FROM {to_view}
+                    ) AS current
+                    LEFT JOIN (
+                        SELECT ROW({columns_list})::text AS row_key, count(*) AS copies
+                        FROM {temp_table}
+                        GROUP BY 1
+                    ) AS new USING (row_key)
+                    WHERE current.n > COALESCE(new.copies, 0)
                 )
-
-                SELECT * FROM modified_table;
             """
-            logger.info(f"Executing query to create view: {associated_view_name}")
-            controller.dbc_warehouse.execute_query(query=query)
-            controller.vt_association[f"{associated_view_name}"] = to_view
 
-        logger.info("Finished copying staging result to warehouse")
+        logger.info(f"Merging changed rows of {temp_table} into {to_view}")
+        statements.append((merge_query, None, True))
+        if controller.merge_delete_missing:
+            statements.append(
+                (
+                    f"""
+                    WITH deleted AS ({delete_query} RETURNING 1)
+                    SELECT count(*) AS deleted FROM deleted;
+                    """,
+                    None,
+                    True,
+                )
+            )
+
+        # In one transaction, so readers never see a half merged table.
+        results = controller.dbc_warehouse.execute_batch(statements)
+        merge = dict(results[1][0])
+        merge["deleted"] = results[2][0]["deleted"] if len(results) > 2 else 0
+        return merge
 
     @staticmethod
     def initialize_warehouse_core(controller: Any) -> None:
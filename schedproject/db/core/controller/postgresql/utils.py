@@ -9,6 +9,11 @@ class OverwriteStrategy(Enum):
     PRESERVE = "preserve"
 
 
+class OverlayStrategy(Enum):
+    VIEW = "view"
+    MATERIALIZED = "materialized"
+
+
 class UtilsPotsgreSQLController:
     @staticmethod
     def transaction_table_query(
@@ -2,3 +2,4 @@ from .staging import StageConfiguration as StageConfiguration
 from .staging import StageConfigurationCycle as StageConfigurationCycle
 from .warehouse_core import WarehouseCore as WarehouseCore
 from .warehouse_core import CoreTableConfiguration as CoreTableConfiguration
+from .planning import StagingPlanner as StagingPlanner
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyCycle(Exception):
+    pass
+
+
+class StagingPlanner:
+    DEFAULT_PLAN_CACHE_FOLDER = "./databridging/_cache"
+    PLAN_CACHE_FILE = "plans.json"
+    CLINGO_PROGRAM = "./resources/staging_order.lp"
+    MAX_PLANS_PER_KIND = 8
+
+    plan_cache_folder = DEFAULT_PLAN_CACHE_FOLDER
+    validate_with_clingo = False
+
+    _plans: Optional[dict[str, dict[str, list[str]]]] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def topological_order(dependencies: dict[str, set[str]]) -> list[str]:
+        # Kahn's algorithm, linear in the number of tasks and dependencies.
+        # Tasks without pending dependencies keep their input order.
+        pending = {
+            name: len(deps & dependencies.keys()) for name, deps in dependencies.items()
+        }
+        dependents: dict[str, list[str]] = {name: [] for name in dependencies}
+        for name, deps in dependencies.items():
+            for dependency in deps & dependencies.keys():
+                dependents[dependency].append(name)
+
+        order = [name for name, count in pending.items() if count == 0]
+        for name in order:
+            for dependent in dependents[name]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    order.append(dependent)
+
+        if len(order) != len(dependencies):
+            cycle = sorted(set(dependencies) - set(order))
+            logger.error(f"Found dependency cycle between {cycle}")
+            raise DependencyCycle(cycle)
+
+        return order
+
+    @staticmethod
+    def plan_key(*parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, default=sorted)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def plan(kind: str, key: str, dependencies: dict[str, set[str]]) -> list[str]:
+        # Plans are keyed by the hash of everything they were computed from,
+        # only the latest few of each kind are kept.
+        with StagingPlanner._lock:
+            plans = StagingPlanner._load_plans().setdefault(kind, {})
+            if key in plans:
+                logger.info(f"Reusing cached {kind} plan {key[:12]}")
+                return list(plans[key])
+
+        order = StagingPlanner.topological_order(dependencies)
+        if StagingPlanner.validate_with_clingo:
+            StagingPlanner.validate_order(order, dependencies)
+
+        with StagingPlanner._lock:
+            plans[key] = list(order)
+            while len(plans) > StagingPlanner.MAX_PLANS_PER_KIND:
+                del plans[next(iter(plans))]
+            StagingPlanner._save_plans(StagingPlanner._load_plans())
+        return order
+
+    @staticmethod
+    def validate_order(order: list[str], dependencies: dict[str, set[str]]) -> None:
+        try:
+            import clingo
+        except ImportError:
+            logger.warning("clingo is not installed, skipping plan validation")
+            return
+
+        program = ""
+        for name, deps in dependencies.items():
+            program += f'task("{name}"). task_p("{name}", "{name}").\n'
+            for dependency in deps & dependencies.keys():
+                program += f'task_r("{name}", "{dependency}").\n'
+        for position, name in enumerate(order, start=1):
+            program += f'order("{name}", {position}).\n'
+
+        ctl = clingo.Control(arguments=["1"])
+        ctl.load(StagingPlanner.CLINGO_PROGRAM)
+        ctl.add("base", [], program)
+        ctl.ground([("base", [])])
+        if not ctl.solve().satisfiable:
+            logger.error(f"clingo rejected the computed order {order}")
+            raise DependencyCycle(order)
+        logger.info("clingo validated the computed order")
+
+    @staticmethod
+    def _load_plans() -> dict[str, dict[str, list[str]]]:
+        if StagingPlanner._plans is None:
+            path = os.path.join(
+                StagingPlanner.plan_cache_folder, StagingPlanner.PLAN_CACHE_FILE
+            )
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    StagingPlanner._plans = json.load(f)
+            except FileNotFoundError:
+                StagingPlanner._plans = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable plan cache {path}: {str(e)}")
+                StagingPlanner._plans = {}
+        return StagingPlanner._plans
+
+    @staticmethod
+    def _save_plans(plans: dict[str, dict[str, list[str]]]) -> None:
+        path = os.path.join(
+            StagingPlanner.plan_cache_folder, StagingPlanner.PLAN_CACHE_FILE
+        )
+        try:
+            os.makedirs(StagingPlanner.plan_cache_folder, exist_ok=True)
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(plans, f, indent=2)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.warning(f"Could not persist plan cache {path}: {str(e)}")
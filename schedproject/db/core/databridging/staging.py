@@ -1,9 +1,10 @@
 import logging
 import os
 from typing import Optional
-import clingo
 import toml
 
+from .planning import DependencyCycle, StagingPlanner
+
 
 class DuplicateStageConfiguration(Exception):
     pass
@@ -27,12 +28,16 @@ class StageConfiguration:
         staging_files: list[str],
         datamarts: list[str],
         workdir: str = DEFAULT_STAGING_PATH,
+        materialize: bool = False,
+        keys: Optional[dict[str, list[list[str]]]] = None,
     ) -> None:
         self.name = name
         self.datasources = datasources
         self.datamarts = datamarts
         self.staging_files = staging_files
         self.workdir = workdir
+        self.materialize = materialize
+        self.keys = keys or {}
 
     def __str__(self) -> str:
         return (
@@ -40,7 +45,9 @@ class StageConfiguration:
             f"datasources={self.datasources}, "
             f"staging_files={self.staging_files}, "
             f"datamarts={self.datamarts}, "
-            f"workdir='{self.workdir}')"
+            f"workdir='{self.workdir}', "
+            f"materialize={self.materialize}, "
+            f"keys={self.keys})"
         )
 
     def __repr__(self) -> str:
@@ -56,6 +63,16 @@ class StageConfiguration:
             datasources=config["IO"].get("datasources", []),
             staging_files=config["STAGING"]["files"],
             datamarts=config["IO"].get("datamarts", []),
+            materialize=config["STAGING"].get("materialize", False),
+            # Indexes of the materialized views by view name, a single column
+            # can be given as a plain string.
+            keys={
+                view_name: [
+                    [columns] if isinstance(columns, str) else list(columns)
+                    for columns in view_keys
+                ]
+                for view_name, view_keys in config["STAGING"].get("keys", {}).items()
+            },
         )
 
     @staticmethod
@@ -111,65 +128,53 @@ class StageConfiguration:
             logger.info("No configurations to process")
             return []
 
-        dict_config: dict[str, "StageConfiguration"] = {}
-        for config in configs:
-            if config.name in dict_config:
-                logger.warning(f"Found duplicate config with name {config.name}")
-                raise DuplicateStageConfiguration
-            dict_config[config.name] = config
-            print(config, flush=True)
-
-        class ModelHolder:
-            def __init__(self) -> None:
-                self.models: list[list[clingo.Symbol]] = []
-
-            def __call__(self, model: clingo.Model):
-                ret = []
-                symbols = model.symbols(shown=True)
-                for symbol in symbols:
-                    ret.append(symbol)
-                self.models.append(ret)
+        dependencies = StageConfiguration.compute_staging_dependencies(configs)
+        key = StagingPlanner.plan_key(
+            sorted(config.dumps() for config in configs), sorted(base_dependencies)
+        )
+        try:
+            order = StagingPlanner.plan("staging", key, dependencies)
+        except DependencyCycle as e:
+            raise StageConfigurationCycle(*e.args) from e
 
-        ctl = clingo.Control(arguments=["1"])
-        ctl.load("./resources/staging_order.lp")
+        dict_config = {config.name: config for config in configs}
+        ordered_configs = [dict_config[config_name] for config_name in order]
 
-        main_program = ""
-        for base_dependency in base_dependencies:
-            main_program += f'task_p("{base_dependency}", "{base_dependency}"). order("{base_dependency}", 0).\n'
+        logger.info("Staging order computation completed")
+        logger.info(StageConfiguration.visualize_staging_order(ordered_configs))
+        return ordered_configs
 
+    @staticmethod
+    def compute_staging_dependencies(
+        configs: list["StageConfiguration"],
+    ) -> dict[str, set[str]]:
+        # A stage depends on every other stage producing one of its
+        # datasources, whether it is named by its raw or warehouse name.
+        producers: dict[str, set[str]] = {}
+        names = set()
         for config in configs:
-            program = f'task("{config.name}").\n'
-            for datasource in config.datasources:
-                program += f'task_r("{config.name}", "{datasource}").\n'
-            for datamart in config.datamarts:
-                program += f'task_p("{config.name}", "{datamart}").\n'
-
-            main_program += program
-
-        ctl.add("base", [], main_program)
-        ctl.ground([("base", [])])
-        mh = ModelHolder()
-
-        def on_unsat(*kwargs):
-            raise StageConfigurationCycle()
+            if config.name in names:
+                logger.warning(f"Found duplicate config with name {config.name}")
+                raise DuplicateStageConfiguration
+            names.add(config.name)
 
-        ctl.solve(on_unsat=on_unsat, on_model=mh)
+            for expression in config.datamarts:
+                from_view, to_view = StageConfiguration.get_from_view_and_to_view(
+                    expression
+                )
+                for produced in (expression, from_view, to_view):
+                    producers.setdefault(produced, set()).add(config.name)
 
-        print(mh.models, flush=True)
-        pre_order = {
-            symbol.arguments[0].string: symbol.arguments[1].number
-            for symbol in mh.models[-1]
+        return {
+            config.name: {
+                producer
+                for datasource in config.datasources
+                for producer in producers.get(datasource, set())
+                if producer != config.name
+            }
+            for config in configs
         }
 
-        ordered_configs = [
-            dict_config[config_name]
-            for config_name in sorted(pre_order, key=lambda x: pre_order[x])
-        ]
-
-        logger.info("Staging order computation completed")
-        logger.info(StageConfiguration.visualize_staging_order(ordered_configs))
-        return ordered_configs
-
     @staticmethod
     def get_all_configs_in_folder(
         staging_path: Optional[str] = None,
@@ -220,7 +225,7 @@ class StageConfiguration:
         return from_view, to_view
 
     def to_json(self) -> dict:
-        return {
+        config = {
             "MAIN": {
                 "name": self.name,
                 "workdir": self.workdir,
@@ -231,6 +236,12 @@ class StageConfiguration:
             },
             "STAGING": {"files": self.staging_files},
         }
+        # Only written when set, so existing configurations keep their hash.
+        if self.materialize:
+            config["STAGING"]["materialize"] = self.materialize
+        if self.keys:
+            config["STAGING"]["keys"] = self.keys
+        return config
 
     def dumps(self):
         return toml.dumps(self.to_json())
@@ -1,9 +1,10 @@
 import os
 import toml
 import logging
-import clingo
 from typing import Dict, List, Optional, Any
 
+from .planning import DependencyCycle, StagingPlanner
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,18 +29,20 @@ class CoreTableConfiguration:
         description: str = "",
         protected_columns: Optional[list[str]] = None,
         depends_on: Optional[List[str]] = None,
+        indexes: Optional[List[List[str]]] = None,
     ):
         self.name = name
         self.sql_file = sql_file
         self.description = description
         self.protected_columns = protected_columns or []
         self.depends_on = depends_on or []
+        self.indexes = indexes or []
 
     def __str__(self) -> str:
         return (
             f"CoreTableConfiguration(name='{self.name}', sql_file='{self.sql_file}', "
             f"description='{self.description}', protected_columns={self.protected_columns}, "
-            f"depends_on={self.depends_on})"
+            f"depends_on={self.depends_on}, indexes={self.indexes})"
         )
 
     @staticmethod
@@ -52,6 +55,11 @@ class CoreTableConfiguration:
             description=config.get("description", ""),
             protected_columns=config.get("protected_columns", []),
             depends_on=config.get("depends_on", []),
+            # A single column can be given as a plain string.
+            indexes=[
+                [columns] if isinstance(columns, str) else list(columns)
+                for columns in config.get("indexes", [])
+            ],
         )
 
 
@@ -113,61 +121,32 @@ class WarehouseCore:
             logger.info("No core tables to process")
             return []
 
-        class ModelHolder:
-            def __init__(self) -> None:
-                self.models: list[list[clingo.Symbol]] = []
-
-            def __call__(self, model: clingo.Model):
-                ret = []
-                symbols = model.symbols(shown=True)
-                for symbol in symbols:
-                    ret.append(symbol)
-                self.models.append(ret)
-
-        ctl = clingo.Control(arguments=["1"])
-
-        ctl.load("./resources/staging_order.lp")
-
-        main_program = ""
-
-        for table_name in tables.keys():
-            main_program += f'task("{table_name}").\n'
-
+        dependencies = {}
         for table_name, config in tables.items():
-            main_program += f'task_p("{table_name}", "{table_name}").\n'
-
+            dependencies[table_name] = set()
             for dependency in config.depends_on:
                 if dependency in tables:
-                    main_program += f'task_r("{table_name}", "{dependency}").\n'
+                    dependencies[table_name].add(dependency)
                 else:
                     logger.warning(
                         f"Table {table_name} depends on {dependency} which is not defined"
                     )
 
-        ctl.add("core_tables", [], main_program)
-        ctl.ground([("base", []), ("core_tables", [])])
-
-        mh = ModelHolder()
-
-        def on_unsat(*kwargs):
+        key = StagingPlanner.plan_key(
+            {
+                table_name: [config.sql_file, config.depends_on]
+                for table_name, config in tables.items()
+            }
+        )
+        try:
+            order = StagingPlanner.plan("core_tables", key, dependencies)
+        except DependencyCycle as e:
             logger.error("Cyclic dependency detected in core tables")
-            raise CoreTableCyclicDependency("Cyclic dependency detected in core tables")
-
-        ctl.solve(on_unsat=on_unsat, on_model=mh)
-
-        if not mh.models:
-            logger.error("No valid ordering found for core tables")
-            return []
-
-        pre_order = {
-            symbol.arguments[0].string: symbol.arguments[1].number
-            for symbol in mh.models[-1]
-        }
+            raise CoreTableCyclicDependency(
+                "Cyclic dependency detected in core tables"
+            ) from e
 
-        ordered_tables = [
-            tables[table_name]
-            for table_name in sorted(pre_order, key=lambda x: pre_order[x])
-        ]
+        ordered_tables = [tables[table_name] for table_name in order]
 
         logger.info(f"Computed order for {len(ordered_tables)} core tables")
         return ordered_tables
@@ -1,14 +1,23 @@
 import logging
-import psycopg
+import threading
 import time
+import psycopg
 
 from abc import ABC, abstractmethod
-from typing import Any
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from itertools import batched
+from typing import Any, AsyncIterator, Callable, Iterable, Iterator, Sequence
 
 from psycopg import OperationalError
+from psycopg.copy import LibpqWriter
 from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
 
-from .utils import analyze_json
+from .prepared_statements import PreparedStatementCache
+from .slow_query_log import SlowQueryLog
+from .statement_sampling import StatementSampler
+from .type_inference import analyze_records, cast_records
+from .utils import is_ddl_statement, is_read_statement
 
 logger = logging.getLogger(__name__)
 
@@ -31,12 +40,28 @@ class DBConnector(ABC):
     def table_exists(self, table_name: str) -> bool:
         pass
 
+    @abstractmethod
+    def mark_schema_changed(self) -> None:
+        pass
+
     @staticmethod
     def _analyse_json(json_data: Any):
-        return analyze_json(json_data, text_only=True)
+        return analyze_records(json_data, text_only=True)
+
+    @staticmethod
+    def _cast_json(json_records: Iterable[Any], data_types: dict[str, str]):
+        return cast_records(json_records, data_types, text_only=True)
 
 
 class PostgresqlDBConnector(DBConnector):
+    DEFAULT_POOL_MIN_SIZE = 1
+    DEFAULT_POOL_MAX_SIZE = 10
+    DEFAULT_POOL_TIMEOUT = 30.0
+    DEFAULT_FETCH_SIZE = 1000
+    DEFAULT_COPY_CHUNK_SIZE = 10000
+    DEFAULT_TRANSFER_BUFFER_SIZE = 1024 * 1024
+    DEFAULT_PREPARED_STATEMENTS_CACHE_SIZE = 256
+
     def __init__(
         self,
         user: str,
@@ -44,6 +69,10 @@ class PostgresqlDBConnector(DBConnector):
         host: str,
         port: str,
         database: str = "postgres",
+        pool_min_size: int = DEFAULT_POOL_MIN_SIZE,
+        pool_max_size: int = DEFAULT_POOL_MAX_SIZE,
+        pool_timeout: float = DEFAULT_POOL_TIMEOUT,
+        prepared_statements_cache_size: int = DEFAULT_PREPARED_STATEMENTS_CACHE_SIZE,
     ):
         super()
         self.user = user
@@ -51,6 +80,30 @@ class PostgresqlDBConnector(DBConnector):
         self.host = host
         self.port = port
         self.database = database
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = max(pool_min_size, pool_max_size)
+        self.pool_timeout = pool_timeout
+        self.prepared_statements = (
+            PreparedStatementCache(prepared_statements_cache_size)
+            if prepared_statements_cache_size > 0
+            else None
+        )
+
+        # Set by the controller to time a sample of `execute_query` calls.
+        self.statement_sampler: StatementSampler | None = None
+        # Set by the controller to keep the slowest `execute_query` calls.
+        self.slow_query_log: SlowQueryLog | None = None
+
+        # Bumped after every DDL statement, so that catalog lookups cached
+        # by `SchemaManager` can tell they are outdated.
+        self.schema_version = 0
+
+        # Called with the text of every statement that may have written data,
+        # once it is committed.
+        self.write_listeners: list[Callable[[str], None]] = []
+
+        # Connection pinned to the current thread by `session()`, if any.
+        self._local = threading.local()
 
         while not self._connect():
             time.sleep(1)
@@ -75,54 +128,371 @@ class PostgresqlDBConnector(DBConnector):
                             """
                         )
 
-            self.connection = psycopg.connect(
-                user=self.user,
-                password=self.password,
-                host=self.host,
-                port=self.port,
-                dbname=self.database,
+            self.pool = ConnectionPool(
+                kwargs={
+                    "user": self.user,
+                    "password": self.password,
+                    "host": self.host,
+                    "port": self.port,
+                    "dbname": self.database,
+                },
+                min_size=self.pool_min_size,
+                max_size=self.pool_max_size,
+                timeout=self.pool_timeout,
+                check=ConnectionPool.check_connection,
+                configure=self._configure_connection,
+                name=f"{self.database}-pool",
+                open=False,
             )
+            try:
+                self.pool.open(wait=True, timeout=self.pool_timeout)
+            except PoolTimeout as e:
+                self.pool.close()
+                raise OperationalError(str(e))
+
             logger.info(
-                f"Connected to database {self.host}:{self.port}/{self.database} as {self.user}"
+                f"Connected to database {self.host}:{self.port}/{self.database} as {self.user} "
+                f"(pool size {self.pool_min_size}-{self.pool_max_size})"
             )
             return True
         except OperationalError as e:
             logger.info(f"The error '{e}' occurred")
             return False
 
+    def _configure_connection(self, conn: psycopg.Connection) -> None:
+        # Statements are only prepared when `PreparedStatementCache` asks for
+        # it; psycopg's own LRU is sized like ours so it deallocates evictions.
+        if self.prepared_statements:
+            conn.prepare_threshold = 2**31 - 1
+            conn.prepared_max = self.prepared_statements.max_size
+
+    def _reset_outdated_prepared_statements(self, conn: psycopg.Connection) -> None:
+        if self.prepared_statements and self.prepared_statements.is_outdated(conn):
+            # psycopg only forgets the statements it prepared on rollback, a
+            # committed DEALLOCATE ALL would leave it using names the server
+            # no longer knows.
+            conn.execute("DEALLOCATE ALL")
+            conn.rollback()
+            self.prepared_statements.mark_up_to_date(conn)
+
+    def _should_prepare(
+        self, query: str, placeholders: list[Any] | None
+    ) -> bool | None:
+        if not self.prepared_statements or not placeholders:
+            return None
+        if is_ddl_statement(query):
+            return False
+        return self.prepared_statements.lookup(query)
+
+    @contextmanager
+    def session(self) -> Iterator[psycopg.Connection]:
+        # Pins one pooled connection to the current thread so that statement
+        # sequences relying on session state (temporary tables) stay together.
+        pinned = getattr(self._local, "connection", None)
+        if pinned is not None:
+            yield pinned
+            return
+
+        with self.pool.connection() as conn:
+            self._reset_outdated_prepared_statements(conn)
+            self._local.connection = conn
+            try:
+                yield conn
+            finally:
+                self._local.connection = None
+
     def execute_query(
         self,
         query: str,
         placeholders: list[Any] | None = None,
         awaits_result: bool = False,
     ) -> list[dict] | None:
-        cursor = self.connection.cursor(row_factory=dict_row)
-        try:
-            if placeholders:
-                cursor.execute(query, placeholders)
-            else:
-                cursor.execute(query)
-
-            if awaits_result:
-                rows = cursor.fetchall()
-                ret = [dict(row) for row in rows]
-            else:
-                ret = None
-            self.connection.commit()
-
-        except Exception as e:
-            self.connection.commit()
+        sampled, started = self._start_timing()
+        with self.session() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            try:
+                if placeholders:
+                    cursor.execute(
+                        query,
+                        placeholders,
+                        prepare=self._should_prepare(query, placeholders),
+                    )
+                else:
+                    cursor.execute(query)
+
+                if awaits_result:
+                    rows = cursor.fetchall()
+                    ret = [dict(row) for row in rows]
+                else:
+                    ret = None
+                conn.commit()
+
+            except Exception as e:
+                conn.rollback()
+                cursor.close()
+                raise e
+
+            rowcount = cursor.rowcount
             cursor.close()
-            raise e
 
-        cursor.close()
+        if started is not None:
+            self._record_timing(query, placeholders, sampled, started, rowcount)
+        if is_ddl_statement(query):
+            self.mark_schema_changed()
+        if not is_read_statement(query):
+            self.notify_write(query)
+        return ret
+
+    def _start_timing(self) -> tuple[bool, float | None]:
+        # Statements are timed when sampled or when slow ones are logged.
+        sampled = (
+            self.statement_sampler is not None
+            and self.statement_sampler.should_sample()
+        )
+        if sampled or self.slow_query_log is not None:
+            return sampled, time.perf_counter()
+        return sampled, None
+
+    def _record_timing(
+        self,
+        query: str,
+        placeholders: list[Any] | None,
+        sampled: bool,
+        started: float,
+        rowcount: int,
+    ) -> None:
+        self._record_duration(
+            query, placeholders, sampled, time.perf_counter() - started, rowcount
+        )
+
+    def _record_duration(
+        self,
+        query: str,
+        placeholders: list[Any] | None,
+        sampled: bool,
+        duration: float,
+        rowcount: int,
+    ) -> None:
+        if sampled:
+            self.statement_sampler.record(query, duration)
+        if self.slow_query_log is not None and self.slow_query_log.is_slow(duration):
+            self.slow_query_log.record(query, placeholders, duration, rowcount)
+
+    def _start_batch_timing(self, pipeline: bool) -> float | None:
+        if pipeline and self.slow_query_log is not None:
+            return time.perf_counter()
+        return None
+
+    def _record_batch_timing(
+        self,
+        statements: list[tuple[str, list[Any] | None, bool]],
+        started: float,
+        rowcount: int,
+    ) -> None:
+        duration = time.perf_counter() - started
+        if self.slow_query_log.is_slow(duration):
+            self.slow_query_log.record_batch(statements, duration, rowcount)
+
+    def explain(self, query: str, placeholders: list[Any] | None = None) -> Any:
+        # Runs outside of `execute_query`, so that plans are neither timed
+        # nor logged, and rolled back whatever the statement did.
+        with self.session() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}",
+                        placeholders or None,
+                    )
+                    return cursor.fetchone()[0]
+            finally:
+                conn.rollback()
+
+    def execute_batch(
+        self,
+        statements: list[tuple[str, list[Any] | None, bool]],
+        pipeline: bool = False,
+    ) -> list[list[dict] | None]:
+        # All statements run in one transaction. In pipeline mode they are
+        # sent without waiting for each other and results are read once the
+        # pipeline is synced, so only the whole batch can be timed.
+        batch_started = self._start_batch_timing(pipeline)
+        with self.session() as conn:
+            cursors = []
+            try:
+                with conn.pipeline() if pipeline else nullcontext():
+                    for query, placeholders, _ in statements:
+                        cursor = conn.cursor(row_factory=dict_row)
+                        cursors.append(cursor)
+                        sampled, started = (
+                            (False, None) if pipeline else self._start_timing()
+                        )
+                        if placeholders:
+                            cursor.execute(
+                                query,
+                                placeholders,
+                                prepare=self._should_prepare(query, placeholders),
+                            )
+                        else:
+                            cursor.execute(query)
+                        if started is not None:
+                            self._record_timing(
+                                query, placeholders, sampled, started, cursor.rowcount
+                            )
+
+                ret = [
+                    [dict(row) for row in cursor.fetchall()] if awaits_result else None
+                    for cursor, (_, _, awaits_result) in zip(cursors, statements)
+                ]
+                conn.commit()
+
+            except Exception as e:
+                conn.rollback()
+                for cursor in cursors:
+                    cursor.close()
+                raise e
+
+            rowcount = sum(max(cursor.rowcount, 0) for cursor in cursors)
+            for cursor in cursors:
+                cursor.close()
+
+        if batch_started is not None:
+            self._record_batch_timing(statements, batch_started, rowcount)
+        if any(is_ddl_statement(query) for query, _, _ in statements):
+            self.mark_schema_changed()
+        for query, _, _ in statements:
+            if not is_read_statement(query):
+                self.notify_write(query)
         return ret
 
+    def copy_records(
+        self,
+        table_name: str,
+        columns: list[str],
+        rows: Iterable[Sequence[Any]],
+        chunk_size: int = DEFAULT_COPY_CHUNK_SIZE,
+    ) -> int:
+        # Rows are sent through `COPY ... FROM STDIN`, one COPY per chunk, all
+        # of them inside a single transaction.
+        copy_statement = f"COPY {table_name} ({', '.join(columns)}) FROM STDIN"
+        nb_rows = 0
+        with self.session() as conn:
+            cursor = conn.cursor()
+            try:
+                for chunk in batched(rows, chunk_size):
+                    with cursor.copy(copy_statement) as copy:
+                        for row in chunk:
+                            copy.write_row(row)
+                    nb_rows += len(chunk)
+                conn.commit()
+
+            except Exception as e:
+                conn.rollback()
+                cursor.close()
+                raise e
+
+            cursor.close()
+
+        self.notify_write(copy_statement)
+        return nb_rows
+
+    def transfer_to(
+        self,
+        target: "PostgresqlDBConnector",
+        query: str,
+        table_name: str,
+        columns: list[str],
+        binary: bool = True,
+        buffer_size: int = DEFAULT_TRANSFER_BUFFER_SIZE,
+    ) -> int:
+        # Pipes `COPY (query) TO STDOUT` into `COPY ... FROM STDIN` on the
+        # target: rows never get decoded and at most `buffer_size` bytes are
+        # held, the synchronous writer blocking until they are sent. The
+        # target session is taken first so that concurrent transfers always
+        # wait on the pools in the same order.
+        copy_format = "BINARY" if binary else "TEXT"
+        copy_out_statement = f"COPY ({query}) TO STDOUT (FORMAT {copy_format})"
+        copy_in_statement = (
+            f"COPY {table_name} ({', '.join(columns)}) FROM STDIN "
+            f"(FORMAT {copy_format})"
+        )
+        with target.session() as target_conn, self.session() as source_conn:
+            source_cursor = source_conn.cursor()
+            target_cursor = target_conn.cursor()
+            try:
+                with source_cursor.copy(copy_out_statement) as copy_out:
+                    with target_cursor.copy(
+                        copy_in_statement, writer=LibpqWriter(target_cursor)
+                    ) as copy_in:
+                        buffer = bytearray()
+                        for data in copy_out:
+                            buffer += data
+                            if len(buffer) >= buffer_size:
+                                copy_in.write(bytes(buffer))
+                                buffer.clear()
+                        if buffer:
+                            copy_in.write(bytes(buffer))
+                nb_rows = target_cursor.rowcount
+                target_conn.commit()
+                source_conn.commit()
+
+            except Exception as e:
+                target_conn.rollback()
+                source_conn.rollback()
+                source_cursor.close()
+                target_cursor.close()
+                raise e
+
+            source_cursor.close()
+            target_cursor.close()
+
+        target.notify_write(copy_in_statement)
+        return nb_rows
+
+    def stream_query(
+        self,
+        query: str,
+        placeholders: list[Any] | None = None,
+        fetch_size: int = DEFAULT_FETCH_SIZE,
+    ) -> Iterator[list[dict]]:
+        # Named cursors are server-side: only `fetch_size` rows are held in
+        # memory at once. The connection is taken straight from the pool since
+        # the generator may be suspended between two batches, time which is
+        # left out of the statement's duration.
+        sampled, started = self._start_timing()
+        elapsed, rowcount = 0.0, 0
+        with self.pool.connection() as conn:
+            with conn.cursor(name="stream_cursor", row_factory=dict_row) as cursor:
+                step = time.perf_counter()
+                cursor.execute(query, placeholders or None)
+                while rows := cursor.fetchmany(fetch_size):
+                    elapsed += time.perf_counter() - step
+                    rowcount += len(rows)
+                    yield [dict(row) for row in rows]
+                    step = time.perf_counter()
+                elapsed += time.perf_counter() - step
+
+        if started is not None:
+            self._record_duration(query, placeholders, sampled, elapsed, rowcount)
+
+    def mark_schema_changed(self) -> None:
+        self.schema_version += 1
+        if self.prepared_statements:
+            self.prepared_statements.invalidate()
+
+    def notify_write(self, query: str) -> None:
+        for listener in self.write_listeners:
+            listener(query)
+
+    def prepared_statements_stats(self) -> dict[str, Any]:
+        if not self.prepared_statements:
+            return {"enabled": False}
+        return {"enabled": True, **self.prepared_statements.stats()}
+
     def close_connection(self):
-        if self.connection:
-            self.connection.close()
+        if self.pool:
+            self.pool.close()
             logger.info(
-                f"Connection to database {self.host}:{self.port}/{self.database} as {self.user} closed"
+                f"Connection pool to database {self.host}:{self.port}/{self.database} as {self.user} closed"
             )
 
     def table_exists(self, table_name: str) -> bool:
@@ -141,3 +511,204 @@ class PostgresqlDBConnector(DBConnector):
         if ret is not None:
             return len(ret) > 0
         return False
+
+
+class AsyncPostgresqlDBConnector:
+    # asyncio twin of a `PostgresqlDBConnector`, used by the ASGI server for
+    # the query routes. DDL run through it is reported to `dbc`, whose
+    # prepared statements cache is shared.
+    def __init__(self, dbc: PostgresqlDBConnector):
+        self.dbc = dbc
+        self.database = dbc.database
+        self.host = dbc.host
+        self.port = dbc.port
+        self.user = dbc.user
+        self.pool_timeout = dbc.pool_timeout
+        self.prepared_statements = dbc.prepared_statements
+
+        self.pool = AsyncConnectionPool(
+            kwargs={
+                "user": dbc.user,
+                "password": dbc.password,
+                "host": dbc.host,
+                "port": dbc.port,
+                "dbname": dbc.database,
+            },
+            min_size=dbc.pool_min_size,
+            max_size=dbc.pool_max_size,
+            timeout=dbc.pool_timeout,
+            check=AsyncConnectionPool.check_connection,
+            configure=self._configure_connection,
+            name=f"{dbc.database}-async-pool",
+            open=False,
+        )
+
+    async def open(self) -> None:
+        await self.pool.open(wait=True, timeout=self.pool_timeout)
+        logger.info(
+            f"Opened async connection pool to database {self.host}:{self.port}/{self.database} as {self.user}"
+        )
+
+    async def _configure_connection(self, conn: psycopg.AsyncConnection) -> None:
+        if self.prepared_statements:
+            conn.prepare_threshold = 2**31 - 1
+            conn.prepared_max = self.prepared_statements.max_size
+
+    def _should_prepare(
+        self, query: str, placeholders: list[Any] | None
+    ) -> bool | None:
+        if not self.prepared_statements or not placeholders:
+            return None
+        if is_ddl_statement(query):
+            return False
+        return self.prepared_statements.lookup(query)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[psycopg.AsyncConnection]:
+        async with self.pool.connection() as conn:
+            if self.prepared_statements and self.prepared_statements.is_outdated(conn):
+                await conn.execute("DEALLOCATE ALL")
+                await conn.rollback()
+                self.prepared_statements.mark_up_to_date(conn)
+            yield conn
+
+    async def execute_query(
+        self,
+        query: str,
+        placeholders: list[Any] | None = None,
+        awaits_result: bool = False,
+    ) -> list[dict] | None:
+        sampled, started = self.dbc._start_timing()
+        async with self.session() as conn:
+            async with conn.cursor(row_factory=dict_row) as cursor:
+                try:
+                    if placeholders:
+                        await cursor.execute(
+                            query,
+                            placeholders,
+                            prepare=self._should_prepare(query, placeholders),
+                        )
+                    else:
+                        await cursor.execute(query)
+
+                    if awaits_result:
+                        ret = [dict(row) for row in await cursor.fetchall()]
+                    else:
+                        ret = None
+                    await conn.commit()
+
+                except Exception as e:
+                    await conn.rollback()
+                    raise e
+
+                rowcount = cursor.rowcount
+
+        if started is not None:
+            self.dbc._record_timing(query, placeholders, sampled, started, rowcount)
+        if is_ddl_statement(query):
+            self.dbc.mark_schema_changed()
+        if not is_read_statement(query):
+            self.dbc.notify_write(query)
+        return ret
+
+    async def execute_batch(
+        self,
+        statements: list[tuple[str, list[Any] | None, bool]],
+        pipeline: bool = False,
+    ) -> list[list[dict] | None]:
+        batch_started = self.dbc._start_batch_timing(pipeline)
+        async with self.session() as conn:
+            cursors = []
+            try:
+                if pipeline:
+                    async with conn.pipeline():
+                        for query, placeholders, _ in statements:
+                            cursors.append(
+                                await self._execute_in_batch(
+                                    conn, query, placeholders, timed=False
+                                )
+                            )
+                else:
+                    for query, placeholders, _ in statements:
+                        cursors.append(
+                            await self._execute_in_batch(conn, query, placeholders)
+                        )
+
+                ret = [
+                    (
+                        [dict(row) for row in await cursor.fetchall()]
+                        if awaits_result
+                        else None
+                    )
+                    for cursor, (_, _, awaits_result) in zip(cursors, statements)
+                ]
+                await conn.commit()
+
+            except Exception as e:
+                await conn.rollback()
+                raise e
+
+            finally:
+                rowcount = sum(max(cursor.rowcount, 0) for cursor in cursors)
+                for cursor in cursors:
+                    await cursor.close()
+
+        if batch_started is not None:
+            self.dbc._record_batch_timing(statements, batch_started, rowcount)
+        if any(is_ddl_statement(query) for query, _, _ in statements):
+            self.dbc.mark_schema_changed()
+        for query, _, _ in statements:
+            if not is_read_statement(query):
+                self.dbc.notify_write(query)
+        return ret
+
+    async def _execute_in_batch(
+        self,
+        conn: psycopg.AsyncConnection,
+        query: str,
+        placeholders: list[Any] | None,
+        timed: bool = True,
+    ) -> psycopg.AsyncCursor:
+        cursor = conn.cursor(row_factory=dict_row)
+        sampled, started = self.dbc._start_timing() if timed else (False, None)
+        if placeholders:
+            await cursor.execute(
+                query, placeholders, prepare=self._should_prepare(query, placeholders)
+            )
+        else:
+            await cursor.execute(query)
+        if started is not None:
+            self.dbc._record_timing(
+                query, placeholders, sampled, started, cursor.rowcount
+            )
+        return cursor
+
+    async def stream_query(
+        self,
+        query: str,
+        placeholders: list[Any] | None = None,
+        fetch_size: int = PostgresqlDBConnector.DEFAULT_FETCH_SIZE,
+    ) -> AsyncIterator[list[dict]]:
+        sampled, started = self.dbc._start_timing()
+        elapsed, rowcount = 0.0, 0
+        async with self.pool.connection() as conn:
+            async with conn.cursor(
+                name="stream_cursor", row_factory=dict_row
+            ) as cursor:
+                step = time.perf_counter()
+                await cursor.execute(query, placeholders or None)
+                while rows := await cursor.fetchmany(fetch_size):
+                    elapsed += time.perf_counter() - step
+                    rowcount += len(rows)
+                    yield [dict(row) for row in rows]
+                    step = time.perf_counter()
+                elapsed += time.perf_counter() - step
+
+        if started is not None:
+            self.dbc._record_duration(query, placeholders, sampled, elapsed, rowcount)
+
+    async def close_connection(self) -> None:
+        await self.pool.close()
+        logger.info(
+            f"Async connection pool to database {self.host}:{self.port}/{self.database} as {self.user} closed"
+        )
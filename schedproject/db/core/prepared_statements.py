@@ -0,0 +1,69 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from psycopg import Connection
+
+from .utils import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class PreparedStatementCache:
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.generation = 0
+
+        self._statements: OrderedDict[str, None] = OrderedDict()
+        self._connection_generations: WeakKeyDictionary[Connection, int] = (
+            WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def lookup(self, query: str) -> bool:
+        # A query shape is prepared from the second time it is seen on.
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._statements:
+                self._statements.move_to_end(key)
+                self.hits += 1
+                return True
+
+            self.misses += 1
+            self._statements[key] = None
+            if len(self._statements) > self.max_size:
+                self._statements.popitem(last=False)
+            return False
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._statements.clear()
+            self.generation += 1
+            self.invalidations += 1
+        logger.debug("Prepared statements invalidated after DDL")
+
+    def is_outdated(self, conn: Connection) -> bool:
+        with self._lock:
+            generation = self._connection_generations.setdefault(conn, self.generation)
+            return generation != self.generation
+
+    def mark_up_to_date(self, conn: Connection) -> None:
+        with self._lock:
+            self._connection_generations[conn] = self.generation
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._statements),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,107 @@
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from .utils import normalize_query
+
+logger = logging.getLogger(__name__)
+
+CacheKey = tuple[str, str, str]
+
+
+class QueryResultCache:
+    def __init__(self, max_size: int, max_rows: int) -> None:
+        self.max_size = max_size
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        # Bumped on every invalidation. A result read while it changed may
+        # already be stale, so `put` drops it.
+        self.generation = 0
+
+        self._entries: OrderedDict[CacheKey, list[dict[str, Any]]] = OrderedDict()
+        self._keys_by_table: dict[tuple[str, str], set[CacheKey]] = {}
+        self._tables_by_key: dict[CacheKey, set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(database: str, query: str, placeholders: list[Any] | None) -> CacheKey:
+        return (
+            database,
+            normalize_query(query),
+            json.dumps(placeholders or [], default=str),
+        )
+
+    def get(self, key: CacheKey) -> list[dict[str, Any]] | None:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return [dict(row) for row in result]
+
+    def put(
+        self,
+        key: CacheKey,
+        result: list[dict[str, Any]],
+        tables: set[str],
+        generation: int,
+    ) -> None:
+        if len(result) > self.max_rows or not tables:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            self._discard(key)
+            self._entries[key] = [dict(row) for row in result]
+            self._tables_by_key[key] = tables
+            for table in tables:
+                self._keys_by_table.setdefault((key[0], table), set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_tables(self, database: str, tables: set[str]) -> None:
+        with self._lock:
+            self.generation += 1
+            for table in tables:
+                for key in self._keys_by_table.pop((database, table), set()):
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def clear(self, database: str) -> None:
+        with self._lock:
+            self.generation += 1
+            for key in [key for key in self._entries if key[0] == database]:
+                self._discard(key)
+                self.invalidations += 1
+
+    def _discard(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+        for table in self._tables_by_key.pop(key, set()):
+            keys = self._keys_by_table.get((key[0], table))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[(key[0], table)]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,130 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+from .utils import is_read_statement, normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQueryLog:
+    # Last `max_entries` statements that ran for at least `threshold_ms`.
+    # With `explain`, the plan of slow read statements is captured by running
+    # them again with `EXPLAIN (ANALYZE, BUFFERS)` in a background thread, so
+    # the caller of the slow statement does not wait for it twice.
+
+    def __init__(
+        self,
+        threshold_ms: float,
+        max_entries: int = 200,
+        explain: Optional[Callable[[str, Optional[list[Any]]], Any]] = None,
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.max_entries = max_entries
+        self.explain = explain
+        self.recorded = 0
+
+        self._entries: deque[dict[str, Any]] = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        self._explainer = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+            if explain is not None
+            else None
+        )
+
+    def is_slow(self, duration: float) -> bool:
+        return duration * 1000 >= self.threshold_ms
+
+    @staticmethod
+    def _loggable(placeholders: Optional[list[Any]]) -> list[Any]:
+        return [
+            (
+                placeholder
+                if placeholder is None
+                or isinstance(placeholder, (str, int, float, bool))
+                else str(placeholder)
+            )
+            for placeholder in placeholders or []
+        ]
+
+    def _append(self, entry: dict[str, Any]) -> None:
+        logger.warning(
+            f"Slow query ({entry['duration_ms']:.1f} ms, {entry['rows']} rows): "
+            f"{entry['query'][:200]}"
+        )
+        with self._lock:
+            self.recorded += 1
+            self._entries.append(entry)
+
+    def record(
+        self,
+        query: str,
+        placeholders: Optional[list[Any]],
+        duration: float,
+        rows: int,
+    ) -> None:
+        entry = {
+            "query": normalize_query(query),
+            "placeholders": self._loggable(placeholders),
+            "duration_ms": duration * 1000,
+            "rows": rows,
+            "at": datetime.now().isoformat(),
+            "plan": None,
+        }
+        self._append(entry)
+
+        if self._explainer is not None and is_read_statement(query):
+            self._explainer.submit(self._explain, entry, query, placeholders)
+
+    def record_batch(
+        self,
+        statements: list[tuple[str, Optional[list[Any]], bool]],
+        duration: float,
+        rows: int,
+    ) -> None:
+        # Pipelined statements cannot be timed one by one, the whole batch is
+        # logged with each of them. Its plan would not tell which one is slow.
+        self._append(
+            {
+                "query": "; ".join(
+                    normalize_query(query) for query, _, _ in statements
+                ),
+                "placeholders": [
+                    self._loggable(placeholders) for _, placeholders, _ in statements
+                ],
+                "statements": len(statements),
+                "duration_ms": duration * 1000,
+                "rows": rows,
+                "at": datetime.now().isoformat(),
+                "plan": None,
+            }
+        )
+
+    def _explain(
+        self, entry: dict[str, Any], query: str, placeholders: Optional[list[Any]]
+    ) -> None:
+        try:
+            entry["plan"] = self.explain(query, placeholders)
+        except Exception as e:
+            logger.warning(f"Could not explain slow query: {str(e)}")
+
+    def entries(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [dict(entry) for entry in reversed(self._entries)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold_ms,
+                "recorded": self.recorded,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "explain": self.explain is not None,
+            }
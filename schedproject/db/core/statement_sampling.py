@@ -0,0 +1,57 @@
+import logging
+import random
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from .utils import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class StatementSampler:
+    # In-process stand-in for `pg_stat_statements`: a fraction of the
+    # statements run through a connector are timed and aggregated by shape.
+
+    def __init__(self, sample_rate: float, max_statements: int = 500) -> None:
+        self.sample_rate = sample_rate
+        self.max_statements = max_statements
+        self.sampled = 0
+
+        self._statements: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def should_sample(self) -> bool:
+        return random.random() < self.sample_rate
+
+    def record(self, query: str, duration: float) -> None:
+        key = normalize_query(query)
+        with self._lock:
+            self.sampled += 1
+            entry = self._statements.get(key)
+            if entry is None:
+                entry = self._statements[key] = [0, 0.0]
+                if len(self._statements) > self.max_statements:
+                    self._statements.popitem(last=False)
+            else:
+                self._statements.move_to_end(key)
+            entry[0] += 1
+            entry[1] += duration
+
+    def statements(self) -> list[dict[str, Any]]:
+        # Same columns as `pg_stat_statements`, times in milliseconds.
+        with self._lock:
+            rows = [
+                {"query": query, "calls": calls, "total_exec_time": total * 1000}
+                for query, (calls, total) in self._statements.items()
+            ]
+        return sorted(rows, key=lambda row: row["total_exec_time"], reverse=True)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "sampled": self.sampled,
+                "statements": len(self._statements),
+                "max_statements": self.max_statements,
+            }
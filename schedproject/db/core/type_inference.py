@@ -0,0 +1,214 @@
+import math
+import re
+from types import NoneType
+from itertools import batched
+from operator import itemgetter
+from typing import Any, Iterable, Iterator, Sequence
+
+from .utils import (
+    InchoherentStructure,
+    cast_value,
+    decide_data_type,
+)
+
+# Column-oriented equivalent of `analyze_json`/`cast_value`. Every column is
+# first checked as a whole with a few compiled regexes run over its joined
+# values; only columns mixing kinds of values are classified cell by cell,
+# and only ambiguous cells reach `cast_value`, which stays the reference.
+
+SEPARATOR = "\x00"
+MAX_EXACT_INTEGER = 2**53
+BOOLEAN_STRINGS = ("TRUE", "FALSE")
+
+INTEGER = r"[+-]?[0-9]{1,15}"
+DECIMAL = (
+    r"[+-]?(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?|[+-]?[0-9]+[eE][+-]?[0-9]+"
+)
+BOOLEAN = r"true|false"
+# Superset of what `int()` and `float()` accept, spaces, underscores and
+# non-ASCII digits included. Strings outside of it and of BOOLEAN are text.
+NUMBER_LIKE = r"\s*[+-]?(?:[\d_]*(?:\.[\d_]*)?(?:e[+-]?[\d_]*)?|inf|infinity|nan)\s*"
+
+INTEGER_PATTERN = re.compile(INTEGER)
+DECIMAL_PATTERN = re.compile(DECIMAL)
+AMBIGUOUS_PATTERN = re.compile(rf"{NUMBER_LIKE}|{BOOLEAN}", re.IGNORECASE)
+
+
+def column_pattern(value: str, flags: int = 0) -> re.Pattern:
+    return re.compile(rf"(?:(?:{value}){SEPARATOR})*(?:{value})", flags)
+
+
+INTEGER_COLUMN_PATTERN = column_pattern(INTEGER)
+DECIMAL_COLUMN_PATTERN = column_pattern(DECIMAL)
+BOOLEAN_COLUMN_PATTERN = column_pattern(BOOLEAN, re.IGNORECASE)
+AMBIGUOUS_COLUMN_PATTERN = re.compile(
+    rf"(?:^|{SEPARATOR})(?:{NUMBER_LIKE}|{BOOLEAN})(?={SEPARATOR}|\Z)", re.IGNORECASE
+)
+
+
+def classify_value(value: Any) -> tuple[str, Any]:
+    kind = type(value)
+    if kind is str:
+        if value.upper() in BOOLEAN_STRINGS:
+            return "BOOLEAN", value.upper() == "TRUE"
+        if INTEGER_PATTERN.fullmatch(value):
+            return "FLOAT", int(value)
+        if DECIMAL_PATTERN.fullmatch(value):
+            return "FLOAT", float(value)
+        if not AMBIGUOUS_PATTERN.fullmatch(value):
+            return "TEXT", value
+    elif value is None:
+        return "NULL", None
+    elif kind is bool:
+        return "BOOLEAN", value
+    elif kind is int and -MAX_EXACT_INTEGER <= value <= MAX_EXACT_INTEGER:
+        return "FLOAT", value
+    elif kind is float and math.isfinite(value):
+        return "FLOAT", int(value) if value.is_integer() else value
+    return cast_value(value)
+
+
+def classify_column(values: Sequence[Any]) -> tuple[set[str], Sequence[Any]]:
+    # Returns the set of types found in the column and its casted values. The
+    # same sequence object is returned when no value had to change.
+    kinds = set(map(type, values))
+    if kinds == {NoneType}:
+        return {"NULL"}, values
+
+    present = values
+    if NoneType in kinds:
+        kinds.discard(NoneType)
+        present = [value for value in values if value is not None]
+
+    classified = _classify_uniform_column(kinds, present)
+    if classified is None:
+        types = set()
+        casted_values = []
+        for value in values:
+            casted_type, casted_value = classify_value(value)
+            types.add(casted_type)
+            casted_values.append(casted_value)
+        return types, casted_values
+
+    types, casted_present = classified
+    if present is values:
+        return types, casted_present
+    types.add("NULL")
+    if casted_present is present:
+        return types, values
+    casted = iter(casted_present)
+    return types, [None if value is None else next(casted) for value in values]
+
+
+def _classify_uniform_column(
+    kinds: set[type], values: Sequence[Any]
+) -> tuple[set[str], Sequence[Any]] | None:
+    if kinds == {str}:
+        joined = SEPARATOR.join(values)
+        if joined.count(SEPARATOR) != len(values) - 1:
+            return None
+        if not AMBIGUOUS_COLUMN_PATTERN.search(joined):
+            return {"TEXT"}, values
+        if INTEGER_COLUMN_PATTERN.fullmatch(joined):
+            return {"FLOAT"}, list(map(int, values))
+        if DECIMAL_COLUMN_PATTERN.fullmatch(joined):
+            return {"FLOAT"}, list(map(float, values))
+        if BOOLEAN_COLUMN_PATTERN.fullmatch(joined):
+            return {"BOOLEAN"}, list(map("TRUE".__eq__, map(str.upper, values)))
+
+    elif kinds == {int}:
+        if -MAX_EXACT_INTEGER <= min(values) and max(values) <= MAX_EXACT_INTEGER:
+            return {"FLOAT"}, values
+
+    elif kinds == {float}:
+        # A finite sum means that every value is finite.
+        if math.isfinite(sum(values)) and not any(map(float.is_integer, values)):
+            return {"FLOAT"}, values
+
+    elif kinds == {bool}:
+        return {"BOOLEAN"}, values
+
+    return None
+
+
+class TypeAccumulator:
+    # Streaming mode: records are cast chunk by chunk while the set of types
+    # seen in each column keeps growing, so column types can be decided once
+    # the whole stream went through without holding it.
+
+    def __init__(self, text_only: bool = False) -> None:
+        self.text_only = text_only
+        self.columns: list[str] | None = None
+        self.types: dict[str, set[str]] = {}
+
+    def update(self, records: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        # Records are rewritten in place, like `analyze_json` does, and only
+        # for the columns whose values actually changed.
+        if not records:
+            return records
+
+        if self.columns is None:
+            self.columns = list(records[0])
+            self.types = {column: set() for column in self.columns}
+
+        columns = self.columns
+        if not all(map(self.types.keys().__eq__, map(dict.keys, records))):
+            raise InchoherentStructure()
+
+        if len(columns) == 1:
+            values_by_column = [list(map(itemgetter(columns[0]), records))]
+        else:
+            values_by_column = list(zip(*map(itemgetter(*columns), records)))
+
+        for column, values in zip(columns, values_by_column):
+            if self.text_only:
+                types = {"TEXT"}
+                casted_values = (
+                    values
+                    if set(map(type, values)) == {str}
+                    else list(map(str, values))
+                )
+            else:
+                types, casted_values = classify_column(values)
+            self.types[column] |= types
+
+            if casted_values is not values:
+                for record, value in zip(records, casted_values):
+                    record[column] = value
+
+        return records
+
+    @property
+    def data_types(self) -> dict[str, str]:
+        return {
+            column: decide_data_type(list(types))
+            for column, types in self.types.items()
+        }
+
+
+def analyze_records(
+    json_list: list[dict[str, Any]], text_only: bool = False
+) -> tuple[dict[str, str], list[dict[str, Any]]]:
+    if not json_list:
+        raise InchoherentStructure()
+
+    accumulator = TypeAccumulator(text_only)
+    records = accumulator.update(json_list)
+    return accumulator.data_types, records
+
+
+def cast_records(
+    json_records: Iterable[Any],
+    data_types: dict[str, str],
+    text_only: bool = False,
+    chunk_size: int = 1000,
+) -> Iterator[dict[str, Any]]:
+    # Sampling mode: types were decided on a sample, the following records are
+    # only checked against its columns and cast, one chunk at a time.
+    accumulator = TypeAccumulator(text_only)
+    accumulator.columns = list(data_types)
+    accumulator.types = {column: set() for column in data_types}
+    for chunk in batched(json_records, chunk_size):
+        if not all(isinstance(record, dict) for record in chunk):
+            raise InchoherentStructure()
+        yield from accumulator.update(list(chunk))
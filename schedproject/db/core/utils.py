@@ -1,10 +1,13 @@
 import csv
 import io
+import json
 import logging
 import re
 
 from enum import Enum
+from typing import IO, Any, Iterator
 
+import msgpack
 from psycopg.abc import NoneType
 
 
@@ -38,6 +41,72 @@ class InconsistentStructure(Exception):
         self.comparison = comparison
 
 
+DDL_STATEMENT_PATTERN = re.compile(
+    r"\b(CREATE|ALTER|DROP|TRUNCATE|COMMENT\s+ON)\s", re.IGNORECASE
+)
+
+
+MSGPACK_MIMETYPE = "application/x-msgpack"
+
+
+def pack_columnar(records: list[dict[str, Any]]) -> bytes:
+    columns = list(records[0]) if records else []
+    return msgpack.packb(
+        {
+            "columns": columns,
+            "data": [[record[column] for record in records] for column in columns],
+        },
+        default=str,
+    )
+
+
+READ_STATEMENT_PATTERN = re.compile(
+    r"^\s*\(*\s*(SELECT|WITH|VALUES|TABLE)\b", re.IGNORECASE
+)
+WRITE_KEYWORD_PATTERN = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|COPY|CREATE|ALTER|DROP|CALL|DO)\b",
+    re.IGNORECASE,
+)
+VOLATILE_FUNCTION_PATTERN = re.compile(
+    r"\b(now|random|setseed|nextval|currval|setval|lastval|clock_timestamp"
+    r"|statement_timestamp|transaction_timestamp|timeofday|current_timestamp"
+    r"|current_date|current_time|localtime|localtimestamp|gen_random_uuid"
+    r"|uuid_generate_v\d|pg_sleep|dblink\w*)\b"
+    r"|\bFOR\s+(UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)\b",
+    re.IGNORECASE,
+)
+IDENTIFIER_PATTERN = re.compile(r'"((?:[^"]|"")+)"|\b([A-Za-z_][A-Za-z0-9_$]*)\b')
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+def is_ddl_statement(query: str) -> bool:
+    return DDL_STATEMENT_PATTERN.search(query) is not None
+
+
+def is_read_statement(query: str) -> bool:
+    return (
+        READ_STATEMENT_PATTERN.match(query) is not None
+        and WRITE_KEYWORD_PATTERN.search(query) is None
+    )
+
+
+def is_cacheable_query(query: str) -> bool:
+    return is_read_statement(query) and VOLATILE_FUNCTION_PATTERN.search(query) is None
+
+
+def referenced_identifiers(query: str) -> set[str]:
+    # Every identifier-looking token of the query, folded like Postgres does.
+    # Intersecting it with the known relation names over-approximates the
+    # relations a statement touches, which is what cache invalidation needs.
+    return {
+        quoted.replace('""', '"') if quoted else unquoted.lower()
+        for quoted, unquoted in IDENTIFIER_PATTERN.findall(query)
+    }
+
+
 def is_valid_table_name(table_name):
     return re.match(r"^[A-Za-z][A-Za-z0-9_]*$", table_name) is not None
 
@@ -202,6 +271,88 @@ def read_csv(file: str, separator: str = ","):
     return paired_headers, paired_columns
 
 
+def read_csv_records(file: str, separator: str = ",") -> list[dict[str, str]]:
+    fileio = io.StringIO(file)
+    return [dict(row) for row in csv.DictReader(fileio, delimiter=separator)]
+
+
+def read_ndjson_records(file: str) -> list[Any]:
+    return [json.loads(line) for line in file.splitlines() if line.strip()]
+
+
+def iter_csv_records(
+    stream: IO[bytes], separator: str = ","
+) -> Iterator[dict[str, str]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    for row in csv.DictReader(text, delimiter=separator):
+        yield dict(row)
+
+
+def iter_ndjson_records(stream: IO[bytes]) -> Iterator[Any]:
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_records(stream: IO[bytes], chunk_size: int = 65536) -> Iterator[Any]:
+    # Incremental parser for a JSON array (or a single object) read from a
+    # binary stream: only the element being decoded is held in memory.
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(stream, encoding="utf-8")
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[position:] + chunk
+        position = 0
+        return True
+
+    def skip(characters: str) -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer) or not fill():
+                return buffer[position] if position < len(buffer) else ""
+
+    def decode() -> Any:
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                if end < len(buffer) or eof:
+                    position = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            fill()
+
+    first = skip(" \t\r\n")
+    if first == "{":
+        yield decode()
+        return
+    if first != "[":
+        raise json.JSONDecodeError("Expecting a JSON array or object", buffer, position)
+    position += 1
+
+    while True:
+        if skip(" \t\r\n") == "]":
+            return
+        yield decode()
+        separator = skip(" \t\r\n")
+        if separator == ",":
+            position += 1
+        elif separator != "]":
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+
+
 class TransactionStrategy(Enum):
     SINGLE_TABLE = "single_table"
     PER_TABLE = "per_table"
@@ -5,7 +5,7 @@ import time
 
 import colorama
 import requests
-from flask import Flask, render_template
+from flask import Flask, jsonify, render_template
 
 from flask_cors import CORS
 from services import (
@@ -88,6 +88,8 @@ class InterfacesWebApp:
         max_retries: int = 5,
         host: str = "http://localhost",
         port: int | str = 5000,
+        database_backend: str = "http",
+        database_dsn: str | None = None,
     ):
 
         retry_count = 0
@@ -126,7 +128,13 @@ class InterfacesWebApp:
         # FIRST SERVICES
         self.conf_service = ConfService(self)
         self.utils_service = UtilsService(self)
-        self.db_service = DatabaseService(self, host=host, port=port)
+        self.db_service = DatabaseService(
+            self,
+            host=host,
+            port=port,
+            backend=database_backend,
+            dsn=database_dsn,
+        )
         self.db_service.init()
 
         self.utils_service.populate_db()
@@ -179,6 +187,15 @@ class InterfacesWebApp:
         def index():
             return render_template("index.html"), 200
 
+        @self.flask_app.route("/api/diagnostics/query-cache", methods=["GET"])
+        def query_cache_stats():
+            return jsonify(self.db_service.query_cache_stats()), 200
+
+        @self.flask_app.route("/api/diagnostics/query-cache", methods=["DELETE"])
+        def clear_query_cache():
+            self.db_service.clear_query_cache()
+            return "", 204
+
         @self.flask_app.after_request
         def add_header(response):
             if response.headers["Content-Type"].startswith("text/javascript"):
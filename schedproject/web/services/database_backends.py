@@ -0,0 +1,225 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Iterator
+
+import msgpack
+import requests
+from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+
+if TYPE_CHECKING:
+    from services.database_service import DatabaseService
+
+logger = logging.getLogger(__name__)
+
+MSGPACK_MIMETYPE = "application/x-msgpack"
+
+
+class DatabaseBackend(ABC):
+    # How `DatabaseService` runs its statements on the warehouse. Rows come
+    # back the same way whatever the backend: values JSON cannot represent
+    # (dates, decimals, ...) as strings.
+
+    @abstractmethod
+    def execute_query(
+        self, query: str, params: list[Any], awaits_result: bool
+    ) -> list[dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def execute_batch(
+        self, statements: list[dict[str, Any]], pipeline: bool
+    ) -> list[list[dict[str, Any]]]:
+        pass
+
+    @abstractmethod
+    def stream_query(
+        self, query: str, params: list[Any], fetch_size: int | None
+    ) -> Iterator[dict[str, Any]]:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class HttpBackend(DatabaseBackend):
+    # Statements go through the DB API, for deployments where the web app
+    # cannot reach the warehouse itself.
+
+    def __init__(self, db_service: "DatabaseService"):
+        self.db_service = db_service
+
+    def execute_query(
+        self, query: str, params: list[Any], awaits_result: bool
+    ) -> list[dict[str, Any]]:
+        response = self.db_service.request(
+            "POST",
+            "/query/warehouse",
+            json={
+                "query": query,
+                "placeholders": params,
+                "awaits_result": awaits_result,
+            },
+            headers={"Accept": f"{MSGPACK_MIMETYPE}, application/json;q=0.9"},
+        )
+        if response.status_code != 200:
+            logger.error(
+                f"Query execution failed with status code: {response.status_code}"
+            )
+            raise Exception("Query execution failed")
+        return self._decode_query_response(response)
+
+    @staticmethod
+    def _decode_query_response(response: requests.Response) -> list[dict[str, Any]]:
+        if response.headers.get("Content-Type", "").startswith(MSGPACK_MIMETYPE):
+            payload = msgpack.unpackb(response.content)
+            columns = payload["columns"]
+            return [dict(zip(columns, row)) for row in zip(*payload["data"])]
+        return response.json()
+
+    def execute_batch(
+        self, statements: list[dict[str, Any]], pipeline: bool
+    ) -> list[list[dict[str, Any]]]:
+        response = self.db_service.request(
+            "POST",
+            "/query/warehouse/batch",
+            json={
+                "statements": [
+                    {
+                        "query": statement["query"],
+                        "placeholders": statement.get("params", []),
+                        "awaits_result": statement.get("awaits_result", True),
+                    }
+                    for statement in statements
+                ],
+                "pipeline": pipeline,
+            },
+        )
+        if response.status_code != 200:
+            logger.error(
+                f"Batch execution failed with status code: {response.status_code}"
+            )
+            raise Exception("Batch execution failed")
+        return response.json()
+
+    def stream_query(
+        self, query: str, params: list[Any], fetch_size: int | None
+    ) -> Iterator[dict[str, Any]]:
+        response = self.db_service.request(
+            "POST",
+            "/query/warehouse",
+            json={
+                "query": query,
+                "placeholders": params,
+                "awaits_result": True,
+                "stream": True,
+                "fetch_size": fetch_size,
+            },
+            headers={"Accept": "application/x-ndjson"},
+            stream=True,
+        )
+        if response.status_code != 200:
+            logger.error(
+                f"Query streaming failed with status code: {response.status_code}"
+            )
+            response.close()
+            raise Exception("Query execution failed")
+
+        with response:
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+
+class DirectBackend(DatabaseBackend):
+    # Statements run on a pool of connections of the web app's own, saving
+    # the DB API round trip and the (de)serialization of the rows. Writes
+    # made this way are not seen by the DB API, whose result cache must then
+    # stay disabled (`DatabaseService.check_backend` refuses to start if not).
+    DEFAULT_FETCH_SIZE = 1000
+
+    def __init__(self, dsn: str, min_size: int, max_size: int, timeout: float) -> None:
+        self.pool = ConnectionPool(
+            dsn,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            check=ConnectionPool.check_connection,
+            name="web-warehouse-pool",
+            open=False,
+        )
+        self.pool.open(wait=True, timeout=timeout)
+        logger.info(f"Connected to the warehouse (pool size {min_size}-{max_size})")
+
+    @staticmethod
+    def _to_api_value(value: Any) -> Any:
+        # What the DB API's `json.dumps(..., default=str)` makes of it.
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        if isinstance(value, (list, tuple)):
+            return [DirectBackend._to_api_value(item) for item in value]
+        if isinstance(value, dict):
+            return {
+                str(key): DirectBackend._to_api_value(item)
+                for key, item in value.items()
+            }
+        return str(value)
+
+    @staticmethod
+    def _to_api_row(row: dict[str, Any]) -> dict[str, Any]:
+        return {
+            column: DirectBackend._to_api_value(value) for column, value in row.items()
+        }
+
+    def execute_query(
+        self, query: str, params: list[Any], awaits_result: bool
+    ) -> list[dict[str, Any]]:
+        # The pool commits when the block exits normally, rolls back otherwise.
+        with self.pool.connection() as conn:
+            with conn.cursor(row_factory=dict_row) as cursor:
+                cursor.execute(query, params or None)
+                if not awaits_result:
+                    return []
+                return [self._to_api_row(row) for row in cursor.fetchall()]
+
+    def execute_batch(
+        self, statements: list[dict[str, Any]], pipeline: bool
+    ) -> list[list[dict[str, Any]]]:
+        with self.pool.connection() as conn:
+            cursors = []
+            try:
+                with conn.pipeline() if pipeline else nullcontext():
+                    for statement in statements:
+                        cursor = conn.cursor(row_factory=dict_row)
+                        cursors.append(cursor)
+                        cursor.execute(
+                            statement["query"], statement.get("params") or None
+                        )
+
+                return [
+                    (
+                        [self._to_api_row(row) for row in cursor.fetchall()]
+                        if statement.get("awaits_result", True)
+                        else []
+                    )
+                    for cursor, statement in zip(cursors, statements)
+                ]
+            finally:
+                for cursor in cursors:
+                    cursor.close()
+
+    def stream_query(
+        self, query: str, params: list[Any], fetch_size: int | None
+    ) -> Iterator[dict[str, Any]]:
+        # A server-side cursor, so only `fetch_size` rows are held at a time.
+        with self.pool.connection() as conn:
+            with conn.cursor(name="web_stream", row_factory=dict_row) as cursor:
+                cursor.itersize = fetch_size or self.DEFAULT_FETCH_SIZE
+                cursor.execute(query, params or None)
+                for row in cursor:
+                    yield self._to_api_row(row)
+
+    def close(self) -> None:
+        self.pool.close()
@@ -1,12 +1,17 @@
 import json
 import logging
 import os
+import threading
 from datetime import datetime
 from enum import Enum
-from typing import TYPE_CHECKING, Any, TypeAlias
+from typing import TYPE_CHECKING, Any, Iterator, TypeAlias
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from services.database_backends import DatabaseBackend, DirectBackend, HttpBackend
+from services.query_cache import QueryCache, is_read_query, read_relations
 from utils.statistics import stats
 
 
@@ -243,17 +248,52 @@ def between(column: str, start: Any, end: Any) -> Filter:
 
 
 class DatabaseService:
+    pool_size = 20
+    max_retries = 3
+    retry_backoff = 0.2
+    connect_timeout = 5.0
+    read_timeout = 300.0
+    backend_name = "http"
+    direct_pool_min_size = 2
+    direct_pool_max_size = 10
+    query_cache_size = 1024
+    query_cache_ttl = 30.0
+    query_cache_max_rows = 10000
+
     def __init__(
         self,
         app: "InterfacesWebApp",
         host: str,
         port: int | str,
         conf_folder: str = "./conf",
+        backend: str | None = None,
+        dsn: str | None = None,
     ):
         self.app = app
         self.host = host
         self.port = port
         self.hostport = f"{host}:{port}"
+
+        # Keep-alive connections to the DB API, shared by every thread. Only
+        # connection failures and gateway errors are retried, and never a
+        # POST that may have reached the API.
+        self.adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=Retry(
+                total=self.max_retries,
+                read=0,
+                backoff_factor=self.retry_backoff,
+                status_forcelist=(502, 503, 504),
+            ),
+        )
+        self._local = threading.local()
+        self.backend = self.create_backend(backend or self.backend_name, dsn)
+        self.query_cache = None
+        if self.query_cache_size > 0:
+            self.query_cache = QueryCache(
+                self.query_cache_size, self.query_cache_ttl, self.query_cache_max_rows
+            )
         self.CONF_FOLDER = conf_folder
         self.vt_association = {}
         self.data_repr = {
@@ -265,7 +305,68 @@ class DatabaseService:
             "view_modalities": "modality",
         }
 
+    @property
+    def session(self) -> requests.Session:
+        # Sessions are not thread-safe, but they all share the adapter and so
+        # its connection pool.
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self._local.session = session
+        return session
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        timeout: tuple[float, float | None] | None = None,
+        **kwargs: Any,
+    ) -> requests.Response:
+        return self.session.request(
+            method,
+            f"{self.hostport}{path}",
+            timeout=timeout or (self.connect_timeout, self.read_timeout),
+            **kwargs,
+        )
+
+    def create_backend(self, name: str, dsn: str | None) -> DatabaseBackend:
+        # The schema and the view/table association always come from the DB
+        # API, only the statements of the services may skip it.
+        if name == "http":
+            return HttpBackend(self)
+        if name == "direct":
+            if not dsn:
+                raise ValueError("The direct database backend requires a dsn")
+            return DirectBackend(
+                dsn,
+                self.direct_pool_min_size,
+                self.direct_pool_max_size,
+                self.connect_timeout,
+            )
+        raise ValueError(f"Unknown database backend: {name}")
+
+    def check_backend(self) -> None:
+        # Writes of the direct backend never reach the DB API, whose result
+        # cache has no expiry: what it serves would stay stale for good.
+        if not isinstance(self.backend, DirectBackend):
+            return
+        response = self.request("GET", "/diagnostics/result-cache")
+        if response.status_code != 200:
+            logger.error(
+                "Could not check that the DB API result cache is disabled, "
+                f"status code: {response.status_code}"
+            )
+            return
+        if response.json().get("enabled"):
+            raise ValueError(
+                "The direct database backend requires the DB API result cache "
+                "to be disabled (result-cache-size: 0)"
+            )
+
     def init(self):
+        self.check_backend()
         self.schema = self.load_schema()
         self.table_hierarchy = self.build_table_hierarchy()
         self.vt_association = self.fetch_view_table_association()
@@ -273,7 +374,7 @@ class DatabaseService:
 
     def fetch_view_table_association(self) -> dict[str, str]:
         try:
-            response = requests.get(f"{self.hostport}/view-table-association")
+            response = self.request("GET", "/view-table-association")
             if response.status_code != 200:
                 logger.error("Failed to fetch view-table associations")
                 return {}
@@ -351,25 +452,21 @@ class DatabaseService:
     def update_database_schema(self) -> dict[str, Any]:
         logger.info("Fetching database schema from API")
 
-        schema_response = requests.get(f"{self.hostport}/schema/warehouse")
+        schema_response = self.request("GET", "/schema/warehouse")
         if schema_response.status_code != 200:
             logger.error("Failed to fetch database schema")
             raise Exception("Failed to fetch database schema")
 
         detailed_schema = schema_response.json()
 
-        transactions_tables_response = requests.get(
-            f"{self.hostport}/transactions_tables"
-        )
+        transactions_tables_response = self.request("GET", "/transactions_tables")
         if transactions_tables_response.status_code != 200:
             logger.error("Failed to fetch transactions tables")
             raise Exception("Failed to fetch transactions tables")
 
         transactions_tables = transactions_tables_response.json()
 
-        view_table_association_response = requests.get(
-            f"{self.hostport}/view-table-association"
-        )
+        view_table_association_response = self.request("GET", "/view-table-association")
         if view_table_association_response.status_code != 200:
             logger.error("Failed to fetch view-table associations")
             raise Exception("Failed to fetch view-table associations")
@@ -450,25 +547,94 @@ class DatabaseService:
 
     @stats
     def execute_query(
-        self, query: str, params: list[Any] = [], awaits_result: bool = True
+        self,
+        query: str,
+        params: list[Any] = [],
+        awaits_result: bool = True,
+        use_cache: bool = True,
+        written_table: str | None = None,
     ) -> list[dict[str, Any]]:
         logger.debug(f"Executing query: {query}")
         logger.debug(f"Query parameters: {params}")
-        response = requests.post(
-            f"{self.hostport}/query/warehouse",
-            json={
-                "query": query,
-                "placeholders": params,
-                "awaits_result": awaits_result,
-            },
-        )
-        if response.status_code != 200:
-            logger.error(
-                f"Query execution failed with status code: {response.status_code}"
-            )
-            raise Exception("Query execution failed")
-        logger.debug("Query executed successfully")
-        return response.json()
+        if self.query_cache is None:
+            return self.backend.execute_query(query, params, awaits_result)
+
+        if not is_read_query(query):
+            result = self.backend.execute_query(query, params, awaits_result)
+            # Without `written_table`, what the statement changed is unknown.
+            if written_table is not None:
+                self.invalidate_table(written_table)
+            else:
+                self.query_cache.clear()
+            return result
+
+        tables = self._cached_tables(query) if use_cache and awaits_result else None
+        if tables is None:
+            return self.backend.execute_query(query, params, awaits_result)
+
+        key = QueryCache.make_key(query, params)
+        result = self.query_cache.get(key)
+        if result is not None:
+            return result
+
+        generation = self.query_cache.generation
+        result = self.backend.execute_query(query, params, awaits_result)
+        self.query_cache.put(key, result, tables, generation)
+        return result
+
+    def _cached_tables(self, query: str) -> set[str] | None:
+        # Only reads of the warehouse tables and of their overlay views are
+        # cached, under the name of the table: other views may read anything.
+        relations = read_relations(query)
+        if not relations:
+            return None
+        known = set(self.vt_association) | set(self.vt_association.values())
+        if not relations <= known:
+            return None
+        return {self.vt_association.get(relation, relation) for relation in relations}
+
+    def invalidate_table(self, table_name: str) -> None:
+        # Rows of the tables referencing it may change too, through cascades.
+        if self.query_cache is None:
+            return
+        table_hierarchy = getattr(self, "table_hierarchy", None) or {}
+        pending = [self.vt_association.get(table_name, table_name)]
+        tables = set()
+        while pending:
+            table = pending.pop()
+            if table not in tables:
+                tables.add(table)
+                pending.extend(table_hierarchy.get(table, []))
+        self.query_cache.invalidate_tables(tables)
+
+    def query_cache_stats(self) -> dict[str, Any]:
+        if self.query_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.query_cache.stats()}
+
+    def clear_query_cache(self) -> None:
+        if self.query_cache is not None:
+            self.query_cache.clear()
+
+    @stats
+    def execute_batch(
+        self, statements: list[dict[str, Any]], pipeline: bool = False
+    ) -> list[list[dict[str, Any]]]:
+        logger.debug(f"Executing batch of {len(statements)} statements")
+        results = self.backend.execute_batch(statements, pipeline)
+        if self.query_cache is not None and not all(
+            is_read_query(statement["query"]) for statement in statements
+        ):
+            self.query_cache.clear()
+        logger.debug("Batch executed successfully")
+        return results
+
+    def stream_query(
+        self, query: str, params: list[Any] = [], fetch_size: int | None = None
+    ) -> Iterator[dict[str, Any]]:
+        logger.debug(f"Streaming query: {query}")
+        logger.debug(f"Query parameters: {params}")
+        return self.backend.stream_query(query, params, fetch_size)
 
     @stats
     def build_query(
@@ -626,10 +792,8 @@ class DatabaseService:
                             self.fetch_parent_data(parent, related_data, related_data)
 
     def get_data_transformation_information(self) -> tuple[bool, list[str]]:
-        transformation_occured_data = requests.get(
-            f"{self.hostport}/transformation_occured"
-        )
-        raw_tables_data = requests.get(f"{self.hostport}/tables/raw")
+        transformation_occured_data = self.request("GET", "/transformation_occured")
+        raw_tables_data = self.request("GET", "/tables/raw")
 
         return (
             bool(transformation_occured_data.json()["transformation_occured"]),
@@ -705,7 +869,7 @@ class DatabaseService:
                 RETURNING *;
             """
 
-            result = self.execute_query(query, values)
+            result = self.execute_query(query, values, written_table=table_name)
             if returning:
                 return result[0]
             return {"success": True}
@@ -756,7 +920,7 @@ class DatabaseService:
                 {" RETURNING *" if returning else ""};
             """
 
-            result = self.execute_query(query, all_values)
+            result = self.execute_query(query, all_values, written_table=table_name)
             if returning:
                 return result
             return [{"success": True}] * len(data)
@@ -795,7 +959,7 @@ class DatabaseService:
                 RETURNING *;
             """
 
-            result = self.execute_query(query, values)
+            result = self.execute_query(query, values, written_table=table_name)
 
             if not result:
                 return {"error": f"Record not found in {table_name}"}
@@ -814,7 +978,7 @@ class DatabaseService:
                 SELECT {primary_key} FROM {table_name}
                 WHERE {primary_key} = %s;
             """
-            exists = self.execute_query(check_query, [record_id])
+            exists = self.execute_query(check_query, [record_id], use_cache=False)
 
             if not exists:
                 return True
@@ -825,7 +989,9 @@ class DatabaseService:
                 RETURNING {primary_key};
             """
 
-            self.execute_query(query, [record_id], awaits_result=False)
+            self.execute_query(
+                query, [record_id], awaits_result=False, written_table=table_name
+            )
             return True
 
         except Exception as e:
@@ -867,6 +1033,11 @@ class DatabaseService:
             logger.error(f"Error getting records from {table_name}: {str(e)}")
             raise
 
+    def iter_all_records(
+        self, table_name: str, fetch_size: int | None = None
+    ) -> Iterator[dict[str, Any]]:
+        return self.stream_query(f"SELECT * FROM {table_name}", [], fetch_size)
+
     @stats
     def filter_records(
         self,
@@ -281,19 +281,24 @@ class LabelsViewGenerator:
         self._create_label_types_table()
 
     def _create_self_assigned_labels_view(self) -> None:
-        drop_table_query = "DROP TABLE IF EXISTS _self_assigned_labels CASCADE;"
-        self.db_service.execute_query(drop_table_query, awaits_result=False)
-
-        create_table_query = """
-            CREATE TABLE _self_assigned_labels (
-                resource_type VARCHAR(50) NOT NULL,
-                resource_id TEXT NOT NULL,
-                label_key VARCHAR(100) NOT NULL,
-                label TEXT NOT NULL,
-                origin VARCHAR(50) NOT NULL
-            );
-        """
-        self.db_service.execute_query(create_table_query, awaits_result=False)
+        statements = [
+            {
+                "query": "DROP TABLE IF EXISTS _self_assigned_labels CASCADE;",
+                "awaits_result": False,
+            },
+            {
+                "query": """
+                    CREATE TABLE _self_assigned_labels (
+                        resource_type VARCHAR(50) NOT NULL,
+                        resource_id TEXT NOT NULL,
+                        label_key VARCHAR(100) NOT NULL,
+                        label TEXT NOT NULL,
+                        origin VARCHAR(50) NOT NULL
+                    );
+                """,
+                "awaits_result": False,
+            },
+        ]
 
         for table in self.considered_tables:
             table_info = self.db_service.schema[table]
@@ -322,7 +327,18 @@ class LabelsViewGenerator:
                     ) as t(column_name, column_value)
                     WHERE column_value IS NOT NULL
                 """
-                self.db_service.execute_query(insert_query, awaits_result=False)
+                statements.append({"query": insert_query, "awaits_result": False})
+
+        # Built once the rows are in, which is faster than maintaining it.
+        statements.append(
+            {
+                "query": """
+                    CREATE INDEX _self_assigned_labels_resource_idx
+                    ON _self_assigned_labels (resource_type, resource_id);
+                """,
+                "awaits_result": False,
+            }
+        )
 
         view_query = """
             CREATE OR REPLACE VIEW self_assigned_labels AS
@@ -336,24 +352,30 @@ class LabelsViewGenerator:
                 origin
             FROM custom_labels;
         """
+        statements.append({"query": view_query, "awaits_result": False})
 
-        self.db_service.execute_query(view_query, awaits_result=False)
+        self.db_service.execute_batch(statements, pipeline=True)
 
     def _create_label_types_table(self) -> None:
-        drop_table_query = "DROP TABLE IF EXISTS _label_types CASCADE;"
-        self.db_service.execute_query(drop_table_query, awaits_result=False)
-
-        create_query = """
-            CREATE TABLE _label_types (
-                id SERIAL PRIMARY KEY,
-                resource_type VARCHAR(50) NOT NULL,
-                label_key VARCHAR(100) NOT NULL,
-                source_type VARCHAR(50),
-                description VARCHAR(255),
-                UNIQUE(resource_type, label_key, source_type)
-            );
-        """
-        self.db_service.execute_query(create_query, awaits_result=False)
+        statements = [
+            {
+                "query": "DROP TABLE IF EXISTS _label_types CASCADE;",
+                "awaits_result": False,
+            },
+            {
+                "query": """
+                    CREATE TABLE _label_types (
+                        id SERIAL PRIMARY KEY,
+                        resource_type VARCHAR(50) NOT NULL,
+                        label_key VARCHAR(100) NOT NULL,
+                        source_type VARCHAR(50),
+                        description VARCHAR(255),
+                        UNIQUE(resource_type, label_key, source_type)
+                    );
+                """,
+                "awaits_result": False,
+            },
+        ]
 
         for table in self.considered_tables:
             table_info = self.db_service.schema[table]
@@ -368,10 +390,17 @@ class LabelsViewGenerator:
                     INSERT INTO _label_types (resource_type, label_key, source_type, description)
                     VALUES (%s, %s, %s, %s);
                 """
-                self.db_service.execute_query(
-                    insert_query,
-                    [table, col, "self", f"Self-assigned {col} from {table}"],
-                    awaits_result=False,
+                statements.append(
+                    {
+                        "query": insert_query,
+                        "params": [
+                            table,
+                            col,
+                            "self",
+                            f"Self-assigned {col} from {table}",
+                        ],
+                        "awaits_result": False,
+                    }
                 )
 
         hierarchy_map = {}
@@ -390,7 +419,7 @@ class LabelsViewGenerator:
                     WHERE lt.resource_type = '{ancestor}' AND lt.source_type = 'self'
                     ON CONFLICT (resource_type, label_key, source_type) DO NOTHING;
                 """
-                self.db_service.execute_query(query, [], awaits_result=False)
+                statements.append({"query": query, "awaits_result": False})
 
         view_query = """
             CREATE OR REPLACE VIEW label_types AS
@@ -410,7 +439,9 @@ class LabelsViewGenerator:
                 AND lt.label_key = custom_labels.label_key
             );
         """
-        self.db_service.execute_query(view_query, awaits_result=False)
+        statements.append({"query": view_query, "awaits_result": False})
+
+        self.db_service.execute_batch(statements, pipeline=True)
 
     def _build_ancestors_recursively(
         self, current: str, ancestors: set[str], visited: set[str]
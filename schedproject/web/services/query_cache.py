@@ -0,0 +1,145 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+CacheKey = tuple[str, str]
+
+READ_QUERY_PATTERN = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+WRITE_KEYWORD_PATTERN = re.compile(
+    r"\b(?:INSERT|UPDATE|DELETE|MERGE|TRUNCATE|CREATE|DROP|ALTER|NEXTVAL|SETVAL)\b",
+    re.IGNORECASE,
+)
+RELATION_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)", re.IGNORECASE)
+COMMA_JOIN_PATTERN = re.compile(
+    r"\bFROM\s+[A-Za-z_]\w*(?:\s+(?:AS\s+)?[A-Za-z_]\w*)?\s*,", re.IGNORECASE
+)
+
+
+def is_read_query(query: str) -> bool:
+    return bool(READ_QUERY_PATTERN.match(query)) and not WRITE_KEYWORD_PATTERN.search(
+        query
+    )
+
+
+def read_relations(query: str) -> set[str] | None:
+    # Relations read by the query, None when some of them cannot be told
+    # apart from what follows them (`FROM a, b`).
+    if COMMA_JOIN_PATTERN.search(query):
+        return None
+    return {relation.lower() for relation in RELATION_PATTERN.findall(query)}
+
+
+class QueryCache:
+    # Rows of recent reads, dropped when they are older than `ttl` seconds,
+    # when the cache grows past `max_size` entries, or when a table they read
+    # is written through the `DatabaseService` owning it.
+
+    def __init__(self, max_size: int, ttl: float, max_rows: int) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        # Bumped on every invalidation. A result read while it changed may
+        # already be stale, so `put` drops it.
+        self.generation = 0
+
+        self._entries: OrderedDict[CacheKey, tuple[float, list[dict[str, Any]]]] = (
+            OrderedDict()
+        )
+        self._keys_by_table: dict[str, set[CacheKey]] = {}
+        self._tables_by_key: dict[CacheKey, set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, params: list[Any] | None) -> CacheKey:
+        return " ".join(query.split()), json.dumps(params or [], default=str)
+
+    def get(self, key: CacheKey) -> list[dict[str, Any]] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._discard(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return [dict(row) for row in entry[1]]
+
+    def put(
+        self,
+        key: CacheKey,
+        result: list[dict[str, Any]],
+        tables: set[str],
+        generation: int,
+    ) -> None:
+        if len(result) > self.max_rows or not tables:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            self._discard(key)
+            self._entries[key] = (
+                time.monotonic() + self.ttl,
+                [dict(row) for row in result],
+            )
+            self._tables_by_key[key] = tables
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_tables(self, tables: set[str]) -> None:
+        with self._lock:
+            self.generation += 1
+            for table in tables:
+                for key in self._keys_by_table.pop(table, set()):
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys_by_table.clear()
+            self._tables_by_key.clear()
+
+    def _discard(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+        for table in self._tables_by_key.pop(key, set()):
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "max_rows": self.max_rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -2,8 +2,6 @@ import logging
 import os
 from typing import TYPE_CHECKING
 
-import requests
-
 from flask import jsonify
 
 if TYPE_CHECKING:
@@ -21,6 +19,8 @@ class UtilsService:
             populate_database(
                 host=self.app.db_service.host, port=self.app.db_service.port
             )
+            # Written behind the query cache's back.
+            self.app.db_service.clear_query_cache()
             try:
                 with open("/.population", "w") as f:
                     f.write("")
@@ -33,11 +33,15 @@ class UtilsService:
     def get_transformation(self):
         transformation_occured = os.path.exists("/.transformation")
         if not transformation_occured:
-            response = requests.get(
-                f"{self.app.db_service.hostport}/data_transformation"
+            # Transformations can take much longer than a query.
+            response = self.app.db_service.request(
+                "GET",
+                "/data_transformation",
+                timeout=(self.app.db_service.connect_timeout, None),
             )
 
             if response.status_code == 200:
+                self.app.db_service.clear_query_cache()
                 try:
                     with open("/.transformation", "w") as f:
                         f.write("")